@@ -1,60 +1,182 @@
 import os
+import argparse
 import pandas as pd
 from tkinter import Tk, filedialog
 from dlisio import dlis
 from pathlib import Path
 
-def validate_dlis_file(dlis_file):
+from dlis_frames import CHUNK_ROWS, check_frames
+from dlis_prescan import prescan_dlis
+from qc_batch import iter_input_files, run_batch
+from qc_findings import finding, open_findings_sink
+from validation_cache import ValidationCache
+
+# Bump whenever a check is added or its wording/logic changes: cached results are keyed on it
+RULESET_VERSION = "3"
+
+def check_dlis_file(dlis_file, deep=False, quiet=False, lf_workers=1, chunk_rows=CHUNK_ROWS,
+                    spacing_tolerance=1e-2, prescan=True, prescan_only=False):
     """
     Validate a DLIS file for conformity to the DLIS/API RP66 standard using both physical and logical file checks.
 
     Parameters:
     dlis_file (str): The file path of the DLIS file to be validated.
+    deep (bool): Also decode the frame data in chunks of `chunk_rows` frames (see dlis_frames.py).
+    quiet (bool): Do not print physical_file.describe().
+    lf_workers (int): Processes used to deep-check logical files in parallel.
+    spacing_tolerance (float): Allowed relative deviation of an index increment from the frame spacing.
+    prescan (bool): Walk the RP66 envelopes first (dlis_prescan.py); structurally broken files are not loaded.
+    prescan_only (bool): Stop after the pre-scan.
     Returns:
-    str: A message indicating the validation result.
+    list: Findings (see qc_findings.py); empty when the file conforms.
     """
     try:
         # Ensure the file exists
         if not os.path.isfile(dlis_file):
-            return f"Error: {dlis_file} is not a valid file or does not exist."
+            return [finding(dlis_file, "DLIS-FILE", f"Error: {dlis_file} is not a valid file or does not exist.",
+                            severity="fatal")]
+
+        # Structural pre-scan: truncated or broken files are rejected without loading them
+        prescan_findings = []
+        if prescan or prescan_only:
+            prescan_findings, _ = prescan_dlis(dlis_file)
+            if prescan_only or any(f.severity == "fatal" for f in prescan_findings):
+                return prescan_findings
+
+        # Load the DLIS file; the context manager closes it even when a check raises
+        with dlis.load(dlis_file) as physical_file:
+            return prescan_findings + _check_physical_file(dlis_file, physical_file, deep, quiet, lf_workers,
+                                                           chunk_rows, spacing_tolerance)
+
+    except RuntimeError as e:
+        # dlisio reports structural problems (truncation, bad segments) as RuntimeError
+        message = " ".join(str(e).split())
+        return [finding(dlis_file, "DLIS-READ", f"DLIS-specific error: {message}", severity="fatal")]
+    except Exception as e:
+        return [finding(dlis_file, "DLIS-READ", f"Error processing file: {e}", severity="fatal")]
+
 
-        # Load the DLIS file
-        physical_file = dlis.load(dlis_file)
-        if not physical_file:
-            return "File is empty or not a valid DLIS file."
+def _check_physical_file(dlis_file, physical_file, deep, quiet, lf_workers, chunk_rows, spacing_tolerance):
+    if not physical_file:
+        return [finding(dlis_file, "DLIS-EMPTY", "File is empty or not a valid DLIS file.", severity="fatal")]
 
-        # Describe the physical file
+    # Describe the physical file
+    if not quiet:
         description = physical_file.describe()
         print(description)
 
-        # Logical file validation
-        logical_file_issues = []
-        for logical_file in physical_file:
-            # Check logical file metadata
-            if not logical_file.origins:
-                logical_file_issues.append("Logical file missing origin metadata.")
-            
-            # Validate channels
-            for channel in logical_file.channels:
-                if not channel.name:
-                    logical_file_issues.append("Channel with missing name found.")
-            
-            # Validate frames
-            for frame in logical_file.frames:
-                if not frame.name:
-                    logical_file_issues.append("Frame with missing name found.")
-              
-        if logical_file_issues:
-            return "Logical file issues detected: " + "; ".join(logical_file_issues)
+    # Logical file validation
+    logical_file_issues = []
+    for lf_index, logical_file in enumerate(physical_file):
+        section = f"LogicalFile {lf_index + 1}"
+
+        # Check logical file metadata
+        if not logical_file.origins:
+            logical_file_issues.append(finding(
+                dlis_file, "DLIS-ORIGIN", "Logical file missing origin metadata.",
+                section=section, expected="ORIGIN", actual="missing"))
+
+        # Validate channels
+        for channel in logical_file.channels:
+            if not channel.name:
+                logical_file_issues.append(finding(
+                    dlis_file, "DLIS-CHANNEL-NAME", "Channel with missing name found.",
+                    section=section, expected="name", actual="missing"))
+
+        # Validate frames
+        for frame in logical_file.frames:
+            if not frame.name:
+                logical_file_issues.append(finding(
+                    dlis_file, "DLIS-FRAME-NAME", "Frame with missing name found.",
+                    section=section, expected="name", actual="missing"))
+
+    if deep:
+        logical_file_issues += check_frames(dlis_file, physical_file, lf_workers, chunk_rows, spacing_tolerance)
 
+    return logical_file_issues
+
+
+def format_dlis_status(findings):
+    """The legacy free-text Status column for a list of DLIS findings ("info" findings are ignored)."""
+    findings = [f for f in findings if f.severity != "info"]
+    if not findings:
         return "DLIS file conforms to the standard."
+    fatal = [f for f in findings if f.severity == "fatal"]
+    if fatal:
+        return fatal[0].message
+    return "Logical file issues detected: " + "; ".join(f.message for f in findings)
+
+
+def validate_dlis_file(dlis_file):
+    """Validate a DLIS file and return a message indicating the validation result."""
+    return format_dlis_status(check_dlis_file(dlis_file))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate DLIS files against RP66.")
+    parser.add_argument("--deep", action="store_true",
+                        help="Also decode the frame data in bounded chunks: FRAMENO, index monotonicity, "
+                             "spacing, channel dimensions (see dlis_frames.py)")
+    parser.add_argument("--quiet", action="store_true", help="Do not print describe() for every file")
+    parser.add_argument("--no-prescan", action="store_true",
+                        help="Skip the RP66 envelope pre-scan (dlis_prescan.py) before dlis.load")
+    parser.add_argument("--prescan-only", action="store_true",
+                        help="Triage: only run the pre-scan (truncation, broken records), do not load the files")
+    parser.add_argument("--lf-workers", type=int, default=1,
+                        help="Processes per file for --deep logical files (outside --batch; default: 1)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"Frames decoded at a time by --deep (default: {CHUNK_ROWS})")
+    parser.add_argument("--spacing-tolerance", type=float, default=1e-2,
+                        help="Allowed relative deviation of an index increment from the frame spacing (default: 0.01)")
+    parser.add_argument("--batch", nargs="+", metavar="SRC",
+                        help="Headless mode: directory trees, DLIS files or text files listing DLIS paths")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Per-file timeout in seconds for --batch")
+    parser.add_argument("--cache", metavar="DB",
+                        help="SQLite validation cache for --batch; unchanged files are not re-validated")
+    parser.add_argument("--resume", action="store_true",
+                        help="With --cache, continue the last interrupted run instead of starting a new one")
+    parser.add_argument("--prune-cache", action="store_true",
+                        help="With --cache, delete entries written under other rule-set versions")
+    parser.add_argument("--findings", metavar="PATH",
+                        help="Also write one typed record per finding to PATH (.sqlite/.db or .parquet)")
+    parser.add_argument("--output", default="dlis_verification_results.csv",
+                        help="Output CSV (default: dlis_verification_results.csv)")
+    return parser.parse_args(argv)
 
-    except dlis.DlisError as e:
-        return f"DLIS-specific error: {e}"
-    except Exception as e:
-        return f"Error processing file: {e}"
 
 def main():
+    args = parse_args()
+    check_kwargs = {"deep": args.deep, "quiet": args.quiet, "lf_workers": args.lf_workers,
+                    "chunk_rows": args.chunk_rows, "spacing_tolerance": args.spacing_tolerance,
+                    "prescan": not args.no_prescan, "prescan_only": args.prescan_only}
+
+    if args.batch:
+        files = iter_input_files(args.batch, [".dlis"])
+        ruleset = f"DLISCheck/{RULESET_VERSION}"
+        if args.prescan_only:
+            ruleset += "/prescan-only"
+        elif args.no_prescan:
+            ruleset += "/no-prescan"
+        if args.deep:
+            ruleset += f"/deep/spacing={args.spacing_tolerance}"
+        cache = ValidationCache(args.cache, ruleset) if args.cache else None
+        if cache is not None and args.prune_cache:
+            print(f"Pruned {cache.invalidate_other_rulesets()} stale cache entries")
+        sink = open_findings_sink(args.findings) if args.findings else None
+        try:
+            run_batch(check_dlis_file, files, args.output, workers=args.workers, timeout=args.timeout,
+                      func_kwargs=check_kwargs, cache=cache, resume=args.resume, sink=sink, formatter=format_dlis_status)
+        finally:
+            if cache is not None:
+                cache.close()
+            if sink is not None:
+                sink.close()
+                print(f"Findings saved to {args.findings}")
+        return
+
     # Initialize Tkinter window (hidden)
     Tk().withdraw()
 
@@ -73,15 +195,22 @@ def main():
         return
 
     # Verify each DLIS file
+    sink = open_findings_sink(args.findings) if args.findings else None
     results = []
     for file in dlist_files:
-        status = validate_dlis_file(file)
+        findings = check_dlis_file(file, **check_kwargs)
+        status = format_dlis_status(findings)
+        if sink is not None:
+            sink.write(findings)
         results.append({"File": os.path.basename(file), "Status": status})
         print(f"{os.path.basename(file)}: {status}")
+    if sink is not None:
+        sink.close()
+        print(f"Findings saved to {args.findings}")
     
     # Save results to CSV
     output_df = pd.DataFrame(results)
-    output_file = "dlis_verification_results.csv"
+    output_file = args.output
     output_df.to_csv(output_file, index=False)
     print(f"Results saved to {output_file}")
 
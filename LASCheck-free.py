@@ -2,69 +2,57 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-import lasio
+import argparse
 from tkinter import Tk, filedialog
 
+from las_scan import scan_las_header
+from las_rules import RuleEngine, load_rules_config, timing_report, list_rules
+from qc_findings import format_status
+
+# LASCheck-free covers the header rules only; START/STOP against the data is checked by
+# LASCheck-v2-free.py. A rules JSON given with --rules (see las_rules.py) is applied on top.
+RULES_CONFIG = {"LAS-STRTSTOP": {"enabled": False}}
+ENGINE = RuleEngine(RULES_CONFIG)
+
+
+def build_engine(rules_config=None):
+    """RuleEngine for RULES_CONFIG updated with `rules_config` (rule id -> options)."""
+    config = {k: dict(v) for k, v in RULES_CONFIG.items()}
+    for rule_id, options in (rules_config or {}).items():
+        config.setdefault(rule_id, {}).update(options)
+    return RuleEngine(config)
+
 # Step 1: Verify LAS 2.0 Conformity
-def verify_las_file(las_file):
+def verify_las_file(las_file, engine=None):
     try:
-        las = lasio.read(las_file, ignore_header_errors=True)
-        
-        sections = [section.upper() for section in las.sections.keys()]
-        #print(f"Sections read from {os.path.basename(las_file)}: {sections}")
-        
-        errors = []
-        
-        # Check mandatory sections
-        required_sections = ['VERSION', 'WELL', 'CURVES']
-        for req in required_sections:
-            if req not in sections:
-                errors.append(f"Missing section: {req}")  
-        
-        # Return results
-        return "Valid" if not errors else ", ".join(errors)
-        
-        # Check version
-        try:
-            version = las.version[0].value
-            if version != 2.0:
-                errors.append(f"Invalid version: {version} (Expected 2.0)")
-        except Exception:
-            errors.append("Missing or invalid VERSION information")
-        
-        # Check WRAP mode
-        try:
-            wrap_mode = las.version['WRAP'].value.upper()
-            if wrap_mode not in ['YES', 'NO']:
-                errors.append(f"Invalid WRAP mode: {wrap_mode}")
-        except Exception:
-            errors.append("Missing WRAP mode in VERSION section")
-        
-        # Check first curve is DEPT, DEPTH, TIME, or INDEX
-        try:
-            first_curve = las.curves[0].mnemonic.upper()
-            if first_curve not in ['DEPT', 'DEPTH', 'TIME', 'INDEX']:
-                errors.append(f"Invalid index curve: {first_curve}")
-        except Exception:
-            errors.append("Missing or invalid CURVE information")
-        
-        # Check NULL values
-        if 'NULL' not in las.well: 
-            errors.append("Missing NULL value in WELL section")
-        
-        # Check WELL ID is present
-        well_id_present = any(mnemonic.upper() in ['UWI', 'WELL'] for mnemonic in las.well.keys())
-        if not well_id_present:
-            errors.append("Missing Well ID in WELL section (UWI or WELL)")
-        
+        # Header rules only: the header is tokenized by las_scan, the ~A section is not parsed
+        header = scan_las_header(las_file)
+
+        # All enabled rules are evaluated in one pass over the parsed header
+        findings = (engine or ENGINE).run(header)
+
         # Return results
-        return "Valid" if not errors else ", ".join(errors)
+        return format_status(findings)
     except Exception as e:
         return f"Error reading file: {e}"
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the LAS 2.0 header of LAS files (file dialog).")
+    parser.add_argument("--rules", metavar="JSON",
+                        help="Rule configuration: enable/disable/parameterise rules (see las_rules.py)")
+    parser.add_argument("--list-rules", action="store_true", help="List the registered rules and exit")
+    return parser.parse_args(argv)
+
+
 # Step 2: Interactive File Selection and Verification
 def main():
+    args = parse_args()
+    if args.list_rules:
+        print(list_rules())
+        return
+    engine = build_engine(load_rules_config(args.rules) if args.rules else None)
+
     # Initialize file dialog
     Tk().withdraw()  # Hide the root window
     file_paths = filedialog.askopenfilenames(title="Select LAS Files", filetypes=[("LAS files", "*.las")])
@@ -76,7 +64,7 @@ def main():
     # Verify each file
     results = []
     for file in file_paths:
-        status = verify_las_file(file)
+        status = verify_las_file(file, engine)
         results.append({"File": os.path.basename(file), "Status": status})
         print(f"{os.path.basename(file)}: {status}")
     
@@ -85,6 +73,7 @@ def main():
     output_file = "las_verification_results.csv"
     output_df.to_csv(output_file, index=False)
     print(f"Results saved to {output_file}")
+    print(timing_report(engine.take_timings(), len(file_paths)))
 
 if __name__ == "__main__":
     main()
@@ -1,104 +1,216 @@
 import pandas as pd
 import os
-import lasio
+import time
+import json
+import argparse
 from tkinter import Tk, filedialog
 from datetime import datetime
 
+from las_scan import scan_las_header
+from las_curve_cache import read_las, cache_requested, DEFAULT_DIR, DEFAULT_MAX_MB
+from las_data_qc import qc_las_data
+from las_rules import RuleEngine, load_rules_config, timing_report, list_rules
+from qc_findings import CheckResult, finding, format_status, open_findings_sink
+from qc_batch import iter_input_files, run_batch
+from validation_cache import ValidationCache
+
+# Bump whenever a check is added or its wording/logic changes: cached results are keyed on it
+RULESET_VERSION = "4"
+
+# Rule engines are built once per process and per configuration
+_ENGINES = {}
+
+
+def get_engine(tolerance=None, rules_config=None):
+    """RuleEngine for `rules_config` (see las_rules.py); `tolerance` overrides LAS-STRTSTOP."""
+    config = {k: dict(v) for k, v in (rules_config or {}).items()}
+    if tolerance is not None:
+        config.setdefault("LAS-STRTSTOP", {})["tolerance"] = tolerance
+    key = json.dumps(config, sort_keys=True)
+    if key not in _ENGINES:
+        _ENGINES[key] = RuleEngine(config)
+    return _ENGINES[key]
+
+
 # Step 1: Verify LAS 2.0 Conformity
-def verify_las_file(las_file, tolerance=1e-3):
+def check_las_file(las_file, tolerance=None, rules_config=None, use_cache=None):
+    """
+    Parse the whole file with lasio and return the list of Findings. The curve cache is used
+    only when LAS_CURVE_CACHE is set (or use_cache=True); use_cache=False always parses.
+    """
+    if use_cache is None:
+        use_cache = cache_requested()
     try:
-        las = lasio.read(las_file, ignore_header_errors=True)
-        sections = [section.upper() for section in las.sections.keys()]
-        errors = []
+        header = read_las(las_file, use_cache=use_cache, ignore_header_errors=True).header
+    except Exception as e:
+        return [finding(las_file, "LAS-READ", f"Error reading file: {e}", severity="fatal")]
+    return get_engine(tolerance, rules_config).run(header)
 
-        # Check mandatory sections
-        required_sections = ['VERSION', 'WELL', 'CURVES']
-        for req in required_sections:
-            if req not in sections:
-                errors.append(f"Missing section: {req}")
 
-        # Check version
-        try:
-            version = float(str(las.version['VERS'].value).strip())
-            if version != 2.0:
-                errors.append(f"Invalid version: {version} (Expected 2.0)")
-        except Exception:
-            errors.append("Missing or invalid VERSION information")
-
-        # Check WRAP mode
-        try:
-            wrap_mode = str(las.version['WRAP'].value).strip().upper()
-            if wrap_mode not in ['YES', 'NO']:
-                errors.append(f"Invalid WRAP mode: {wrap_mode}")
-        except Exception:
-            errors.append("Missing WRAP mode in VERSION section")
+# Step 1b: Header-only fast path (no ~A parsing)
+def check_las_file_header_only(las_file, tolerance=None, rules_config=None):
+    """
+    Same rules as check_las_file, but the header is tokenized with las_scan and only the
+    first and last data rows are read, so runtime does not grow with the ~A section size.
 
-        # Check first curve is DEPT, DEPTH, TIME, or INDEX
-        try:
-            first_curve = las.curves[0].mnemonic.strip().upper()
-            if first_curve not in ['DEPT', 'DEPTH', 'TIME', 'INDEX']:
-                errors.append(f"Invalid index curve: {first_curve}")
-        except Exception:
-            errors.append("Missing or invalid CURVE information")
-
-        # Check NULL values
-        if 'NULL' not in las.well:
-            errors.append("Missing NULL value in WELL section")
-
-        # Check WELL ID is present (UWI or WELL only)
-        well_id_present = any(mnemonic.upper() in ['UWI', 'WELL'] for mnemonic in las.well.keys())
-        if not well_id_present:
-            errors.append("Missing Well ID in WELL section (UWI or WELL)")
-
-        # Check START and STOP consistency with tolerance
-        try:
-            # Possible keys to look for
-            start_keys = ['STRT', 'START', 'STRT.M', 'START.M', 'STRT.F', 'START.F']
-            stop_keys  = ['STOP', 'STOP.M', 'STOP.F']
-
-            # Find actual keys present in LAS well section
-            well_keys = {k.upper(): k for k in las.well.keys()}
-
-            found_pairs = []
-            for sk in start_keys:
-                for ek in stop_keys:
-                    # Match STRT with STOP (same suffix if present)
-                    if sk.replace("START", "STOP") == ek or sk.replace("STRT", "STOP") == ek:
-                        if sk in well_keys and ek in well_keys:
-                            found_pairs.append((well_keys[sk], well_keys[ek]))
-
-            if not found_pairs:
-                errors.append("Missing START/STOP pair in WELL section")
-            else:
-                data_start = float(las.index[0])
-                data_stop = float(las.index[-1])
-
-                for sk, ek in found_pairs:
-                    header_start = float(str(las.well[sk].value).strip())
-                    header_stop = float(str(las.well[ek].value).strip())
-
-                    if abs(header_start - data_start) > tolerance:
-                        errors.append(
-                            f"Mismatch START ({sk}): Header={header_start}, Data={data_start} "
-                            f"(Diff={abs(header_start - data_start):.6f} > Tolerance={tolerance})"
-                        )
-                    if abs(header_stop - data_stop) > tolerance:
-                        errors.append(
-                            f"Mismatch STOP ({ek}): Header={header_stop}, Data={data_stop} "
-                            f"(Diff={abs(header_stop - data_stop):.6f} > Tolerance={tolerance})"
-                        )
-        except Exception:
-            errors.append("Error validating START/STOP consistency in WELL section or data")
-
-        return "Valid" if not errors else ", ".join(errors)
+    Unlike lasio, which silently substitutes default sections, a missing ~V/~W/~C section
+    is reported as "Missing section". For wrapped files the last record is re-assembled from
+    the tail of the file; LAS 3.0 ~Log_Definition/~Log_Data are used in place of ~C/~A.
+    """
+    try:
+        header = scan_las_header(las_file)
+    except Exception as e:
+        return [finding(las_file, "LAS-READ", f"Error reading file: {e}", severity="fatal")]
+    return get_engine(tolerance, rules_config).run(header)
 
 
+# Step 1d: Data-section QC (column count, monotonic index, STEP, all-NULL curves)
+def check_las_data(las_file, step_tolerance=1e-3):
+    """
+    Chunked, vectorized data-section checks from las_data_qc; per-curve stats come back as "info"
+    findings. Returns (findings, summary) where summary has bytes, seconds and mb_per_s (None on error).
+    """
+    try:
+        return qc_las_data(las_file, step_tolerance=step_tolerance)
     except Exception as e:
-        return f"Error reading file: {e}"
+        return [finding(las_file, "DATA-READ", f"Error reading data section: {e}", severity="fatal")], None
+
+
+def check_las_task(las_file, header_only=False, tolerance=None, rules_config=None, data_qc=False,
+                   step_tolerance=1e-3):
+    """Batch worker task: findings plus the per-rule time spent on this file."""
+    checker = check_las_file_header_only if header_only else check_las_file
+    findings = checker(las_file, tolerance, rules_config)
+    data = None
+    if data_qc:
+        data_findings, data = check_las_data(las_file, step_tolerance)
+        findings += data_findings
+    return CheckResult(findings, get_engine(tolerance, rules_config).take_timings(), data)
+
+
+def verify_las_file(las_file, tolerance=1e-3, use_cache=None):
+    return format_status(check_las_file(las_file, tolerance, use_cache=use_cache))
+
+
+def verify_las_file_header_only(las_file, tolerance=1e-3):
+    return format_status(check_las_file_header_only(las_file, tolerance))
+
+
+# Step 1c: Benchmark header-only path against the lasio path
+def benchmark_header_only(file_paths, tolerance=1e-3):
+    """Time both validators on each file and report whether their statuses agree."""
+    rows = []
+    for file in file_paths:
+        t0 = time.perf_counter()
+        full_status = verify_las_file(file, tolerance, use_cache=False)  # lasio.read, never a cache hit
+        t1 = time.perf_counter()
+        fast_status = verify_las_file_header_only(file, tolerance)
+        t2 = time.perf_counter()
+        rows.append({
+            "File": os.path.basename(file),
+            "SizeMB": os.path.getsize(file) / 1e6,
+            "LasioSec": t1 - t0,
+            "HeaderOnlySec": t2 - t1,
+            "Speedup": (t1 - t0) / max(t2 - t1, 1e-9),
+            "SameStatus": full_status == fast_status,
+        })
+    return pd.DataFrame(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verify LAS 2.0 conformity of LAS files.")
+    parser.add_argument("--header-only", action="store_true",
+                        help="Tokenize the header and first/last data rows only (fast path)")
+    parser.add_argument("--benchmark", nargs="+", metavar="LAS",
+                        help="Compare the lasio path and the header-only path on these files")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="START/STOP tolerance (default: LAS-STRTSTOP rule setting, 1e-3)")
+    parser.add_argument("--rules", metavar="JSON",
+                        help="Rule configuration: enable/disable/parameterise rules (see las_rules.py)")
+    parser.add_argument("--list-rules", action="store_true", help="List the registered rules and exit")
+    parser.add_argument("--rule-timings", action="store_true",
+                        help="Print the time spent in each rule at the end of the run")
+    parser.add_argument("--data-qc", action="store_true",
+                        help="Also check the data sections (~A, wrapped ~A, LAS 3.0 ~*_Data) in bounded-memory "
+                             "chunks (see las_data_qc.py)")
+    parser.add_argument("--step-tolerance", type=float, default=1e-3,
+                        help="Allowed deviation of an index increment from STEP for --data-qc (default: 1e-3)")
+    parser.add_argument("--curve-cache", action="store_true",
+                        help=f"Keep the parsed curves in the LAS curve cache (LAS_CURVE_CACHE, default {DEFAULT_DIR}, "
+                             f"up to LAS_CURVE_CACHE_MB={DEFAULT_MAX_MB} MB); speeds up re-reads by the other tools")
+    parser.add_argument("--batch", nargs="+", metavar="SRC",
+                        help="Headless mode: directory trees, LAS files or text files listing LAS paths")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Per-file timeout in seconds for --batch")
+    parser.add_argument("--cache", metavar="DB",
+                        help="SQLite validation cache for --batch; unchanged files are not re-validated")
+    parser.add_argument("--resume", action="store_true",
+                        help="With --cache, continue the last interrupted run instead of starting a new one")
+    parser.add_argument("--prune-cache", action="store_true",
+                        help="With --cache, delete entries written under other rule-set versions")
+    parser.add_argument("--findings", metavar="PATH",
+                        help="Also write one typed record per finding to PATH (.sqlite/.db or .parquet)")
+    parser.add_argument("--output", default=None,
+                        help="Output CSV (default: timestamped las_verification_results_*.csv)")
+    return parser.parse_args(argv)
 
 
 # Step 2: Interactive File Selection and Verification
 def main():
+    args = parse_args()
+    if args.curve_cache and not cache_requested():
+        os.environ["LAS_CURVE_CACHE"] = DEFAULT_DIR  # inherited by the batch workers
+    if cache_requested() and not args.header_only:
+        print(f"Curve cache: {os.environ['LAS_CURVE_CACHE']} (LAS_CURVE_CACHE_MB limit, default {DEFAULT_MAX_MB} MB)")
+
+    if args.list_rules:
+        print(list_rules())
+        return
+
+    if args.benchmark:
+        bench = benchmark_header_only(args.benchmark, args.tolerance or 1e-3)
+        print(bench.to_string(index=False))
+        print(f"Total: lasio={bench['LasioSec'].sum():.3f}s, "
+              f"header-only={bench['HeaderOnlySec'].sum():.3f}s, "
+              f"statuses agree on {int(bench['SameStatus'].sum())}/{len(bench)} files")
+        return
+
+    checker = check_las_file_header_only if args.header_only else check_las_file
+    rules_config = load_rules_config(args.rules) if args.rules else None
+    engine = get_engine(args.tolerance, rules_config)  # validates the config up front
+    timings = {}
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = args.output or f"las_verification_results_{timestamp}.csv"
+
+    if args.batch:
+        files = iter_input_files(args.batch, [".las"])
+        cache = None
+        if args.cache:
+            ruleset = f"LASCheck-v2/{RULESET_VERSION}/{checker.__name__}/{engine.signature()}"
+            if args.data_qc:
+                ruleset += f"/data-qc/step={args.step_tolerance}"
+            cache = ValidationCache(args.cache, ruleset)
+            if args.prune_cache:
+                print(f"Pruned {cache.invalidate_other_rulesets()} stale cache entries")
+        sink = open_findings_sink(args.findings) if args.findings else None
+        try:
+            n_files = run_batch(check_las_task, files, output_file, workers=args.workers, timeout=args.timeout,
+                      func_kwargs={"header_only": args.header_only, "tolerance": args.tolerance,
+                                   "rules_config": rules_config, "data_qc": args.data_qc,
+                                   "step_tolerance": args.step_tolerance},
+                      cache=cache, resume=args.resume, sink=sink, timings=timings)
+            if args.rule_timings:
+                print(timing_report(timings, n_files))
+        finally:
+            if cache is not None:
+                cache.close()
+            if sink is not None:
+                sink.close()
+                print(f"Findings saved to {args.findings}")
+        return
+
     # Initialize file dialog
     Tk().withdraw()  # Hide the root window
     file_paths = filedialog.askopenfilenames(title="Select LAS Files", filetypes=[("LAS files", "*.las")])
@@ -108,16 +220,35 @@ def main():
         return
     
     # Verify each file
+    sink = open_findings_sink(args.findings) if args.findings else None
     results = []
+    data_bytes, data_seconds = 0, 0.0
     for file in file_paths:
-        status = verify_las_file(file)
+        findings = checker(file, args.tolerance, rules_config)
+        rate = ""
+        if args.data_qc:
+            data_findings, data = check_las_data(file, args.step_tolerance)
+            findings += data_findings
+            if data:
+                data_bytes += data["bytes"]
+                data_seconds += data["seconds"]
+                rate = f" ({data['mb_per_s']:.0f} MB/s)"
+        status = format_status(findings)
+        if sink is not None:
+            sink.write(findings)
         results.append({"File": os.path.basename(file), "Status": status})
-        print(f"{os.path.basename(file)}: {status}")
+        print(f"{os.path.basename(file)}: {status}{rate}")
+    if data_seconds:
+        print(f"Data sections: {data_bytes / 1e6:.1f} MB read in {data_seconds:.1f}s "
+              f"({data_bytes / 1e6 / data_seconds:.1f} MB/s)")
+    if sink is not None:
+        sink.close()
+        print(f"Findings saved to {args.findings}")
+    if args.rule_timings:
+        print(timing_report(engine.take_timings(), len(file_paths)))
     
     # Save results to timestamped CSV
     output_df = pd.DataFrame(results)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"las_verification_results_{timestamp}.csv"
     output_df.to_csv(output_file, index=False)
     print(f"Results saved to {output_file}")
 
@@ -1,15 +1,152 @@
+# --------------------------------------------------------------------------------------------------------------------------------
 # This Python code use to cut data part from LAS file and leave header only
-# Loop over all LAS files in the current directory, and the pattern \176A would therefore match the sequence ~A in LAS file
+# Loop over all LAS files in the current directory (and its sub-directories). Each file is read line by line and reading
+# stops at the ~A line (or the first LAS 3.0 ~*_Data line), so the data part is never read from disk.
+# Headers are written to <file>.las.header, or all into one consolidated output (text file or SQLite table).
+#
+# Usage: python LASExtract_header.py                          (writes <file>.las.header next to every LAS file under .)
+#        python LASExtract_header.py /archive/las --outdir headers --workers 16
+#        python LASExtract_header.py /archive/las --combined headers.sqlite      (or headers.txt)
+#--------------------------------------------------------------------------------------------------------------------------------
 import os
+import time
+import sqlite3
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-for filename in os.listdir('.'):
-    if filename.lower().endswith('.las'):
-        with open(filename, 'r') as f:
-            lines = f.readlines()
-
-        # Open a new file to write the header
-        with open(f"{filename}.header", 'w') as header_file:
-            for line in lines:
-                if '\176A' in line:  # Check for the marker \176A
-                    break  # Stop when the data part starts
-                header_file.write(line)
\ No newline at end of file
+from las_scan import section_name, is_data_section
+from qc_batch import iter_input_files
+
+# Separator line between headers in a consolidated text output
+COMBINED_SEPARATOR = "#### {path}\n"
+
+
+def extract_header(path):
+    """Return the bytes before the first data section line, reading line by line."""
+    lines = []
+    with open(path, 'rb') as f:
+        for line in f:
+            stripped = line.lstrip()
+            if stripped.startswith(b'~') and is_data_section(section_name(stripped.decode('latin-1'))):
+                break  # Stop when the data part starts
+            lines.append(line)
+    return b''.join(lines)
+
+
+def _bounded_map(pool, func, items, window):
+    """pool.map that keeps at most `window` tasks in flight, so 40k paths do not become 40k futures."""
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(func, item)))
+        if len(pending) >= window:
+            path, future = pending.popleft()
+            yield path, future
+    while pending:
+        yield pending.popleft()
+
+
+class _TextSink:
+    def __init__(self, path):
+        self.f = open(path, 'wb')
+
+    def write(self, las_path, header):
+        self.f.write(COMBINED_SEPARATOR.format(path=las_path).encode('latin-1'))
+        self.f.write(header if header.endswith(b'\n') or not header else header + b'\n')
+
+    def close(self):
+        self.f.close()
+
+
+class _SQLiteSink:
+    def __init__(self, path, batch_size=500):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS headers (path TEXT PRIMARY KEY, size INTEGER, header TEXT)")
+        self.batch_size = batch_size
+        self.rows = []
+
+    def write(self, las_path, header):
+        self.rows.append((las_path, os.path.getsize(las_path), header.decode('latin-1')))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.conn.executemany("INSERT OR REPLACE INTO headers VALUES (?, ?, ?)", self.rows)
+        self.conn.commit()
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def open_combined(path):
+    """Consolidated output: SQLite table headers(path, size, header) for .sqlite/.db, else one text file."""
+    if path.lower().endswith(('.sqlite', '.db')):
+        return _SQLiteSink(path)
+    return _TextSink(path)
+
+
+def extract_headers(sources, outdir=None, combined=None, workers=16, verbose=False):
+    """
+    Extract the header of every LAS file under `sources`. Without `combined`, each header is written to
+    <file>.header (next to the file, or mirrored under `outdir`). Files are read by a thread pool: the
+    work is I/O, and threads keep the consolidated output in the main thread. Returns a summary dict.
+    """
+    t0 = time.perf_counter()
+    summary = {"files": 0, "failed": 0, "header_bytes": 0, "skipped_bytes": 0, "seconds": 0.0}
+    sink = open_combined(combined) if combined else None
+    roots = [os.path.abspath(s) for s in sources]
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            files = iter_input_files(sources, ['.las'])
+            for filename, future in _bounded_map(pool, extract_header, files, window=workers * 4):
+                try:
+                    header = future.result()
+                except OSError as e:
+                    summary["failed"] += 1
+                    print(f"{filename}: {e}")
+                    continue
+                summary["files"] += 1
+                summary["header_bytes"] += len(header)
+                summary["skipped_bytes"] += max(os.path.getsize(filename) - len(header), 0)
+
+                if sink is not None:
+                    sink.write(filename, header)
+                    continue
+                # Open a new file to write the header
+                target = filename + '.header'
+                if outdir:
+                    absolute = os.path.abspath(filename)
+                    root = next((r for r in roots if absolute.startswith(r + os.sep)), os.path.dirname(absolute))
+                    target = os.path.join(outdir, os.path.relpath(absolute, root) + '.header')
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as header_file:
+                    header_file.write(header)
+                if verbose:
+                    print(f"{filename} -> {target}")
+    finally:
+        if sink is not None:
+            sink.close()
+    summary["seconds"] = time.perf_counter() - t0
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write the header part (everything before ~A) of LAS files.")
+    parser.add_argument("sources", nargs="*", default=["."],
+                        help="Directories (searched recursively), LAS files or text files listing LAS paths (default: .)")
+    parser.add_argument("--outdir", help="Write the .header files here, mirroring the input tree")
+    parser.add_argument("--combined", metavar="FILE",
+                        help="Write all headers into one output: .sqlite/.db table or a text file")
+    parser.add_argument("--workers", type=int, default=16, help="Reader threads (default: 16)")
+    parser.add_argument("--verbose", action="store_true", help="Print every file written")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = extract_headers(args.sources, args.outdir, args.combined, args.workers, args.verbose)
+    print(f"{result['files']} headers ({result['failed']} failed), {result['header_bytes'] / 1e6:.1f} MB written, "
+          f"{result['skipped_bytes'] / 1e6:.1f} MB of data not read, {result['seconds']:.1f}s "
+          f"({result['files'] / max(result['seconds'], 1e-9):.0f} files/s)")
@@ -1,10 +1,63 @@
+# ---------------------------------------------------------------------------------------
+# LogsSpikeDetection_IsoForest.py
+#
+# Spike detection in well logs with an unsupervised Isolation Forest.
+# Without arguments: pick LAS files in a dialog, type one curve name, and the logs are plotted
+# with the detected spikes. With arguments it runs headless over many files and curves:
+#   python LogsSpikeDetection_IsoForest.py /field/las --curves GR RHOB NPHI --outdir spikes --workers 16
+# One detector is fitted per (file, curve) in parallel worker processes; flags (<CURVE>_SPK,
+# 1 = spike) and scores (<CURVE>_IFS, negative = anomalous) are then written per file as new
+# curves of a copy of the LAS file (--format las) or as CSV columns (--format csv), and
+# spike_summary.csv lists the spike count of every file and curve. --plots DIR saves the plots.
+#
+# --engine hampel uses the rolling median/MAD detector of robust_spikes.py instead: linear in
+# the number of samples, all curves of a file in one pass, scores <CURVE>_HRZ (robust z-score).
+#   python LogsSpikeDetection_IsoForest.py --benchmark 1000000    (runtime and agreement of both)
+#
+# Fit once, score many (spike_model.py): --train MODEL fits one detector per curve family (or one
+# joint detector with --joint) on the reference wells given as sources; --engine model --model
+# MODEL scores new wells with it and a fixed field-wide threshold, scores <LABEL>_MDS.
+#
+# Streaming (robust_spikes.StreamingHampel): --replay BATCH feeds LAS files as a simulated rig
+# stream, BATCH samples at a time, and reports per-batch latency, throughput and the flag lag.
+#   python LogsSpikeDetection_IsoForest.py well.las --curves GR RHOB --replay 10 --max-lag 20
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import csv
+import time
+import shutil
+import argparse
+from collections import defaultdict
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from sklearn.ensemble import IsolationForest
-import lasio
+from las_curve_cache import read_las, HAS_LASIO
+from robust_spikes import detect_spikes_hampel, hampel, StreamingHampel, WINDOW, N_SIGMAS
+from spike_model import load_model, train_model
+from qc_batch import iter_named_files, run_parallel, TaskFailure
 from tkinter import Tk, filedialog
 
+if HAS_LASIO:
+    import lasio
+
+CONTAMINATION = 0.01
+RANDOM_STATE = 42
+FORMATS = ["csv", "las"]
+ENGINES = ["isoforest", "hampel", "model"]
+# Score curve suffix and description per engine
+SCORE_CURVES = {
+    "isoforest": ("_IFS", "IsolationForest score (<0 anomalous)"),
+    "hampel": ("_HRZ", "Hampel robust z-score"),
+    "model": ("_MDS", "field model score (<0 anomalous)"),
+}
+ENGINE_NAMES = {"isoforest": "IsolationForest", "hampel": "Hampel", "model": "field model"}
+SAMPLE_LAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "LAS20_test_1.las")
+
 # Function to load LAS files interactively
 def load_las_files():
     Tk().withdraw()  # Hide the root window
@@ -14,47 +67,441 @@ def load_las_files():
     )
     return file_paths
 
+def find_curve(las, curve_name):
+    """Mnemonic of `curve_name` in the file (exact match first, then case-insensitive), or None."""
+    names = las.keys()
+    if curve_name in names:
+        return curve_name
+    return next((n for n in names if n.upper() == curve_name.upper()), None)
+
+def detect_spikes(values, contamination=CONTAMINATION, n_estimators=100, random_state=RANDOM_STATE):
+    """
+    Fit an Isolation Forest on the finite samples of one curve.
+    Returns (flags, scores): True for spikes, and the decision function (negative = anomalous,
+    NaN where the curve is null).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    flags = np.zeros(len(values), dtype=bool)
+    scores = np.full(len(values), np.nan)
+    if valid.sum() < 2:
+        return flags, scores
+    iso_forest = IsolationForest(contamination=contamination, n_estimators=n_estimators, random_state=random_state)
+    x = values[valid].reshape(-1, 1)
+    flags[valid] = iso_forest.fit_predict(x) == -1
+    scores[valid] = iso_forest.decision_function(x)
+    return flags, scores
+
+def detect_curves(depth, values, engine="isoforest", **options):
+    """
+    Flags and scores of several curves at once: `values` is (n,) or (n, k) on the `depth` samples.
+    isoforest fits one forest per curve (options: contamination, n_estimators, random_state);
+    hampel runs the rolling median/MAD over all curves together (window, window_depth, n_sigmas).
+    """
+    if engine == "hampel":
+        return detect_spikes_hampel(depth, values, **options)
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return detect_spikes(values, **options)
+    flags = np.zeros(values.shape, dtype=bool)
+    scores = np.full(values.shape, np.nan)
+    for j in range(values.shape[1]):
+        flags[:, j], scores[:, j] = detect_spikes(values[:, j], **options)
+    return flags, scores
+
+def plot_spikes(ax, depth, values, flags, curve_name, unit, title):
+    ax.plot(depth, values, label=curve_name, color='blue')
+    ax.scatter(depth[flags], values[flags], color='red', label='Detected Spikes', zorder=5)
+    ax.set_xlabel('Depth (m)')
+    ax.set_ylabel(f'{curve_name} ({unit or "API"})')
+    ax.set_title(title)
+    ax.legend()
+
+def save_spike_plot(path, depth, values, flags, curve_name, unit, title):
+    """Write the plot to `path` without pyplot, so it works in headless worker processes."""
+    fig = Figure(figsize=(10, 6))
+    plot_spikes(fig.subplots(), depth, values, flags, curve_name, unit, title)
+    fig.savefig(path, dpi=100)
+
 # Process each LAS file
-def process_las_file(file_path, curve_name):
-    las = lasio.read(file_path)
-    if curve_name not in las.curves:
+def process_las_file(file_path, curve_name, engine="isoforest", **options):
+    las = read_las(file_path)  # memory-mapped from the curve cache after the first read
+    if engine == "model":
+        # Same lookup as the batch path: the detector's families under any of their aliases (GRC, RHOZ, ...)
+        detector = load_model(options["model"]).detectors.get(curve_name.upper())
+        if detector is None:
+            raise ValueError(f"{options['model']} has no detector for '{curve_name}'")
+        mnemonics = detector.resolve(las)
+        if mnemonics is None:
+            raise ValueError(f"Curves of detector '{detector.label}' not found in {file_path}")
+        mnemonic = mnemonics[0]
+    else:
+        mnemonic = find_curve(las, curve_name)
+    if mnemonic is None:
         raise ValueError(f"Curve '{curve_name}' not found in {file_path}")
 
-    # Extract depth and specified curve
-    depth = las["DEPT"]  # Assuming 'DEPT' is the depth curve name
-    curve_data = las[curve_name]
+    # Extract depth (the index curve) and specified curve
+    depth = np.asarray(las.index)
+    curve_data = np.asarray(las[mnemonic])
 
     # Create a DataFrame
     data = pd.DataFrame({'Depth': depth, curve_name: curve_data})
 
-    # Detect spikes using Isolation Forest
-    iso_forest = IsolationForest(contamination=0.01, random_state=42)
-    data['Anomaly_Score'] = iso_forest.fit_predict(data[[curve_name]])
-    data['Anomaly'] = data['Anomaly_Score'] == -1
+    # Detect spikes using Isolation Forest (or the rolling Hampel engine, or a trained field model)
+    if engine == "model":
+        flags, scores = detector.score(np.column_stack([np.asarray(las[m], dtype=np.float64) for m in mnemonics]))
+    else:
+        flags, scores = detect_curves(depth, data[curve_name], engine, **options)
+    data['Anomaly_Score'] = scores
+    data['Anomaly'] = flags
 
     # Plot the curve with anomalies highlighted
     plt.figure(figsize=(10, 6))
-    plt.plot(data['Depth'], data[curve_name], label=curve_name, color='blue')
-    plt.scatter(data['Depth'][data['Anomaly']], data[curve_name][data['Anomaly']], 
-                color='red', label='Detected Spikes', zorder=5)
-    plt.xlabel('Depth (m)')
-    plt.ylabel(f'{curve_name} (API)')
-    plt.title(f'{curve_name} Log with Detected Spikes in {file_path}')
-    plt.legend()
+    plot_spikes(plt.gca(), depth, curve_data, flags, curve_name, None,
+                f'{curve_name} Log with Detected Spikes in {file_path}')
     plt.show()
 
+
+# --------------------------------------------------
+# Batch mode
+# --------------------------------------------------
+
+def _detect_task(task, spill_dir, plot_dir=None, engine="isoforest", options=None):
+    """
+    Worker: detect spikes in the curves of one file (one curve per task for isoforest, all
+    curves of the file for hampel). Flags and scores are spilled to an .npz file per curve.
+    Returns one entry per requested curve, None where the file has no such curve.
+    """
+    path, name, curve_names = task
+    las = read_las(path)
+    if engine == "model":
+        return _score_with_model(las, name, curve_names, spill_dir, plot_dir, options["model"])
+    mnemonics = [find_curve(las, c) for c in curve_names]
+    found = list(dict.fromkeys(m for m in mnemonics if m is not None))
+    if not found:
+        return [None] * len(curve_names)
+    depth = np.asarray(las.index)
+    values = np.column_stack([np.asarray(las[m], dtype=np.float64) for m in found])
+    flags, scores = detect_curves(depth, values, engine, **(options or {}))
+    results = {}
+    for j, mnemonic in enumerate(found):
+        spill = os.path.join(spill_dir, f"{name}.{mnemonic}.npz")
+        np.savez(spill, flags=flags[:, j], scores=scores[:, j])
+        if plot_dir:
+            unit = next((c.unit for c in las.curves if c.mnemonic == mnemonic), None)
+            save_spike_plot(os.path.join(plot_dir, f"{name}_{mnemonic}.png"), depth, values[:, j], flags[:, j],
+                            mnemonic, unit, f'{mnemonic} Log with Detected Spikes in {os.path.basename(path)}')
+        results[mnemonic] = {"curve": mnemonic, "rows": len(depth), "spikes": int(flags[:, j].sum()),
+                             "spill": spill, "engine": engine}
+    return [results.get(m) if m is not None else None for m in mnemonics]
+
+
+def _score_with_model(las, name, labels, spill_dir, plot_dir, model_path):
+    """_detect_task for the model engine: each label is a detector of the model file."""
+    model = load_model(model_path)  # loaded once per worker process
+    depth = np.asarray(las.index)
+    results = []
+    for label in labels:
+        detector = model.detectors.get(label.upper())
+        mnemonics = detector.resolve(las) if detector else None
+        if mnemonics is None:
+            results.append(None)
+            continue
+        values = np.column_stack([np.asarray(las[m], dtype=np.float64) for m in mnemonics])
+        flags, scores = detector.score(values)
+        spill = os.path.join(spill_dir, f"{name}.{detector.label}.npz")
+        np.savez(spill, flags=flags, scores=scores)
+        if plot_dir:
+            save_spike_plot(os.path.join(plot_dir, f"{name}_{detector.label}.png"), depth, values[:, 0], flags,
+                            mnemonics[0], None, f'{detector.label} Log with Detected Spikes in {name}')
+        results.append({"curve": detector.label, "sources": mnemonics, "rows": len(depth),
+                        "spikes": int(flags.sum()), "spill": spill, "engine": "model"})
+    return results
+
+
+def _write_task(task, outdir, fmt="csv"):
+    """Worker: add the spilled flags/scores of one file as curves (LAS) or columns (CSV)."""
+    path, name, results = task
+    spikes = [(r["curve"], np.load(r["spill"])) for r in results]
+    suffix, descr = SCORE_CURVES[results[0]["engine"]]
+    engine_name = ENGINE_NAMES[results[0]["engine"]]
+    if fmt == "las":
+        las = lasio.read(path)
+        for mnemonic, spill in spikes:
+            las.append_curve(f"{mnemonic}_SPK", spill["flags"].astype(np.float64), unit="",
+                             descr=f"{mnemonic} spike flag ({engine_name})")
+            las.append_curve(f"{mnemonic}{suffix}", spill["scores"], unit="", descr=f"{mnemonic} {descr}")
+        # lasio.write recomputes STRT/STOP/STEP from the index but needs the items to exist
+        index_unit = las.curves[0].unit if las.curves else ""
+        for i, (mnemonic, descr) in enumerate([("STRT", "START DEPTH"), ("STOP", "STOP DEPTH"), ("STEP", "STEP")]):
+            if mnemonic not in las.well:
+                las.well.insert(i, lasio.HeaderItem(mnemonic, unit=index_unit, value=0, descr=descr))
+        target = os.path.join(outdir, f"{name}_spikes.las")
+        partial = target + ".partial"
+        try:
+            with open(partial, "w") as f:
+                las.write(f)
+            os.replace(partial, target)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+    else:
+        las = read_las(path)
+        columns = {las.keys()[0]: np.asarray(las.index)}
+        for r, (mnemonic, spill) in zip(results, spikes):
+            for source in r.get("sources", [mnemonic]):
+                columns[source] = np.asarray(las[source])
+            columns[f"{mnemonic}_SPK"] = spill["flags"].astype(np.int8)
+            columns[f"{mnemonic}{suffix}"] = spill["scores"]
+        target = os.path.join(outdir, f"{name}_spikes.csv")
+        pd.DataFrame(columns).to_csv(target, index=False)
+    for r in results:
+        os.remove(r["spill"])
+    return target
+
+def run_batch(sources, curves, outdir, fmt="csv", workers=None, timeout=None, plots=None, engine="isoforest",
+              options=None, verbose=True):
+    """
+    Despike every LAS file under `sources` for each of `curves`: one detector per (file, curve)
+    in parallel (per file for hampel), then one output file per LAS file. `options` are the
+    engine parameters (see detect_curves). Returns totals.
+    """
+    t0 = time.perf_counter()
+    spill_dir = os.path.join(outdir, ".spike_parts")
+    os.makedirs(spill_dir, exist_ok=True)
+    if plots:
+        os.makedirs(plots, exist_ok=True)
+    totals = {"files": 0, "curves": 0, "spikes": 0, "missing": 0, "failed": 0, "seconds": 0.0}
+
+    files = list(iter_named_files(sources, [".las"]))
+    if engine in ("hampel", "model"):
+        tasks = [(path, name, tuple(curves)) for path, name in files]
+    else:
+        tasks = [(path, name, (curve,)) for path, name in files for curve in curves]
+    kwargs = {"spill_dir": spill_dir, "plot_dir": plots, "engine": engine, "options": options}
+    found = defaultdict(list)
+    summary_path = os.path.join(outdir, "spike_summary.csv")
+    with open(summary_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["File", "Curve", "Rows", "Spikes", "Seconds", "Status"])
+        for (path, name, task_curves), results, seconds in run_parallel(_detect_task, tasks, workers, timeout, kwargs):
+            if isinstance(results, TaskFailure):
+                totals["failed"] += len(task_curves)
+                print(f"❌ {path} {' '.join(task_curves)}: {results}")
+                for curve in task_curves:
+                    writer.writerow([path, curve, "", "", f"{seconds:.2f}", results])
+                continue
+            for curve, result in zip(task_curves, results):
+                if result is None:
+                    totals["missing"] += 1
+                    writer.writerow([path, curve, "", "", f"{seconds:.2f}", "Curve not found"])
+                    continue
+                totals["curves"] += 1
+                totals["spikes"] += result["spikes"]
+                found[(path, name)].append(result)
+                writer.writerow([path, result["curve"], result["rows"], result["spikes"], f"{seconds:.2f}", "OK"])
+                if verbose:
+                    print(f"{path} {result['curve']}: {result['spikes']} spikes in {result['rows']} samples")
+
+    # Results of a file are written once all its curves are done, again in parallel
+    order = [(path, name, found[(path, name)]) for path, name in files if found[(path, name)]]
+    for (path, _, _), result, seconds in run_parallel(_write_task, order, workers, timeout,
+                                                      {"outdir": outdir, "fmt": fmt}):
+        if isinstance(result, TaskFailure):
+            totals["failed"] += 1
+            print(f"❌ {path}: {result}")
+            continue
+        totals["files"] += 1
+        if verbose:
+            print(f"✔ {result}")
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    totals["seconds"] = time.perf_counter() - t0
+    return totals
+
+def synthetic_log(rows, seed=0, spike_rate=0.002, streak_rate=0.02, streak_length=60):
+    """
+    Test curve: trend + noise, single-sample spikes and high-but-valid streaks (e.g. hot shale
+    beds). Returns depth, values, spike mask, streak mask.
+    """
+    rng = np.random.default_rng(seed)
+    depth = 1000.0 + np.arange(rows) * 0.01
+    values = 60 + 20 * np.sin(depth / 15.0) + rng.normal(0, 3, rows)
+    streaks = np.zeros(rows, dtype=bool)
+    for start in rng.integers(0, max(rows - streak_length, 1), int(rows * streak_rate / streak_length)):
+        streaks[start:start + streak_length] = True
+    values[streaks] += 40
+    spikes = np.zeros(rows, dtype=bool)
+    spikes[rng.choice(rows, int(rows * spike_rate), replace=False)] = True
+    values[spikes] += rng.choice([-1, 1], spikes.sum()) * rng.uniform(30, 80, spikes.sum())
+    return depth, values, spikes, streaks
+
+def _agreement(a, b):
+    """Jaccard index of two flag arrays (1.0 when neither flags anything)."""
+    union = (a | b).sum()
+    return (a & b).sum() / union if union else 1.0
+
+def benchmark(rows=200000, paths=(SAMPLE_LAS,), seed=0, hampel_options=None):
+    """Runtime and agreement of the isoforest and hampel engines on LAS files and a synthetic curve."""
+    hampel_options = hampel_options or {}
+    print(f"{'curve':<28}{'samples':>10}{'IF s':>9}{'Hampel s':>10}{'IF flags':>10}{'H flags':>9}{'both':>7}{'Jaccard':>9}")
+
+    def compare(label, depth, values):
+        t0 = time.perf_counter()
+        if_flags, _ = detect_curves(depth, values, "isoforest")
+        t1 = time.perf_counter()
+        h_flags, _ = detect_curves(depth, values, "hampel", **hampel_options)
+        t2 = time.perf_counter()
+        print(f"{label:<28}{len(values):>10}{t1 - t0:>9.3f}{t2 - t1:>10.3f}{int(if_flags.sum()):>10}"
+              f"{int(h_flags.sum()):>9}{int((if_flags & h_flags).sum()):>7}{_agreement(if_flags, h_flags):>9.2f}")
+        return if_flags, h_flags
+
+    for path in paths:
+        las = read_las(path)
+        for mnemonic in las.keys()[1:]:
+            compare(f"{os.path.basename(path)}:{mnemonic}"[:27], np.asarray(las.index), np.asarray(las[mnemonic]))
+
+    depth, values, spikes, streaks = synthetic_log(rows, seed)
+    if_flags, h_flags = compare("synthetic", depth, values)
+    for name, flags in (("isoforest", if_flags), ("hampel", h_flags)):
+        print(f"  {name:<10} spikes found {int((flags & spikes).sum())}/{int(spikes.sum())}, "
+              f"valid streak samples flagged {int((flags & streaks & ~spikes).sum())}/{int(streaks.sum())}")
+
+def replay(path, curves=None, batch_rows=10, window=WINDOW, n_sigmas=N_SIGMAS, max_lag=None):
+    """
+    Feed a LAS file to a StreamingHampel `batch_rows` samples at a time, as data would arrive from
+    the rig. Prints per-batch latency, throughput, the flag lag and the agreement with the
+    whole-log hampel(); returns the collected stats.
+    """
+    las = read_las(path)
+    mnemonics = [find_curve(las, c) for c in curves] if curves else las.keys()[1:]
+    mnemonics = [m for m in mnemonics if m is not None]
+    if not mnemonics:
+        raise ValueError(f"None of the curves is in {path}")
+    depth = np.asarray(las.index, dtype=np.float64)
+    values = np.column_stack([np.asarray(las[m], dtype=np.float64) for m in mnemonics])
+
+    detector = StreamingHampel(len(mnemonics), window, n_sigmas, max_lag=max_lag)
+    latencies, lags, outputs = [], [], []
+    t0 = time.perf_counter()
+    for start in range(0, len(depth), batch_rows):
+        t = time.perf_counter()
+        outputs.append(detector.push(depth[start:start + batch_rows], values[start:start + batch_rows]))
+        latencies.append(time.perf_counter() - t)
+        lags.append(detector.received - detector.emitted)
+    outputs.append(detector.flush())
+    total = time.perf_counter() - t0
+
+    flags = np.concatenate([o.flags for o in outputs])
+    reference, _ = hampel(values, detector.window, n_sigmas)
+    latencies = np.array(latencies) * 1000
+    step = np.nanmedian(np.abs(np.diff(depth))) if len(depth) > 1 else float("nan")
+    stats = {"samples": len(depth), "curves": mnemonics, "batches": len(latencies), "seconds": total,
+             "samples_per_s": len(depth) / total if total else float("inf"),
+             "latency_ms": {p: float(np.percentile(latencies, p)) for p in (50, 95, 99, 100)},
+             "max_lag": max(lags, default=0), "lag_depth": detector.lag * step, "spikes": int(flags.sum()),
+             "agreement": float((flags == reference).mean()) if len(flags) else 1.0}
+    print(f"{path}: {len(depth)} samples x {len(mnemonics)} curves ({' '.join(mnemonics)}) in {stats['batches']} "
+          f"batches of {batch_rows}, window {detector.window}")
+    print(f"  throughput {stats['samples_per_s']:.0f} samples/s; batch latency p50 {stats['latency_ms'][50]:.3f} ms, "
+          f"p95 {stats['latency_ms'][95]:.3f} ms, p99 {stats['latency_ms'][99]:.3f} ms, max {stats['latency_ms'][100]:.3f} ms")
+    print(f"  flags final {detector.lag} samples ({stats['lag_depth']:.3g} depth units) after arrival, "
+          f"max observed {stats['max_lag']}; {stats['spikes']} spikes, "
+          f"{stats['agreement'] * 100:.2f}% agreement with the whole-log Hampel")
+    return stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detect spikes in LAS curves with an Isolation Forest.")
+    parser.add_argument("sources", nargs="*",
+                        help="Directories (searched recursively), LAS files or list files; none starts the dialog")
+    parser.add_argument("--curves", nargs="+", help="Curve mnemonics to despike, e.g. GR RHOB NPHI")
+    parser.add_argument("--outdir", default="spikes_out", help="Output directory (default: spikes_out)")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="csv: <file>_spikes.csv; las: copy of the LAS file with the new curves")
+    parser.add_argument("--plots", metavar="DIR", help="Save a PNG per file and curve in DIR")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-task timeout in seconds")
+    parser.add_argument("--engine", choices=ENGINES, default="isoforest",
+                        help="isoforest (default) or hampel (rolling median/MAD, linear time)")
+    parser.add_argument("--contamination", type=float, default=CONTAMINATION,
+                        help=f"isoforest: expected share of spikes (default: {CONTAMINATION})")
+    parser.add_argument("--n-estimators", type=int, default=100, help="isoforest: trees per forest (default: 100)")
+    parser.add_argument("--window", type=int, default=WINDOW, help=f"hampel: window in samples (default: {WINDOW})")
+    parser.add_argument("--window-depth", type=float, help="hampel: window in depth units (overrides --window)")
+    parser.add_argument("--n-sigmas", type=float, default=N_SIGMAS,
+                        help=f"hampel: robust z-score above which a sample is a spike (default: {N_SIGMAS})")
+    parser.add_argument("--train", metavar="MODEL",
+                        help="Train a field spike model on the reference wells given as sources and save it to MODEL")
+    parser.add_argument("--joint", action="store_true", help="--train: one detector over all --curves together")
+    parser.add_argument("--max-rows-per-well", type=int, default=20000,
+                        help="--train: random samples taken from each reference well (default: 20000)")
+    parser.add_argument("--model", help="model engine: model file written by --train")
+    parser.add_argument("--replay", type=int, metavar="BATCH",
+                        help="Replay the LAS sources as a stream of BATCH samples through the incremental detector")
+    parser.add_argument("--max-lag", type=int, help="--replay: latency budget in samples (sets the window)")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS",
+                        help="Compare both engines on the sources (default: the bundled sample LAS) "
+                             "and on a synthetic curve of ROWS samples")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary and failures")
+    args = parser.parse_args(argv)
+    if args.engine == "model" and not args.model:
+        parser.error("--engine model needs --model")
+    if args.model and not args.train:
+        args.engine = "model"
+        if not args.curves:
+            args.curves = list(load_model(args.model).detectors)
+    if args.train and not (args.sources and args.curves):
+        parser.error("--train needs reference wells and --curves")
+    if args.replay and not args.sources:
+        parser.error("--replay needs LAS files")
+    if args.sources and not args.curves and not (args.benchmark or args.replay):
+        parser.error("--curves is required in batch mode")
+    if args.curves:
+        seen = set()
+        args.curves = [c for c in args.curves if not (c.upper() in seen or seen.add(c.upper()))]
+    if args.format == "las" and not HAS_LASIO:
+        parser.error("--format las needs lasio (pip install lasio)")
+    return args
+
+def engine_options(args):
+    if args.engine == "model":
+        return {"model": args.model}
+    if args.engine == "hampel":
+        return {"window": args.window, "window_depth": args.window_depth, "n_sigmas": args.n_sigmas}
+    return {"contamination": args.contamination, "n_estimators": args.n_estimators}
+
 # Main script
 if __name__ == "__main__":
-    print("Select LAS file(s) for processing...")
-    las_files = load_las_files()
-
-    if not las_files:
-        print("No files selected. Exiting.")
+    args = parse_args()
+    if args.train:
+        model = train_model(args.sources, args.curves, args.joint, args.contamination, args.n_estimators,
+                            args.max_rows_per_well, args.workers, verbose=not args.quiet)
+        model.save(args.train)
+        print(model.describe())
+        print(f"Saved {args.train}")
+    elif args.replay:
+        for path, _ in iter_named_files(args.sources, [".las"]):
+            replay(path, args.curves, args.replay, args.window, args.n_sigmas, args.max_lag)
+    elif args.benchmark:
+        paths = list(iter_named_files(args.sources, [".las"])) if args.sources else [(SAMPLE_LAS, None)]
+        benchmark(args.benchmark, [path for path, _ in paths],
+                  hampel_options={"window": args.window, "window_depth": args.window_depth, "n_sigmas": args.n_sigmas})
+    elif args.sources:
+        totals = run_batch(args.sources, args.curves, args.outdir, args.format, args.workers, args.timeout,
+                           args.plots, args.engine, engine_options(args), verbose=not args.quiet)
+        print(f"\n{totals['files']} files written to {args.outdir}: {totals['curves']} curves, "
+              f"{totals['spikes']} spikes ({totals['missing']} curves not found, {totals['failed']} failed) "
+              f"in {totals['seconds']:.1f}s")
     else:
-        curve_name = input("Enter the curve name to process (e.g., GR for Gamma Ray): ").strip()
-        for file_path in las_files:
-            try:
-                print(f"Processing file: {file_path}")
-                process_las_file(file_path, curve_name)
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+        print("Select LAS file(s) for processing...")
+        las_files = load_las_files()
+
+        if not las_files:
+            print("No files selected. Exiting.")
+        else:
+            curve_name = input("Enter the curve name to process (e.g., GR for Gamma Ray): ").strip()
+            for file_path in las_files:
+                try:
+                    print(f"Processing file: {file_path}")
+                    process_las_file(file_path, curve_name, args.engine, **engine_options(args))
+                except Exception as e:
+                    print(f"Error processing {file_path}: {e}")
@@ -1,93 +1,471 @@
 # --- Multi-Well Rock Typing (Electrofacies Classification using Well Logs) ---
 # Objective: Automatically cluster multiple wells' log responses (GR, RHOB, NPHI, DT) into consistent electrofacies.
-# Use Case: 
+# Use Case:
+#
+# Without arguments the well CSV files are picked in a dialog and processed in memory (Steps 1-7).
+# For large fields the streaming mode keeps memory bounded by the chunk size instead of the field size:
+#   python MultiWell_RockTyping_using_logs.py /field/csv --streaming --chunk-rows 200000 --clusters 4
+#   pass 1: scaler statistics by partial fits over chunks of every well file (+ a bounded random
+#           sample of rows to initialise the centroids with k-means++)
+#   pass 2: MiniBatchKMeans partial fits over the scaled chunks (--epochs passes, files shuffled)
+#   pass 3: facies assigned file by file and appended to the same Techlog-ready CSV
+#
+# Headless plots: --plots DIR renders the crossplot and one depth track per well off-screen, in
+# parallel worker processes, to PNG or PDF (--plot-format); --summary FILE.pdf collects them in
+# one multi-page document. Per-well views come from one groupby pass over the samples.
+#
+# Field model (facies_model.py): --save-model FILE keeps the scaler, the centroids and the facies
+# names of a fit; --model FILE assigns new wells with that model (nearest centroid, no refit).
+# Electrofacies ids are numbered by increasing centroid GR, so they are the same in every run.
+# --select-k KMIN KMAX picks the number of clusters by silhouette on a random field sample.
 
 import pandas as pd
 import numpy as np
 import os
+import shutil
+import argparse
+import tempfile
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
 from tkinter import Tk, filedialog
 
-# --- Step 1: Browse & Select Multiple Well Files ---
-root = Tk()
-root.withdraw()  # Hide main Tkinter window
-file_paths = filedialog.askopenfilenames(
-    title="Select Well Log CSV Files",
-    filetypes=[("CSV files", "*.csv")]
-)
-root.update()
-
-if not file_paths:
-    raise FileNotFoundError("⚠️ No CSV files selected. Please select one or more well log files.")
-
-dataframes = []
-for file in file_paths:
-    well_name = os.path.splitext(os.path.basename(file))[0].replace("well_logs_", "")
-    df = pd.read_csv(file)
-    df["Well"] = well_name
-    dataframes.append(df)
-
-# Combine all selected wells
-df_all = pd.concat(dataframes, ignore_index=True)
-print(f"✅ Loaded {len(file_paths)} wells, total samples: {len(df_all)}")
-
-# --- Step 2: Feature Selection & Scaling ---
+from qc_batch import iter_input_files, run_parallel, TaskFailure
+from facies_model import FaciesModel, select_n_clusters
+
 features = ["GR", "RHOB", "NPHI", "DT"]
-df_all = df_all.dropna(subset=features)  # Remove rows with missing key logs
-
-X_scaled = StandardScaler().fit_transform(df_all[features])
-
-# --- Step 3: K-Means Clustering (Global Model) ---
-n_clusters = 4
-kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-df_all["Electrofacies"] = kmeans.fit_predict(X_scaled)
-
-# --- Step 4: Facies Labeling (Based on Mean GR) ---
-cluster_summary = df_all.groupby("Electrofacies")[["GR", "RHOB", "NPHI"]].mean()
-print("\nCluster Summary (All Wells):\n", cluster_summary)
-
-facies_map = {}
-gr_means = cluster_summary["GR"].sort_values()
-for cluster in gr_means.index:
-    if gr_means[cluster] < 80:
-        facies_map[cluster] = "Sandstone"
-    elif gr_means[cluster] < 100:
-        facies_map[cluster] = "Siltstone"
-    else:
-        facies_map[cluster] = "Shale"
-
-df_all["Facies_Label"] = df_all["Electrofacies"].map(facies_map)
-
-# --- Step 5: Visualization Example (One Well) ---
-plt.figure(figsize=(6, 5))
-subset = df_all[df_all["Well"] == df_all["Well"].unique()[0]]
-for label in subset["Facies_Label"].unique():
-    part = subset[subset["Facies_Label"] == label]
-    plt.scatter(part["GR"], part["RHOB"], label=label, s=40)
-plt.xlabel("Gamma Ray (API)")
-plt.ylabel("Bulk Density (g/cc)")
-plt.title(f"Electrofacies Crossplot (Example Well: {subset['Well'].iloc[0]})")
-plt.legend()
-plt.show()
-
-# --- Step 6: Depth Track Visualization per Well ---
-facies_colors = {"Sandstone": "gold", "Siltstone": "green", "Shale": "gray"}
-for well in df_all["Well"].unique():
-    wdf = df_all[df_all["Well"] == well]
-    plt.figure(figsize=(3, 8))
-    plt.scatter(wdf["Facies_Label"], wdf["Depth"], c=wdf["Facies_Label"].map(facies_colors), s=25)
-    plt.gca().invert_yaxis()
-    plt.xlabel("Facies")
-    plt.ylabel("Depth (m)")
-    plt.title(f"Facies vs Depth Track: {well}")
-    plt.show()
-
-# --- Step 7: Save Combined Techlog-Ready Output ---
 output_cols = ["Well", "Depth", "Electrofacies", "Facies_Label"]
-output_file = "field_electrofacies_combined.csv"
-df_all[output_cols].to_csv(output_file, index=False)
+OUTPUT_FILE = "field_electrofacies_combined.csv"
+N_CLUSTERS = 4
+CHUNK_ROWS = 200000
+INIT_SAMPLE_ROWS = 50000
+RANDOM_STATE = 42
+PLOT_FORMATS = ["png", "pdf"]
+facies_colors = {"Sandstone": "gold", "Siltstone": "green", "Shale": "gray"}
+TRACKS_PER_PAGE = 6
+
+
+def well_name_of(file):
+    return os.path.splitext(os.path.basename(file))[0].replace("well_logs_", "")
+
+
+def facies_map_from_gr(gr_means):
+    """Cluster -> facies name from the mean GR of each cluster (Step 4)."""
+    facies_map = {}
+    gr_means = gr_means.sort_values()
+    for cluster in gr_means.index:
+        if gr_means[cluster] < 80:
+            facies_map[cluster] = "Sandstone"
+        elif gr_means[cluster] < 100:
+            facies_map[cluster] = "Siltstone"
+        else:
+            facies_map[cluster] = "Shale"
+    return facies_map
+
+
+def choose_n_clusters(x_scaled, k_range, sample_rows=INIT_SAMPLE_ROWS, random_state=RANDOM_STATE):
+    """Number of clusters in k_range (kmin, kmax) with the best silhouette on a random sample of x_scaled."""
+    if len(x_scaled) > sample_rows:
+        rng = np.random.default_rng(random_state)
+        x_scaled = x_scaled[rng.choice(len(x_scaled), sample_rows, replace=False)]
+    table, best = select_n_clusters(x_scaled, range(k_range[0], k_range[1] + 1), random_state=random_state)
+    print(f"\nCluster count selection ({len(x_scaled)} samples):\n", table)
+    print(f"✅ Using {best} clusters (best silhouette)")
+    return best
+
+
+# --------------------------------------------------
+# Plots
+# --------------------------------------------------
+
+def draw_crossplot(ax, subset):
+    """Step 5: GR-RHOB crossplot of one well coloured by facies."""
+    for label in subset["Facies_Label"].unique():
+        part = subset[subset["Facies_Label"] == label]
+        ax.scatter(part["GR"], part["RHOB"], label=label, s=40)
+    ax.set_xlabel("Gamma Ray (API)")
+    ax.set_ylabel("Bulk Density (g/cc)")
+    ax.set_title(f"Electrofacies Crossplot (Example Well: {subset['Well'].iloc[0]})")
+    ax.legend()
+
+
+def draw_depth_track(ax, well, depth, labels):
+    """Step 6: facies against depth for one well."""
+    ax.scatter(labels, depth, c=pd.Series(labels).map(facies_colors).fillna("black").to_numpy(), s=25)
+    ax.invert_yaxis()
+    ax.set_xlabel("Facies")
+    ax.set_ylabel("Depth (m)")
+    ax.set_title(f"Facies vs Depth Track: {well}")
+
+
+def iter_well_views(df):
+    """(well, depth, facies labels) per well from one groupby pass (not one filter per well)."""
+    for well, wdf in df.groupby("Well", sort=False):
+        yield well, wdf["Depth"].to_numpy(), wdf["Facies_Label"].to_numpy(dtype=object)
+
+
+def iter_output_wells(output_file, chunk_rows=CHUNK_ROWS):
+    """Per-well views read back from a combined CSV written well by well; one well in memory at a time."""
+    parts, current = [], None
+    for chunk in pd.read_csv(output_file, chunksize=chunk_rows, dtype={"Well": str}):
+        for well, wdf in chunk.groupby("Well", sort=False):
+            if well != current and parts:
+                yield from iter_well_views(pd.concat(parts))
+                parts = []
+            current = well
+            parts.append(wdf)
+    if parts:
+        yield from iter_well_views(pd.concat(parts))
+
+
+def _safe_name(name):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(name))
+
+
+def _render_track(task, outdir, plot_format="png", thumbdir=None):
+    """Worker: depth track of one well to <outdir>/<well>_facies.<fmt> (and a PNG thumbnail for the summary)."""
+    well, depth, labels = task
+    fig = Figure(figsize=(3, 8))
+    draw_depth_track(fig.subplots(), well, depth, labels)
+    fig.tight_layout()
+    paths = []
+    if outdir:
+        paths.append(os.path.join(outdir, f"{_safe_name(well)}_facies.{plot_format}"))
+        fig.savefig(paths[-1], dpi=100)
+    if thumbdir:
+        paths.append(os.path.join(thumbdir, f"{_safe_name(well)}.png"))
+        fig.savefig(paths[-1], dpi=60)
+    return paths
+
+
+def save_crossplot(path, subset):
+    fig = Figure(figsize=(6, 5))
+    draw_crossplot(fig.subplots(), subset)
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+
+
+def write_summary(path, crossplot, cluster_summary, thumbnails):
+    """Multi-page PDF: crossplot and cluster summary, then TRACKS_PER_PAGE depth tracks per page."""
+    with PdfPages(path) as pdf:
+        fig = Figure(figsize=(8.27, 11.69))
+        ax_text, ax_plot = fig.subplots(2, 1, gridspec_kw={"height_ratios": [1, 2]})
+        ax_text.axis("off")
+        ax_text.set_title("Electrofacies summary")
+        ax_text.text(0, 1, "Cluster Summary (All Wells):\n" + cluster_summary.to_string(), va="top",
+                     family="monospace", fontsize=9)
+        if crossplot is not None:
+            draw_crossplot(ax_plot, crossplot)
+        else:
+            ax_plot.axis("off")
+        pdf.savefig(fig)
+        for start in range(0, len(thumbnails), TRACKS_PER_PAGE):
+            fig = Figure(figsize=(11.69, 8.27))
+            axes = fig.subplots(1, TRACKS_PER_PAGE)
+            for ax, thumb in zip(axes, thumbnails[start:start + TRACKS_PER_PAGE] + [None] * TRACKS_PER_PAGE):
+                ax.axis("off")
+                if thumb:
+                    ax.imshow(plt.imread(thumb))
+            pdf.savefig(fig)
+
+
+def plot_wells(views, plot_dir=None, plot_format="png", summary=None, crossplot=None, cluster_summary=None,
+               workers=None):
+    """
+    Render the depth track of every well in parallel worker processes, off-screen; write the
+    crossplot and the optional multi-page summary. Returns the number of wells plotted.
+    """
+    if plot_dir:
+        os.makedirs(plot_dir, exist_ok=True)
+        if crossplot is not None:
+            save_crossplot(os.path.join(plot_dir, f"crossplot_{_safe_name(crossplot['Well'].iloc[0])}.{plot_format}"),
+                           crossplot)
+    thumbdir = tempfile.mkdtemp(prefix="facies_tracks_") if summary else None
+    thumbnails = {}
+    order = []
+
+    def tasks():
+        for view in views:
+            order.append(view[0])
+            yield view
+
+    try:
+        kwargs = {"outdir": plot_dir, "plot_format": plot_format, "thumbdir": thumbdir}
+        for (well, _, _), paths, _ in run_parallel(_render_track, tasks(), workers, None, kwargs):
+            if isinstance(paths, TaskFailure):
+                print(f"❌ Plot of {well}: {paths}")
+                continue
+            if thumbdir:
+                thumbnails[well] = paths[-1]
+        if summary:
+            write_summary(summary, crossplot, cluster_summary, [thumbnails[w] for w in order if w in thumbnails])
+    finally:
+        if thumbdir:
+            shutil.rmtree(thumbdir, ignore_errors=True)
+    return len(order)
+
+
+# --------------------------------------------------
+# In-memory workflow (all wells in one DataFrame)
+# --------------------------------------------------
+
+def run_in_memory(file_paths, n_clusters=N_CLUSTERS, output_file=OUTPUT_FILE, show_plots=True, plot_dir=None,
+                  plot_format="png", summary=None, workers=None, k_range=None, save_model=None):
+    dataframes = []
+    for file in file_paths:
+        well_name = well_name_of(file)
+        df = pd.read_csv(file)
+        df["Well"] = well_name
+        dataframes.append(df)
+
+    # Combine all selected wells
+    df_all = pd.concat(dataframes, ignore_index=True)
+    print(f"✅ Loaded {len(file_paths)} wells, total samples: {len(df_all)}")
+
+    # --- Step 2: Feature Selection & Scaling ---
+    df_all = df_all.dropna(subset=features)  # Remove rows with missing key logs
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(df_all[features].to_numpy(dtype=np.float64))
+    if k_range:
+        n_clusters = choose_n_clusters(X_scaled, k_range)
 
-print(f"\n✅ Combined Techlog-ready electrofacies file saved as: {output_file}")
-print(f"Includes {len(df_all)} total samples from {len(file_paths)} wells.")
+    # --- Step 3: K-Means Clustering (Global Model) ---
+    kmeans = KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE).fit(X_scaled)
+    model, order = FaciesModel.from_fit(scaler, kmeans.cluster_centers_, facies_map_from_gr, len(df_all),
+                                        file_paths, features)
+    # Stable ids: clusters numbered by increasing centroid GR
+    df_all["Electrofacies"] = np.argsort(order)[kmeans.labels_]
+
+    # --- Step 4: Facies Labeling (Based on Mean GR) ---
+    cluster_summary = df_all.groupby("Electrofacies")[["GR", "RHOB", "NPHI"]].mean()
+    print("\nCluster Summary (All Wells):\n", cluster_summary)
+
+    # The centroid GR of a cluster is the mean GR of its samples
+    df_all["Facies_Label"] = df_all["Electrofacies"].map(model.facies_map)
+
+    # --- Step 5: Visualization Example (One Well) ---
+    subset = df_all[df_all["Well"] == df_all["Well"].iloc[0]]
+    if plot_dir or summary:
+        # Off-screen, in parallel worker processes, to files
+        n = plot_wells(iter_well_views(df_all), plot_dir, plot_format, summary, subset, cluster_summary, workers)
+        print(f"✅ Plotted {n} wells" + (f" to {plot_dir}" if plot_dir else "") + (f", summary {summary}" if summary else ""))
+    elif show_plots:
+        plt.figure(figsize=(6, 5))
+        draw_crossplot(plt.gca(), subset)
+        plt.show()
+
+        # --- Step 6: Depth Track Visualization per Well ---
+        for well, depth, labels in iter_well_views(df_all):
+            plt.figure(figsize=(3, 8))
+            draw_depth_track(plt.gca(), well, depth, labels)
+            plt.show()
+
+    # --- Step 7: Save Combined Techlog-Ready Output ---
+    df_all[output_cols].to_csv(output_file, index=False)
+
+    print(f"\n✅ Combined Techlog-ready electrofacies file saved as: {output_file}")
+    print(f"Includes {len(df_all)} total samples from {len(file_paths)} wells.")
+    if save_model:
+        model.save(save_model)
+        print(f"✅ Facies model saved as: {save_model}")
+    return df_all, model
+
+
+# --------------------------------------------------
+# Streaming workflow (bounded memory)
+# --------------------------------------------------
+
+def iter_well_chunks(file, chunk_rows=CHUNK_ROWS):
+    """Chunks of one well CSV with the rows missing a key log removed (as Step 2)."""
+    for chunk in pd.read_csv(file, chunksize=chunk_rows):
+        chunk = chunk.dropna(subset=features)
+        if len(chunk):
+            yield chunk
+
+
+def fit_scaler_streaming(file_paths, chunk_rows=CHUNK_ROWS, sample_rows=INIT_SAMPLE_ROWS, random_state=RANDOM_STATE):
+    """
+    Pass 1: StandardScaler statistics by partial fits, plus a uniform random sample of at most
+    `sample_rows` rows of the whole field (reservoir sampling by random keys).
+    Returns (scaler, sample, n_rows).
+    """
+    rng = np.random.default_rng(random_state)
+    scaler = StandardScaler()
+    sample = np.empty((0, len(features)))
+    keys = np.empty(0)
+    n_rows = 0
+    for file in file_paths:
+        for chunk in iter_well_chunks(file, chunk_rows):
+            x = chunk[features].to_numpy(dtype=np.float64)
+            scaler.partial_fit(x)
+            n_rows += len(x)
+            # Keep the rows with the smallest random keys: a uniform sample of everything seen so far
+            sample = np.concatenate([sample, x])
+            keys = np.concatenate([keys, rng.random(len(x))])
+            if len(keys) > sample_rows:
+                keep = np.argpartition(keys, sample_rows)[:sample_rows]
+                sample, keys = sample[keep], keys[keep]
+    return scaler, sample, n_rows
+
+
+def fit_kmeans_streaming(file_paths, scaler, sample, n_clusters=N_CLUSTERS, chunk_rows=CHUNK_ROWS, epochs=2,
+                         random_state=RANDOM_STATE):
+    """
+    Pass 2: MiniBatchKMeans refined by partial fits over the scaled chunks. Centroids start from
+    k-means++ on the field sample, since the first chunk is a single well; files are visited in a
+    new random order every epoch.
+    """
+    init = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10).fit(scaler.transform(sample))
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init.cluster_centers_, n_init=1, random_state=random_state)
+    rng = np.random.default_rng(random_state)
+    for _ in range(epochs):
+        for i in rng.permutation(len(file_paths)):
+            for chunk in iter_well_chunks(file_paths[i], chunk_rows):
+                kmeans.partial_fit(scaler.transform(chunk[features].to_numpy(dtype=np.float64)))
+    return kmeans
+
+
+def assign_streaming(file_paths, model, output_file=OUTPUT_FILE, chunk_rows=CHUNK_ROWS):
+    """
+    Pass 3 (and --model): facies per file from a FaciesModel, appended chunk by chunk to the
+    Techlog-ready CSV. Returns the cluster summary (mean GR, RHOB, NPHI per cluster over all
+    assigned samples) and the row count.
+    """
+    sums = np.zeros((model.n_clusters, 3))
+    counts = np.zeros(model.n_clusters)
+    n_rows = 0
+    header = True
+    with open(output_file, "w", newline="") as f:
+        for file in file_paths:
+            well_name = well_name_of(file)
+            for chunk in iter_well_chunks(file, chunk_rows):
+                clusters = model.predict(chunk[model.features].to_numpy(dtype=np.float64))
+                out = pd.DataFrame({"Well": well_name, "Depth": chunk["Depth"].to_numpy(), "Electrofacies": clusters,
+                                    "Facies_Label": model.labels(clusters)})
+                out[output_cols].to_csv(f, index=False, header=header)
+                header = False
+                np.add.at(sums, clusters, chunk[["GR", "RHOB", "NPHI"]].to_numpy(dtype=np.float64))
+                np.add.at(counts, clusters, 1)
+                n_rows += len(chunk)
+    with np.errstate(invalid="ignore"):
+        summary = pd.DataFrame(sums / counts[:, None], columns=["GR", "RHOB", "NPHI"])
+    summary.index.name = "Electrofacies"
+    return summary, n_rows
+
+
+def plot_output(file_paths, model, output_file, cluster_summary, chunk_rows=CHUNK_ROWS, plot_dir=None,
+                plot_format="png", summary=None, workers=None):
+    """Crossplot of the first well (one file re-read) and depth tracks from the output, one well at a time."""
+    subset = next(iter_well_chunks(file_paths[0], chunk_rows)).copy()
+    subset["Well"] = well_name_of(file_paths[0])
+    subset["Facies_Label"] = model.labels(model.predict(subset[model.features].to_numpy(dtype=np.float64)))
+    n = plot_wells(iter_output_wells(output_file, chunk_rows), plot_dir, plot_format, summary, subset,
+                   cluster_summary, workers)
+    print(f"✅ Plotted {n} wells" + (f" to {plot_dir}" if plot_dir else "") + (f", summary {summary}" if summary else ""))
+
+
+def run_streaming(file_paths, n_clusters=N_CLUSTERS, output_file=OUTPUT_FILE, chunk_rows=CHUNK_ROWS, epochs=2,
+                  sample_rows=INIT_SAMPLE_ROWS, plot_dir=None, plot_format="png", summary=None, workers=None,
+                  k_range=None, save_model=None):
+    file_paths = list(file_paths)
+    scaler, sample, n_rows = fit_scaler_streaming(file_paths, chunk_rows, sample_rows)
+    if not n_rows:
+        raise ValueError(f"No rows with all of {', '.join(features)} in the selected files.")
+    print(f"✅ Pass 1: scaler fitted on {n_rows} samples from {len(file_paths)} wells")
+    if k_range:
+        n_clusters = choose_n_clusters(scaler.transform(sample), k_range, sample_rows)
+
+    kmeans = fit_kmeans_streaming(file_paths, scaler, sample, n_clusters, chunk_rows, epochs)
+    print(f"✅ Pass 2: {n_clusters} clusters trained over {epochs} epochs")
+
+    # Facies labels from the centroid GR (the mean GR of each cluster's samples); ids in GR order
+    model, _ = FaciesModel.from_fit(scaler, kmeans.cluster_centers_, facies_map_from_gr, n_rows, file_paths, features)
+
+    cluster_summary, n_assigned = assign_streaming(file_paths, model, output_file, chunk_rows)
+    print("\nCluster Summary (All Wells):\n", cluster_summary)
+    print(f"\n✅ Combined Techlog-ready electrofacies file saved as: {output_file}")
+    print(f"Includes {n_assigned} total samples from {len(file_paths)} wells.")
+    if save_model:
+        model.save(save_model)
+        print(f"✅ Facies model saved as: {save_model}")
+
+    if plot_dir or summary:
+        plot_output(file_paths, model, output_file, cluster_summary, chunk_rows, plot_dir, plot_format, summary,
+                    workers)
+    return model
+
+
+# --------------------------------------------------
+# New wells with a saved field model (no refit)
+# --------------------------------------------------
+
+def run_assign(file_paths, model_file, output_file=OUTPUT_FILE, chunk_rows=CHUNK_ROWS, plot_dir=None,
+               plot_format="png", summary=None, workers=None):
+    file_paths = list(file_paths)
+    model = FaciesModel.load(model_file)
+    print(model.describe())
+
+    cluster_summary, n_assigned = assign_streaming(file_paths, model, output_file, chunk_rows)
+    print("\nCluster Summary (New Wells):\n", cluster_summary)
+    print(f"\n✅ Combined Techlog-ready electrofacies file saved as: {output_file}")
+    print(f"Includes {n_assigned} total samples from {len(file_paths)} wells.")
+
+    if plot_dir or summary:
+        plot_output(file_paths, model, output_file, cluster_summary, chunk_rows, plot_dir, plot_format, summary,
+                    workers)
+    return model
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-well electrofacies clustering (GR, RHOB, NPHI, DT).")
+    parser.add_argument("sources", nargs="*",
+                        help="Well CSV files, directories (searched recursively) or list files; none opens the dialog")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Out-of-core mode: memory bounded by --chunk-rows instead of the field size")
+    parser.add_argument("--clusters", type=int, default=N_CLUSTERS, help=f"Number of clusters (default: {N_CLUSTERS})")
+    parser.add_argument("--select-k", nargs=2, type=int, metavar=("KMIN", "KMAX"),
+                        help="Choose the number of clusters in KMIN..KMAX by silhouette on a field sample")
+    parser.add_argument("--save-model", metavar="FILE", help="Save the fitted field model (scaler, centroids, facies)")
+    parser.add_argument("--model", metavar="FILE", help="Assign facies with a saved field model instead of fitting")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"Rows read at a time (default: {CHUNK_ROWS})")
+    parser.add_argument("--epochs", type=int, default=2, help="Streaming: mini-batch passes over the field (default: 2)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help=f"Output CSV (default: {OUTPUT_FILE})")
+    parser.add_argument("--no-plots", action="store_true", help="In-memory mode: skip the interactive plots")
+    parser.add_argument("--plots", metavar="DIR", help="Render the plots off-screen to files in DIR (no windows)")
+    parser.add_argument("--plot-format", choices=PLOT_FORMATS, default="png", help="File format of --plots (default: png)")
+    parser.add_argument("--summary", metavar="FILE.pdf", help="Also write all plots into one multi-page PDF")
+    parser.add_argument("--workers", type=int, default=None, help="Plotting worker processes (default: CPU count)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.sources:
+        file_paths = list(iter_input_files(args.sources, [".csv"]))
+    else:
+        # --- Step 1: Browse & Select Multiple Well Files ---
+        root = Tk()
+        root.withdraw()  # Hide main Tkinter window
+        file_paths = filedialog.askopenfilenames(
+            title="Select Well Log CSV Files",
+            filetypes=[("CSV files", "*.csv")]
+        )
+        root.update()
+
+    if not file_paths:
+        raise FileNotFoundError("⚠️ No CSV files selected. Please select one or more well log files.")
+
+    if args.model:
+        run_assign(file_paths, args.model, args.output, args.chunk_rows, plot_dir=args.plots,
+                   plot_format=args.plot_format, summary=args.summary, workers=args.workers)
+    elif args.streaming:
+        run_streaming(file_paths, args.clusters, args.output, args.chunk_rows, args.epochs,
+                      plot_dir=args.plots, plot_format=args.plot_format, summary=args.summary, workers=args.workers,
+                      k_range=args.select_k, save_model=args.save_model)
+    else:
+        run_in_memory(file_paths, args.clusters, args.output, show_plots=not args.no_plots, plot_dir=args.plots,
+                      plot_format=args.plot_format, summary=args.summary, workers=args.workers,
+                      k_range=args.select_k, save_model=args.save_model)
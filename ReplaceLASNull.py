@@ -1,58 +1,210 @@
 # --------------------------------------------------------------------------------------------------------------------------------
-# Python script to replace LAS Null values in multiple LAS files  e.g. -9999 into -999.25 in the Header and data_section ie. after ~A. 
-# take input CWLS LAS format from "curr_dir"  and save the edited in the "output_dir"  
+# Python script to replace LAS Null values in multiple LAS files  e.g. -9999 into -999.25 in the Header and data_section ie. after ~A.
+# take input CWLS LAS format from "curr_dir"  and save the edited in the "output_dir"
+#
+# Only the NULL line of ~Well is rewritten in the header. Data sections (~A, LAS 3.0 ~*_Data) are streamed in blocks and
+# only whole tokens equal to a sentinel are replaced (-9999, -9999.0 and -9999.000 match; -99990.5 and -9999.5 do not).
+# Several sentinels map to one NULL value, and the NULL previously declared in the header is mapped too. Each file is
+# written to a temporary file next to its destination and renamed into place, so an interrupted run never leaves a
+# half-written LAS file. Directory trees are processed in parallel worker processes.
+#
+# Usage: python ReplaceLASNull.py                                  (Tkinter: pick input and output directories)
+#        python ReplaceLASNull.py IN_DIR OUT_DIR --sentinels -9999 -99999 --null -999.25 --workers 8
 #--------------------------------------------------------------------------------------------------------------------------------
-import glob
 import os
-import ntpath
-import tkinter as tk
-from tkinter import filedialog
-import re  # Import the regular expression module
-
-# Set up Tkinter root window (it won't appear because we use the dialog box)
-root = tk.Tk()
-root.withdraw()  # Hide the main Tkinter window
-
-# Prompt user to select the input directory (curr_dir)
-curr_dir = filedialog.askdirectory(title="Select the Input Directory with LAS files")
-if not curr_dir:
-    print("No input directory selected. Exiting.")
-    exit()
-
-# Prompt user to select the output directory (output_dir)
-output_dir = filedialog.askdirectory(title="Select the Output Directory to Save Edited LAS files")
-if not output_dir:
-    print("No output directory selected. Exiting.")
-    exit()
-
-# Ensure the output directory exists
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-# Regex pattern to match various forms of '-9999' and its decimal variants
-pattern = r"-9999(\.0+)?(\.000+)?(\.0000+)?"
-
-# Process each LAS file in the directory
-for f in glob.glob(os.path.join(curr_dir, "*.las")):
-    with open(f, 'r') as inputfile:
-        # Create output file with the same name in the output directory
-        output_file_path = os.path.join(output_dir, ntpath.basename(f))
-        with open(output_file_path, 'w') as outputfile:
-            is_data_section = False  # Flag to track the data section
-            
-            for line in inputfile:
-                # If we encounter the data section (~A), we mark it
-                if line.startswith("~A"):
-                    is_data_section = True
-                # If we encounter another section (~), we exit the data section
-                elif line.startswith("~") and is_data_section:
-                    is_data_section = False
-
-                # Replace matching values for all occurrences of '-9999' (in header or data section)
-                # Use Regex to replace all versions of '-9999' with '-999.25'
-                line = re.sub(pattern, "-999.25", line)
-
-                # Write the (possibly modified) line to the output file
-                outputfile.write(line)
-
-print("Processing complete. Edited files saved in:", output_dir)
+import re
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+from decimal import Decimal, InvalidOperation
+
+from las_scan import section_name, is_data_section
+from las_stream import CHUNK_BYTES, iter_section_blocks
+from qc_batch import iter_input_files, run_parallel, TaskFailure
+
+DEFAULT_SENTINELS = ["-9999"]
+DEFAULT_NULL = "-999.25"
+
+# "NULL.  -9999.0000 : description" -> (prefix, value, rest); the unit after the dot is kept as is
+NULL_LINE = re.compile(r"^(\s*NULL\s*\.\S*\s+)(\S+?)(\s*:.*|\s*)$", re.IGNORECASE | re.DOTALL)
+
+
+def _decimal(text):
+    try:
+        return Decimal(str(text).strip())
+    except InvalidOperation:
+        return None
+
+
+def sentinel_regex(sentinels):
+    """
+    Compiled bytes regex matching a whole data token (delimited by whitespace, commas or line ends)
+    whose value is one of `sentinels`, written with any number of trailing decimal zeros.
+    """
+    alternatives = set()
+    for s in sentinels:
+        value = _decimal(s)
+        if value is None:
+            continue
+        int_part, _, frac = format(value.normalize(), "f").partition(".")
+        if frac:
+            alternatives.add(re.escape(int_part) + r"\." + frac + "0*")
+        else:
+            alternatives.add(re.escape(int_part) + r"(?:\.0*)?")
+    if not alternatives:
+        return None
+    pattern = "(?<![^\\s,])(?:" + "|".join(sorted(alternatives)) + ")(?![^\\s,])"
+    return re.compile(pattern.encode("ascii"))
+
+
+def rewrite_null_line(raw, null_value):
+    """Return (line, old_value) with the NULL value of a ~Well line replaced, or (raw, None) if it is not the NULL line."""
+    line = raw.decode("latin-1")
+    body = line.rstrip("\r\n")
+    match = NULL_LINE.match(body)
+    if not match:
+        return raw, None
+    prefix, old, rest = match.groups()
+    return (prefix + null_value + rest + line[len(body):]).encode("latin-1"), old
+
+
+def replace_las_nulls(src, dst, sentinels=DEFAULT_SENTINELS, null_value=DEFAULT_NULL, map_declared=True,
+                      chunk_bytes=CHUNK_BYTES):
+    """
+    Write a copy of LAS file `src` to `dst` with every sentinel value replaced by `null_value`.
+    `map_declared` also maps the NULL value the file declared before the rewrite. `dst` may be `src`.
+
+    Returns a dict: bytes read, values replaced in the data sections, whether the NULL line was rewritten, seconds.
+    """
+    t0 = time.perf_counter()
+    stats = {"bytes": os.path.getsize(src), "values": 0, "null_line": False, "seconds": 0.0}
+    target = _decimal(null_value)
+    replacement = null_value.encode("ascii")
+
+    out_dir = os.path.dirname(os.path.abspath(dst))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix="." + os.path.basename(dst) + ".", suffix=".tmp", dir=out_dir)
+    try:
+        with open(src, "rb") as fin, os.fdopen(fd, "wb") as fout:
+            section = None
+            regex = None
+            mapped = list(sentinels)
+            for raw in iter(fin.readline, b""):
+                if raw.lstrip().startswith(b"~"):
+                    fout.write(raw)
+                    section = section_name(raw.decode("latin-1"))
+                    if not is_data_section(section):
+                        continue
+                    # ~Well precedes the data, so the declared NULL is known by now
+                    if regex is None:
+                        regex = sentinel_regex(s for s in mapped if _decimal(s) != target) or False
+                    for block in iter_section_blocks(fin, chunk_bytes):
+                        if regex:
+                            block, n = regex.subn(replacement, block)
+                            stats["values"] += n
+                        fout.write(block)
+                    continue
+                if section == "WELL":
+                    raw, old = rewrite_null_line(raw, null_value)
+                    if old is not None:
+                        stats["null_line"] = old != null_value
+                        if map_declared:
+                            mapped.append(old)
+                fout.write(raw)
+        shutil.copymode(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def _replace_task(src, src_root, output_dir, sentinels, null_value, map_declared):
+    dst = os.path.join(output_dir, os.path.relpath(src, src_root))
+    return replace_las_nulls(src, dst, sentinels, null_value, map_declared)
+
+
+def replace_tree(curr_dir, output_dir, sentinels=DEFAULT_SENTINELS, null_value=DEFAULT_NULL, map_declared=True,
+                 workers=None, timeout=None, verbose=True):
+    """Process every LAS file under `curr_dir` in parallel, mirroring the tree under `output_dir`. Returns totals."""
+    t0 = time.perf_counter()
+    totals = {"files": 0, "failed": 0, "bytes": 0, "values": 0, "seconds": 0.0, "mb_per_s": 0.0}
+    files = iter_input_files([curr_dir], [".las"])
+    kwargs = {"src_root": curr_dir, "output_dir": output_dir, "sentinels": list(sentinels),
+              "null_value": null_value, "map_declared": map_declared}
+
+    for path, result, seconds in run_parallel(_replace_task, files, workers, timeout, kwargs):
+        rel = os.path.relpath(path, curr_dir)
+        if isinstance(result, TaskFailure):
+            totals["failed"] += 1
+            # A killed worker cannot clean up after itself
+            dst = os.path.join(output_dir, rel)
+            for stale in glob.glob(os.path.join(os.path.dirname(dst), "." + glob.escape(os.path.basename(dst)) + ".*.tmp")):
+                os.remove(stale)
+            print(f"{rel}: {result}")
+            continue
+        totals["files"] += 1
+        totals["bytes"] += result["bytes"]
+        totals["values"] += result["values"]
+        if verbose:
+            print(f"{rel}: {result['values']} values replaced"
+                  + (", NULL line rewritten" if result["null_line"] else "")
+                  + f" ({result['bytes'] / 1e6 / max(result['seconds'], 1e-9):.0f} MB/s)")
+
+    totals["seconds"] = time.perf_counter() - t0
+    totals["mb_per_s"] = totals["bytes"] / 1e6 / max(totals["seconds"], 1e-9)
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replace LAS NULL sentinels (header NULL line and data values).")
+    parser.add_argument("curr_dir", nargs="?", help="Input directory (searched recursively for *.las)")
+    parser.add_argument("output_dir", nargs="?", help="Output directory (same tree layout; may equal curr_dir)")
+    parser.add_argument("--sentinels", nargs="+", default=DEFAULT_SENTINELS,
+                        help="Values to replace (default: -9999); -9999 also matches -9999.0, -9999.000, ...")
+    parser.add_argument("--null", default=DEFAULT_NULL, help="New NULL value (default: -999.25)")
+    parser.add_argument("--keep-declared", action="store_true",
+                        help="Do not map values equal to the NULL the file declared before the rewrite")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-file timeout in seconds")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary and failures")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    curr_dir, output_dir = args.curr_dir, args.output_dir
+
+    if not curr_dir or not output_dir:
+        import tkinter as tk
+        from tkinter import filedialog
+
+        # Set up Tkinter root window (it won't appear because we use the dialog box)
+        root = tk.Tk()
+        root.withdraw()  # Hide the main Tkinter window
+
+        # Prompt user to select the input directory (curr_dir)
+        curr_dir = filedialog.askdirectory(title="Select the Input Directory with LAS files")
+        if not curr_dir:
+            print("No input directory selected. Exiting.")
+            return
+
+        # Prompt user to select the output directory (output_dir)
+        output_dir = filedialog.askdirectory(title="Select the Output Directory to Save Edited LAS files")
+        if not output_dir:
+            print("No output directory selected. Exiting.")
+            return
+
+    totals = replace_tree(curr_dir, output_dir, args.sentinels, args.null, map_declared=not args.keep_declared,
+                          workers=args.workers, timeout=args.timeout, verbose=not args.quiet)
+    print(f"Processed {totals['files']} files ({totals['failed']} failed), {totals['values']} values replaced, "
+          f"{totals['bytes'] / 1e6:.1f} MB in {totals['seconds']:.1f}s ({totals['mb_per_s']:.1f} MB/s)")
+    print("Processing complete. Edited files saved in:", output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,24 @@
 # --- Ascii2las a util to convert ascii based log cuvres into CWLS LAS 2.0 standard format ---
 # --- MIT License  ---
 # --- https://github.com/edirnandi Date 2025-06-14 ---
+# --- The input is read in chunks and spilled per well to temporary files, so exports larger than RAM convert;
+# --- the LAS files are then written in parallel worker processes. ~C lists Depth and every other numeric column.
+# --- Usage: python ascii2las.py                                   (Tkinter: pick input file and output folder)
+# ---        python ascii2las.py export.csv las_out --workers 8 --chunk-rows 500000 --spill-dir /scratch
+# ---        python ascii2las.py --benchmark 500000                 (rows/s of the ~A writer)
 
 import pandas as pd
+import numpy as np
 from tkinter import Tk, filedialog
 import os
+import io
+import re
+import time
+import shutil
+import argparse
+import tempfile
+
+from qc_batch import run_parallel, TaskFailure
 
 # --- Constants for LAS 2.0 header (Curve units taken  from SLB curve mnemonic dictionary https://www.apps.slb.com/cmd/) ---
 CURVE_INFO = [
@@ -15,6 +29,12 @@ CURVE_INFO = [
     ("NPHI", "NAPI", "Neutron Porosity (nAPI)"),
     ("DT", "US/FT", "Sonic Transit Time (µs/ft)")
 ]
+DATA_COLUMNS = ['Depth', 'GammaRay', 'Resistivity', 'Density', 'NeutronPorosity', 'SonicDT']
+KNOWN_CURVES = dict(zip(DATA_COLUMNS, CURVE_INFO))
+NULL_VALUE = -999.25
+DECIMALS = 4
+BLOCK_ROWS = 50000  # rows formatted and written per block
+CHUNK_ROWS = 500000  # input rows read per chunk in the out-of-core conversion
 
 # --- File dialog to pick CSV, TXT or Excel file ---
 def select_file():
@@ -38,13 +58,113 @@ def read_data(file_path):
     else:
         raise ValueError("Unsupported file format!")
 
+# --- Read the file in chunks of rows (Excel cannot be chunked and is read whole) ---
+def iter_data_chunks(file_path, chunk_rows=CHUNK_ROWS):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".csv":
+        yield from pd.read_csv(file_path, chunksize=chunk_rows, dtype={"WellName": str})
+    elif ext == ".txt":
+        yield from pd.read_csv(file_path, sep=None, engine="python", chunksize=chunk_rows, dtype={"WellName": str})
+    elif ext in [".xls", ".xlsx"]:
+        df = pd.read_excel(file_path, dtype={"WellName": str})
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        raise ValueError("Unsupported file format!")
+
+# --- Candidate curves: Depth first, then every other column (text-only columns are dropped after reading) ---
+def las_columns(df):
+    if 'Depth' not in df.columns:
+        raise ValueError("Missing required column: Depth")
+    return ['Depth'] + [c for c in df.columns if c not in ('WellName', 'Depth')]
+
+# --- ~C entries for the columns present (SLB mnemonics for the known ones) ---
+def curve_info_for(columns):
+    curves = []
+    for col in columns:
+        if col in KNOWN_CURVES:
+            curves.append(KNOWN_CURVES[col])
+        else:
+            mnemonic = re.sub(r"[^A-Za-z0-9_]+", "_", str(col)).strip("_").upper() or "CURVE"
+            curves.append((mnemonic, "", str(col)))
+    return curves
+
+# --- Vectorized fixed-point formatting of the ~A block ---
+def _format_column(x, decimals, null_text):
+    """
+    Format float64 array `x` like f"{v:.{decimals}f}" (NaN -> null_text) into a right-aligned
+    uint8 matrix. Returns (matrix, start) where row i holds its text in matrix[i, start[i]:].
+    Values whose rounding is not decided exactly in float arithmetic (near .5 ties, |v| too large
+    for int64, inf) are formatted by Python, so the output is byte-identical to the f-string.
+    """
+    scale = 10 ** decimals
+    with np.errstate(invalid="ignore", over="ignore"):
+        finite = np.isfinite(x)
+        y = np.where(finite, x * scale, 0.0)
+        special = ~finite | (np.abs(y) >= 2.0 ** 52) | (np.abs(y - np.floor(y) - 0.5) <= np.abs(y) * 4.5e-16)
+    q = np.abs(np.rint(np.where(special, 0.0, y))).astype(np.int64)
+    neg = np.signbit(x) & ~special
+    ip, fp = np.divmod(q, scale)
+
+    ndig = np.ones(len(x), dtype=np.int64)
+    power = 10
+    while power <= ip.max(initial=0):
+        ndig += ip >= power
+        power *= 10
+    width = neg + ndig + (decimals + 1 if decimals else 0)
+
+    texts = {}
+    for i in np.flatnonzero(special):
+        v = x[i]
+        texts[i] = (null_text if np.isnan(v) else f"{v:.{decimals}f}").encode("ascii")
+        width[i] = len(texts[i])
+
+    w = int(width.max(initial=1))
+    mat = np.zeros((len(x), w), dtype=np.uint8)
+    col = w - 1
+    for _ in range(decimals):
+        mat[:, col] = 48 + fp % 10
+        fp //= 10
+        col -= 1
+    if decimals:
+        mat[:, col] = ord(".")
+        col -= 1
+    for _ in range(int(ndig.max(initial=1))):
+        mat[:, col] = 48 + ip % 10
+        ip //= 10
+        col -= 1
+    rows = np.flatnonzero(neg)
+    mat[rows, w - width[rows]] = ord("-")
+    for i, text in texts.items():
+        mat[i, w - len(text):] = np.frombuffer(text, dtype=np.uint8)
+    return mat, w - width
+
+
+def format_data_block(columns, decimals=DECIMALS, null_text=None):
+    """
+    ASCII bytes of a ~A block: one line per row, values separated by a single space, each line
+    preceded by "\n" (the header is written without a trailing newline). `columns` is a list of
+    equal-length float64 arrays; NaN is written as `null_text`.
+    """
+    null_text = null_text if null_text is not None else f"{NULL_VALUE:.2f}"
+    parts, masks = [], []
+    for j, x in enumerate(columns):
+        mat, start = _format_column(np.asarray(x, dtype=np.float64), decimals, null_text)
+        sep = np.full((len(mat), 1), ord("\n") if j == 0 else ord(" "), dtype=np.uint8)
+        parts += [sep, mat]
+        masks += [np.ones((len(mat), 1), dtype=bool), np.arange(mat.shape[1]) >= start[:, None]]
+    if not parts:
+        return b""
+    return np.concatenate(parts, axis=1)[np.concatenate(masks, axis=1)].tobytes()
+
+
 # --- Generate LAS content ---
-def generate_las(df, well_name):
+def las_header_lines(df, well_name, curves=CURVE_INFO):
     lines = []
     start_depth = df['Depth'].min()
     stop_depth = df['Depth'].max()
     step = df['Depth'].diff().dropna().mode()[0]  # most frequent step
-    null_value = -999.25
+    null_value = NULL_VALUE
 
     lines.append("~Version Information Section")
     lines.append("VERS.                  2.0           : CWLS LOG ASCII STANDARD - VERSION 2.0")
@@ -66,18 +186,165 @@ def generate_las(df, well_name):
 
     lines.append("~Curve Information Section")
     lines.append("#MNEM.UNIT              API CODES    CURVE DESCRIPTION")
-    for mnemonic, unit, desc in CURVE_INFO:
+    for mnemonic, unit, desc in curves:
         lines.append(f"{mnemonic:<6}.{unit:<10}           : {desc}")
     lines.append("")
 
     lines.append("~ASCII Log Data")
+    return lines
+
+
+def write_las(df, well_name, f, block_rows=BLOCK_ROWS, columns=DATA_COLUMNS):
+    """Write the LAS file for one well to text file `f`, formatting the ~A section in blocks of rows."""
+    f.write("\n".join(las_header_lines(df, well_name, curve_info_for(columns))))
+    # A missing column is written as the NULL value formatted like data (as row.get(col, null) did)
+    columns = [df[col].to_numpy(dtype=np.float64, na_value=np.nan) if col in df.columns
+               else np.full(len(df), NULL_VALUE) for col in columns]
+    for start in range(0, len(df), block_rows):
+        block = format_data_block([c[start:start + block_rows] for c in columns])
+        f.write(block.decode("ascii"))
+
+
+def generate_las(df, well_name):
+    out = io.StringIO()
+    write_las(df, well_name, out)
+    return out.getvalue()
+
+
+def _generate_las_iterrows(df, well_name):
+    """The previous row-by-row formatter, kept as the reference for benchmark()."""
+    lines = las_header_lines(df, well_name)
+    null_value = NULL_VALUE
     for _, row in df.iterrows():
-        row_vals = [row.get(col, null_value) for col in ['Depth', 'GammaRay', 'Resistivity', 'Density', 'NeutronPorosity', 'SonicDT']]
+        row_vals = [row.get(col, null_value) for col in DATA_COLUMNS]
         row_str = " ".join(f"{val:.4f}" if pd.notnull(val) else f"{null_value:.2f}" for val in row_vals)
         lines.append(row_str)
-
     return "\n".join(lines)
 
+
+def benchmark(n_rows=200000, reference_rows=50000, seed=0):
+    """Rows/s of the iterrows formatter and the block writer on a synthetic well; checks identical output."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'WellName': 'BENCH-1',
+        'Depth': 1000.0 + 0.1524 * np.arange(n_rows),
+        'GammaRay': rng.uniform(0, 150, n_rows),
+        'Resistivity': 10 ** rng.uniform(-1, 3, n_rows),
+        'Density': rng.uniform(1.8, 2.9, n_rows),
+        'NeutronPorosity': rng.uniform(-0.05, 0.6, n_rows),
+        'SonicDT': rng.uniform(40, 140, n_rows),
+    })
+    for col in DATA_COLUMNS[1:]:
+        df.loc[rng.random(n_rows) < 0.02, col] = np.nan
+    ref = df.iloc[:min(reference_rows, n_rows)]
+
+    t0 = time.perf_counter()
+    old = _generate_las_iterrows(ref, 'BENCH-1')
+    t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new = generate_las(ref, 'BENCH-1')
+    t_new_ref = time.perf_counter() - t0
+    if old != new:
+        raise AssertionError("block writer output differs from the iterrows formatter")
+
+    t0 = time.perf_counter()
+    with open(os.devnull, "w") as f:
+        write_las(df, 'BENCH-1', f)
+    t_new = time.perf_counter() - t0
+    print(f"iterrows:     {len(ref) / t_old:12,.0f} rows/s ({len(ref)} rows, {t_old:.2f}s)")
+    print(f"block writer: {len(ref) / t_new_ref:12,.0f} rows/s ({len(ref)} rows, identical output)")
+    print(f"block writer: {n_rows / t_new:12,.0f} rows/s ({n_rows} rows to file, {t_new:.2f}s)")
+
+# --- Out-of-core conversion: spill rows per well, then write the wells in parallel ---
+def spill_wells(file_path, spill_dir, chunk_rows=CHUNK_ROWS, verbose=True):
+    """
+    Read `file_path` in chunks and append each well's rows (float64, in file order) to its own
+    spill file under `spill_dir`. Only one chunk is held in memory. Every column is converted to
+    numbers in every chunk, so the curves do not depend on the chunk size: a column without any
+    numeric value but with text is dropped, text values in numeric columns become NULL (counted
+    and reported).
+    Returns (spilled columns, curve columns, {well_name: (spill_path, n_rows)}, total_rows).
+    """
+    spilled, wells, total = None, {}, 0
+    t0 = time.perf_counter()
+    for chunk in iter_data_chunks(file_path, chunk_rows):
+        if spilled is None:
+            if 'WellName' not in chunk.columns:
+                raise ValueError("Missing required column: WellName")
+            spilled = las_columns(chunk)
+            numeric = pd.Series(0, index=spilled)
+            text = pd.Series(0, index=spilled)
+        raw = chunk[spilled]
+        converted = raw.apply(pd.to_numeric, errors="coerce")
+        numeric += converted.notna().sum()
+        text += (raw.notna() & converted.isna()).sum()
+        values = converted.to_numpy(dtype=np.float64, na_value=np.nan)
+        for well_name, idx in chunk.groupby("WellName", sort=False).indices.items():
+            if well_name not in wells:
+                wells[well_name] = (os.path.join(spill_dir, f"{len(wells):06d}.f64"), 0)
+            spill_path, n = wells[well_name]
+            with open(spill_path, "ab") as f:
+                f.write(values[idx].tobytes())
+            wells[well_name] = (spill_path, n + len(idx))
+        total += len(chunk)
+        if verbose:
+            print(f"  {total:,} rows read, {len(wells)} wells ({total / max(time.perf_counter() - t0, 1e-9):,.0f} rows/s)")
+    if spilled is None:
+        return [], [], wells, total
+    columns = [c for c in spilled if c == 'Depth' or numeric[c] or not text[c]]
+    dropped = [c for c in spilled if c not in columns]
+    if dropped:
+        print(f"Warning: text columns not written as curves: {', '.join(map(str, dropped))}")
+    for c in columns:
+        if text[c]:
+            print(f"Warning: {text[c]:,} non-numeric values in column {c} written as NULL")
+    return spilled, columns, wells, total
+
+
+def _convert_well(task, output_folder):
+    """Worker: load one well's spill file, sort by depth and write <well_name>.las."""
+    well_name, spill_path, spilled, columns = task
+    data = np.fromfile(spill_path, dtype=np.float64).reshape(-1, len(spilled))
+    os.remove(spill_path)
+    data = data[:, [spilled.index(c) for c in columns]]
+    data = data[np.argsort(data[:, 0], kind="stable")]
+    df = pd.DataFrame(data, columns=columns)
+    output_path = os.path.join(output_folder, f"{well_name}.las")
+    with open(output_path, "w") as f:
+        write_las(df, well_name, f, columns=columns)
+    return output_path, len(df)
+
+
+def convert_file(file_path, output_folder, chunk_rows=CHUNK_ROWS, workers=None, spill_dir=None, verbose=True):
+    """
+    Convert a (multi-well) CSV/TXT/Excel file to one LAS file per well without loading it whole:
+    rows are spilled per well to a temporary directory (under `spill_dir` if given), then the
+    wells are written by a pool of worker processes. Returns a summary dict.
+    """
+    t0 = time.perf_counter()
+    os.makedirs(output_folder, exist_ok=True)
+    summary = {"rows": 0, "wells": 0, "failed": 0, "seconds": 0.0}
+    tmp = tempfile.mkdtemp(prefix="ascii2las-", dir=spill_dir)
+    try:
+        spilled, columns, wells, summary["rows"] = spill_wells(file_path, tmp, chunk_rows, verbose)
+        if verbose:
+            print(f"Curves: {', '.join(m for m, _, _ in curve_info_for(columns))}")
+        tasks = ((name, path, spilled, columns) for name, (path, _) in wells.items())
+        for task, result, seconds in run_parallel(_convert_well, tasks, workers, None,
+                                                  {"output_folder": output_folder}):
+            if isinstance(result, TaskFailure):
+                summary["failed"] += 1
+                print(f"{task[0]}: {result}")
+                continue
+            summary["wells"] += 1
+            if verbose:
+                print(f"LAS file saved as: {result[0]} ({result[1]} rows, {seconds:.2f}s)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    summary["seconds"] = time.perf_counter() - t0
+    return summary
+
+
 # --- Save LAS file ---
 def save_las_file(content, well_name):
     output_file = f"{well_name}.las"
@@ -93,34 +360,42 @@ def save_las_file(content, well_name, output_folder):
         f.write(content)
     print(f"LAS file saved as: {output_path}")
 
+# --- Command line (no arguments: Tkinter dialogs) ---
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert ASCII/Excel log curves into one LAS 2.0 file per well.")
+    parser.add_argument("input", nargs="?", help="CSV, TXT or Excel file with WellName, Depth and curve columns")
+    parser.add_argument("output_folder", nargs="?", help="Folder for the LAS files")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Input rows read per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes writing LAS files (default: CPU count)")
+    parser.add_argument("--spill-dir", default=None, help="Directory for the temporary per-well spill files")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary and failures")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", default=None,
+                        help="Benchmark the ~A writer on ROWS synthetic rows and exit")
+    return parser.parse_args(argv)
+
 # --- Main Process ---
 def main():
-    file_path = select_file()
-    if not file_path:
-        print("No file selected.")
-        return
-
-    output_folder = filedialog.askdirectory(title="Select Output Folder")
-    if not output_folder:
-        print("No output folder selected.")
+    args = parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark)
         return
 
-    df = read_data(file_path)
+    file_path, output_folder = args.input, args.output_folder
+    if not file_path or not output_folder:
+        file_path = select_file()
+        if not file_path:
+            print("No file selected.")
+            return
 
-    # Handle column naming and filtering
-    required_columns = ['WellName', 'Depth', 'GammaRay', 'Resistivity', 'Density', 'NeutronPorosity', 'SonicDT']
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column: {col}")
+        output_folder = filedialog.askdirectory(title="Select Output Folder")
+        if not output_folder:
+            print("No output folder selected.")
+            return
 
-    for well_name, group_df in df.groupby("WellName"):
-        group_df_sorted = group_df.sort_values("Depth")
-        las_content = generate_las(group_df_sorted, well_name)
-        save_las_file(las_content, well_name, output_folder)
+    summary = convert_file(file_path, output_folder, args.chunk_rows, args.workers, args.spill_dir,
+                           verbose=not args.quiet)
+    print(f"{summary['wells']} LAS files ({summary['failed']} failed) from {summary['rows']:,} rows "
+          f"in {summary['seconds']:.1f}s ({summary['rows'] / max(summary['seconds'], 1e-9):,.0f} rows/s)")
 
 if __name__ == "__main__":
     main()
-    
-    
-    
-    
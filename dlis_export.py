@@ -0,0 +1,266 @@
+# ---------------------------------------------------------------------------------------
+# dlis_export.py
+#
+# Export DLIS curve data (frame data) to columnar files, chunk by chunk, so the ML scripts can
+# read DLIS logs without converting them to LAS by hand. Frames are decoded through
+# dlis_frames.iter_frame_chunks, so memory is bounded by one chunk whatever the file size; the
+# chunk is limited both in rows and in bytes, so image/waveform channels (hundreds of samples per
+# depth) get proportionally fewer rows per chunk.
+#
+# Output per DLIS file, one entry per frame of every logical file:
+#   parquet: <outdir>/<file>/LF<n>_<frame>.parquet   one row group per chunk; array channels are
+#            fixed-size list columns; unit / long name / dimension are stored as field metadata
+#   npz:     <outdir>/<file>/LF<n>_<frame>/part-00000.npz ...  one archive per chunk (arrays keep
+#            their shape) plus channels.json with units, long names and dimensions
+#
+# Usage: python dlis_export.py /archive/dlis --outdir dlis_data --format parquet --workers 4
+#        python dlis_export.py big.dlis --lf-workers 4 --scalars-only
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+
+import numpy as np
+from dlisio import dlis
+
+from dlis_frames import iter_frame_chunks, map_logical_files, CHUNK_ROWS
+from dlis_prescan import prescan_dlis
+from qc_batch import iter_named_files, run_parallel, TaskFailure
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+FORMATS = ["parquet", "npz"]
+CHUNK_MB = 16
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w.-]+", "_", str(name)).strip("_") or "frame"
+
+
+def chunk_rows_for(dtype, chunk_rows=CHUNK_ROWS, chunk_mb=CHUNK_MB):
+    """Rows per chunk: chunk_rows, fewer when a row (e.g. with image channels) is large."""
+    return max(1, min(chunk_rows, int(chunk_mb * 2 ** 20) // max(dtype.itemsize, 1)))
+
+
+def channel_info(frame, names):
+    """{column: {"unit", "long_name", "dimension"}} for the channel columns of a frame chunk."""
+    info = {}
+    for channel, name in zip(frame.channels, names[1:]):
+        info[name] = {
+            "unit": channel.units,
+            "long_name": channel.long_name if isinstance(channel.long_name, str) else str(channel.long_name or ""),
+            "dimension": list(channel.dimension or [1]),
+        }
+    return info
+
+
+def _arrow_column(values):
+    if values.ndim > 1:
+        width = int(np.prod(values.shape[1:]))
+        flat = np.ascontiguousarray(values).reshape(-1)
+        return pa.FixedSizeListArray.from_arrays(_arrow_column(flat), width)
+    if values.dtype.kind in "biufM":
+        return pa.array(values)
+    return pa.array(values.astype(str))
+
+
+def _arrow_table(chunk, columns, schema=None):
+    arrays = [_arrow_column(chunk[name]) for name in columns]
+    if schema is None:
+        return pa.Table.from_arrays(arrays, names=columns)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class _ParquetFrameWriter:
+    """Appends chunks of one frame as row groups; the file is renamed into place on close."""
+
+    def __init__(self, path, dtype, columns, info):
+        if not HAS_PYARROW:
+            raise ImportError("Install pyarrow to write Parquet files, or use --format npz.")
+        self.path = path
+        self.columns = columns
+        schema = _arrow_table(np.empty(0, dtype=dtype), columns).schema
+        fields = []
+        for field in schema:
+            meta = info.get(field.name)
+            if meta:
+                field = field.with_metadata({k: json.dumps(v) if isinstance(v, list) else str(v or "")
+                                             for k, v in meta.items()})
+            fields.append(field)
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path + ".partial", self.schema)
+
+    def write(self, chunk):
+        self.writer.write_table(_arrow_table(chunk, self.columns, self.schema))
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.path + ".partial", self.path)
+
+
+class _NpzFrameWriter:
+    """One part-NNNNN.npz per chunk in a directory per frame, plus channels.json."""
+
+    def __init__(self, path, dtype, columns, info):
+        self.path = path
+        self.columns = columns
+        self.parts = 0
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        with open(os.path.join(path, "channels.json"), "w") as f:
+            json.dump({"columns": columns, "channels": info}, f, indent=1)
+
+    def write(self, chunk):
+        np.savez(os.path.join(self.path, f"part-{self.parts:05d}.npz"),
+                 **{name: chunk[name] for name in self.columns})
+        self.parts += 1
+
+    def close(self):
+        pass
+
+
+def export_frame(logical_file, frame, target, fmt="parquet", chunk_rows=CHUNK_ROWS, chunk_mb=CHUNK_MB,
+                 scalars_only=False):
+    """Write one frame to `target` (.parquet file or npz directory). Returns a summary dict."""
+    dtype = frame.dtype(strict=False)
+    names = list(dtype.names)
+    info = channel_info(frame, names)
+    columns = [n for n in names if not (scalars_only and dtype[n].shape)]
+    rows_per_chunk = chunk_rows_for(dtype, chunk_rows, chunk_mb)
+    summary = {"frame": frame.name, "path": target, "rows": 0, "chunks": 0, "columns": len(columns) - 1,
+               "index": names[1] if frame.index_type is not None and len(names) > 1 else None, "error": None}
+
+    writer = (_NpzFrameWriter if fmt == "npz" else _ParquetFrameWriter)(target, dtype, columns, info)
+    try:
+        for chunk in iter_frame_chunks(logical_file, frame, rows_per_chunk):
+            if not len(chunk):
+                continue
+            writer.write(chunk)
+            summary["rows"] += len(chunk)
+            summary["chunks"] += 1
+            del chunk  # release before the next chunk is decoded
+    except (RuntimeError, ValueError) as e:
+        # Keep what was decoded, like the frame check reports DLIS-FDATA
+        summary["error"] = f"frame data cannot be decoded after {summary['rows']} frames: {' '.join(str(e).split())}"
+    finally:
+        writer.close()
+    return summary
+
+
+def export_logical_file(dlis_file, logical_file, lf_index, outdir, fmt="parquet", chunk_rows=CHUNK_ROWS,
+                        chunk_mb=CHUNK_MB, scalars_only=False):
+    """Export every frame of one logical file into `outdir` (map_logical_files task)."""
+    summaries = []
+    used = set()
+    for frame in logical_file.frames:
+        name = f"LF{lf_index + 1}_{_safe_name(frame.name)}"
+        if name in used:
+            name = f"{name}.{frame.origin}.{frame.copynumber}"
+        used.add(name)
+        target = os.path.join(outdir, name + (".parquet" if fmt == "parquet" else ""))
+        summary = export_frame(logical_file, frame, target, fmt, chunk_rows, chunk_mb, scalars_only)
+        summary["logical_file"] = lf_index + 1
+        summaries.append(summary)
+    return summaries
+
+
+def export_dlis(dlis_file, outdir, fmt="parquet", lf_workers=1, chunk_rows=CHUNK_ROWS, chunk_mb=CHUNK_MB,
+                scalars_only=False, basename=None):
+    """
+    Export all frames of a DLIS file under <outdir>/<basename>/. Structurally broken files are
+    rejected by the pre-scan. Returns a list of frame summaries.
+    """
+    findings, _ = prescan_dlis(dlis_file)
+    fatal = [f for f in findings if f.severity == "fatal"]
+    if fatal:
+        raise ValueError(f"{fatal[0].rule_id}: {fatal[0].message}")
+    basename = basename or os.path.splitext(os.path.basename(dlis_file))[0]
+    target = os.path.join(outdir, basename)
+    os.makedirs(target, exist_ok=True)
+    with dlis.load(dlis_file) as physical_file:
+        results = map_logical_files(export_logical_file, dlis_file, physical_file, lf_workers,
+                                    (target, fmt, chunk_rows, chunk_mb, scalars_only))
+    return [s for summaries in results for s in summaries]
+
+
+def _export_task(task, **kwargs):
+    path, basename = task
+    return export_dlis(path, basename=basename, **kwargs)
+
+
+def export_files(sources, outdir, fmt="parquet", workers=1, lf_workers=1, timeout=None, chunk_rows=CHUNK_ROWS,
+                 chunk_mb=CHUNK_MB, scalars_only=False, verbose=True):
+    """
+    Export every DLIS file under `sources`. With workers > 1 files run in qc_batch worker processes
+    (logical files then run sequentially inside each); otherwise logical files use lf_workers.
+    """
+    t0 = time.perf_counter()
+    os.makedirs(outdir, exist_ok=True)
+    totals = {"files": 0, "failed": 0, "frames": 0, "rows": 0, "seconds": 0.0}
+    kwargs = {"outdir": outdir, "fmt": fmt, "chunk_rows": chunk_rows, "chunk_mb": chunk_mb,
+              "scalars_only": scalars_only}
+
+    if workers and workers > 1:
+        results = run_parallel(_export_task, iter_named_files(sources, [".dlis"]), workers, timeout, kwargs)
+    else:
+        def sequential():
+            for task in iter_named_files(sources, [".dlis"]):
+                start = time.perf_counter()
+                try:
+                    result = _export_task(task, lf_workers=lf_workers, **kwargs)
+                except Exception as e:
+                    result = TaskFailure(f"Error processing file: {e}")
+                yield task, result, time.perf_counter() - start
+        results = sequential()
+
+    for (path, _), result, seconds in results:
+        if isinstance(result, TaskFailure):
+            totals["failed"] += 1
+            print(f"❌ {path}: {result}")
+            continue
+        totals["files"] += 1
+        totals["frames"] += len(result)
+        totals["rows"] += sum(s["rows"] for s in result)
+        for s in result:
+            if s["error"]:
+                print(f"⚠ {path} LF{s['logical_file']} {s['frame']}: {s['error']}")
+        if verbose:
+            print(f"✔ {path}: {len(result)} frames, {sum(s['rows'] for s in result)} rows ({seconds:.1f}s)")
+    totals["seconds"] = time.perf_counter() - t0
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export DLIS frame data to Parquet or NPZ in bounded chunks.")
+    parser.add_argument("sources", nargs="+", help="Directories (searched recursively), DLIS files or list files")
+    parser.add_argument("--outdir", default="dlis_data", help="Output directory (default: dlis_data)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="parquet (default) or npz")
+    parser.add_argument("--workers", type=int, default=1, help="Files exported in parallel processes (default: 1)")
+    parser.add_argument("--lf-workers", type=int, default=os.cpu_count() or 1,
+                        help="Logical files exported in parallel when --workers is 1 (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-file timeout in seconds (with --workers)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"Rows per chunk (default: {CHUNK_ROWS})")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB,
+                        help=f"Upper bound of one decoded chunk in MB (default: {CHUNK_MB})")
+    parser.add_argument("--scalars-only", action="store_true", help="Leave out array (image/waveform) channels")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary, warnings and failures")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    totals = export_files(args.sources, args.outdir, args.format, args.workers, args.lf_workers, args.timeout,
+                          args.chunk_rows, args.chunk_mb, args.scalars_only, verbose=not args.quiet)
+    print(f"\n{totals['files']} files ({totals['failed']} failed), {totals['frames']} frames, "
+          f"{totals['rows']} rows exported to {args.outdir} in {totals['seconds']:.1f}s")
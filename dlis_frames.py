@@ -0,0 +1,248 @@
+# ---------------------------------------------------------------------------------------
+# dlis_frames.py
+#
+# Bounded-memory checks of DLIS frame data. dlisio's Frame.curves() decodes every sample of
+# a frame at once; here the frame's FDATA records are decoded CHUNK_ROWS at a time through
+# the same reader (dlisio.core.read_fdata over a slice of the logical file's fdata index),
+# so memory is bounded by the chunk whatever the file size. Checks per frame:
+#   - FRAMENO increases by one (no missing, repeated or out-of-order frames)   (DLIS-FRAMENO)
+#   - the index channel is monotonic in the frame DIRECTION                      (DLIS-INDEX-NONMONO)
+#   - index increments match SPACING (or the first increment if SPACING is absent) (DLIS-SPACING)
+#   - channel DIMENSION is set, within ELEMENT-LIMIT and matches the samples   (DLIS-CHANNEL-DIM)
+#   - every FDATA record decodes with the channel layout                       (DLIS-FDATA)
+# plus a per-frame summary (DLIS-FRAME, severity "info"). Logical files can be checked in
+# parallel processes; every process opens the file with a context manager, so handles are
+# closed as soon as a logical file is done.
+#
+# The chunked reader uses dlisio internals (core.read_fdata, LogicalFile.fdata_index / .file /
+# .error_handler), checked against DLISIO_TESTED. With another dlisio version, or when one of
+# them is missing, frames are read with the public Frame.curves() and cut into chunks instead:
+# same results, but memory grows with the frame size (a warning is printed once).
+# Parallel logical files: with the "fork" start method (Linux) workers inherit the loaded file
+# and use their logical file's own stream; with "spawn" (Windows, macOS) each worker loads the
+# file again, which is correct but repeats the indexing of the whole file.
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import warnings
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import dlisio
+from dlisio import dlis, core
+
+from qc_findings import finding
+
+CHUNK_ROWS = 50000
+DLISIO_TESTED = ("1.0",)  # dlisio major.minor versions the chunked reader was verified with
+
+_CHUNKED = {}  # cached result of chunked_reader_available()
+
+
+def chunked_reader_available(logical_file):
+    """True when this dlisio has the internals iter_frame_chunks reads FDATA through."""
+    if "ok" not in _CHUNKED:
+        version = ".".join(dlisio.__version__.split(".")[:2])
+        missing = [name for name in ("fdata_index", "file", "error_handler") if not hasattr(logical_file, name)]
+        if not hasattr(core, "read_fdata"):
+            missing.append("core.read_fdata")
+        _CHUNKED["ok"] = version in DLISIO_TESTED and not missing
+        if not _CHUNKED["ok"]:
+            reason = f"missing {', '.join(missing)}" if missing else f"untested version {dlisio.__version__}"
+            warnings.warn(f"dlisio {dlisio.__version__}: chunked frame reading disabled ({reason}; tested with "
+                          f"{', '.join(DLISIO_TESTED)}.x); frames are decoded whole with Frame.curves().")
+    return _CHUNKED["ok"]
+
+
+def iter_frame_chunks(logical_file, frame, chunk_rows=CHUNK_ROWS):
+    """Yield the frame's data as structured arrays (FRAMENO + channels) of at most chunk_rows rows."""
+    if not chunked_reader_available(logical_file):
+        curves = frame.curves()
+        for start in range(0, len(curves), chunk_rows):
+            yield curves[start:start + chunk_rows]
+        return
+    indices = logical_file.fdata_index.get(frame.fingerprint, [])
+    dtype = frame.dtype(strict=False)
+    fmt = frame.fmtstr()
+    alloc = lambda size: np.empty(shape=size, dtype=dtype)
+    for start in range(0, len(indices), chunk_rows):
+        yield core.read_fdata("", fmt, "", logical_file.file, indices[start:start + chunk_rows],
+                              dtype.itemsize, alloc, logical_file.error_handler)
+
+
+def _check_channel_dims(frame, add):
+    """DIMENSION must be present and within ELEMENT-LIMIT; returns the expected sample shapes."""
+    shapes = []
+    for channel in frame.channels:
+        dims = list(channel.dimension or [])
+        limit = list(channel.element_limit or [])
+        if not dims:
+            add("DLIS-CHANNEL-DIM", f"Channel {channel.name} in frame {frame.name} has no DIMENSION.",
+                mnemonic=channel.name, expected="DIMENSION", actual="missing")
+        elif limit and (len(limit) != len(dims) or any(d > e for d, e in zip(dims, limit))):
+            add("DLIS-CHANNEL-DIM",
+                f"Channel {channel.name} in frame {frame.name}: DIMENSION {dims} exceeds ELEMENT-LIMIT {limit}.",
+                mnemonic=channel.name, expected=f"<= {limit}", actual=dims)
+        shapes.append(() if dims in ([], [1]) else tuple(dims))
+    return shapes
+
+
+def check_frame(dlis_file, logical_file, frame, section, chunk_rows=CHUNK_ROWS, spacing_tolerance=1e-2):
+    """
+    Findings for one frame. `spacing_tolerance` is relative to the frame spacing, since index
+    units range from 0.1 ft to 0.5 ms.
+    """
+    findings = []
+
+    def add(rule_id, message, severity="error", **kw):
+        findings.append(finding(dlis_file, rule_id, message, severity=severity, section=section, **kw))
+
+    shapes = _check_channel_dims(frame, add)
+    has_index = frame.index_type is not None and len(frame.channels) > 0
+    index_name = frame.channels[0].name if has_index else None
+    direction = {"INCREASING": 1, "DECREASING": -1}.get(str(frame.direction).upper(), 0)
+    spacing = abs(frame.spacing) if isinstance(frame.spacing, (int, float)) and frame.spacing else None
+
+    rows = 0
+    prev_frameno = prev_index = None
+    first_index = last_index = None
+    frameno_bad = nonmono = spacing_bad = 0
+    first_frameno_bad = first_nonmono = first_spacing_bad = None
+    dims_checked = False
+
+    try:
+        for chunk in iter_frame_chunks(logical_file, frame, chunk_rows):
+            if not len(chunk):
+                continue
+            names = chunk.dtype.names
+            if not dims_checked:
+                for channel, name, shape in zip(frame.channels, names[1:], shapes):
+                    actual = chunk[name].shape[1:]
+                    if actual != shape:
+                        add("DLIS-CHANNEL-DIM",
+                            f"Channel {channel.name} in frame {frame.name}: samples of shape {actual} "
+                            f"do not match DIMENSION {list(channel.dimension or [])}.",
+                            mnemonic=channel.name, expected=shape, actual=actual)
+                dims_checked = True
+            rows += len(chunk)
+
+            # FRAMENO must run 1, 2, 3, ... across chunk boundaries
+            frameno = chunk[names[0]].astype(np.int64)
+            if prev_frameno is not None:
+                frameno = np.concatenate(([prev_frameno], frameno))
+            elif frameno[0] != 1:
+                frameno_bad += 1
+                first_frameno_bad = int(frameno[0])
+            prev_frameno = frameno[-1]
+            bad = np.diff(frameno) != 1
+            if bad.any():
+                frameno_bad += int(bad.sum())
+                if first_frameno_bad is None:
+                    first_frameno_bad = int(frameno[np.flatnonzero(bad)[0] + 1])
+
+            if not has_index:
+                continue
+            index = np.asarray(chunk[names[1]], dtype=np.float64).reshape(len(chunk), -1)[:, 0]
+            if first_index is None:
+                first_index = float(index[0])
+            last_index = float(index[-1])
+            if prev_index is not None:
+                index = np.concatenate(([prev_index], index))
+            prev_index = index[-1]
+            diffs = np.diff(index)
+            if not len(diffs):
+                continue
+            if direction == 0:
+                nonzero = diffs[diffs != 0]
+                if len(nonzero):
+                    direction = 1 if nonzero[0] > 0 else -1
+            if direction:
+                bad = diffs * direction <= 0
+                if bad.any():
+                    nonmono += int(bad.sum())
+                    if first_nonmono is None:
+                        first_nonmono = float(index[np.flatnonzero(bad)[0] + 1])
+            if spacing is None:
+                spacing = abs(float(diffs[0])) or None
+            if spacing:
+                off = np.abs(np.abs(diffs) - spacing) > spacing_tolerance * spacing
+                if off.any():
+                    spacing_bad += int(off.sum())
+                    if first_spacing_bad is None:
+                        first_spacing_bad = float(index[np.flatnonzero(off)[0] + 1])
+    except (RuntimeError, ValueError) as e:
+        message = " ".join(str(e).split())
+        add("DLIS-FDATA", f"Frame {frame.name}: frame data cannot be decoded after {rows} frames: {message}",
+            severity="fatal", actual=message)
+
+    if frameno_bad:
+        add("DLIS-FRAMENO", f"Frame {frame.name}: {frameno_bad} missing or out-of-order frame numbers "
+            f"(first at FRAMENO {first_frameno_bad}).", expected="consecutive", actual=f"{frameno_bad} gaps")
+    if nonmono:
+        add("DLIS-INDEX-NONMONO", f"Frame {frame.name}: index {index_name} is not monotonic, "
+            f"{nonmono} reversals/duplicates (first at {first_nonmono}).",
+            mnemonic=index_name, expected="monotonic", actual=f"{nonmono} violations")
+    if spacing_bad:
+        add("DLIS-SPACING", f"Frame {frame.name}: index {index_name} increment differs from spacing "
+            f"{spacing} at {spacing_bad} frames (first at {first_spacing_bad}).",
+            mnemonic=index_name, expected=spacing, actual=f"{spacing_bad} irregular steps")
+    if not rows and not any(f.rule_id == "DLIS-FDATA" for f in findings):
+        add("DLIS-FRAME-EMPTY", f"Frame {frame.name} has no frame data.", severity="warning",
+            expected="FDATA", actual="none")
+    add("DLIS-FRAME", f"Frame {frame.name}: {rows} frames, index {first_index}..{last_index}",
+        severity="info", mnemonic=index_name, actual=f"rows={rows};first={first_index};last={last_index}")
+    return findings
+
+
+def check_logical_file_frames(dlis_file, logical_file, lf_index, chunk_rows=CHUNK_ROWS, spacing_tolerance=1e-2):
+    section = f"LogicalFile {lf_index + 1}"
+    findings = []
+    for frame in logical_file.frames:
+        findings += check_frame(dlis_file, logical_file, frame, section, chunk_rows, spacing_tolerance)
+    return findings
+
+
+# Physical files opened by check_frames, inherited by forked workers. dlis.load indexes the
+# whole file (the dominant cost on large files) and opens one stream per logical file, so a
+# forked worker can use its logical file's stream directly instead of loading the file again.
+# Under "spawn" the dictionary is empty in the worker and _logical_file_task loads the file.
+_INHERITED = {}
+
+
+def _logical_file_task(func, dlis_file, lf_index, args):
+    """Process-pool task: run func on one logical file (re-opening the file when it was not inherited)."""
+    physical_file = _INHERITED.get(dlis_file)
+    if physical_file is not None:
+        return func(dlis_file, physical_file[lf_index], lf_index, *args)
+    with dlis.load(dlis_file) as files:
+        return func(dlis_file, files[lf_index], lf_index, *args)
+
+
+def map_logical_files(func, dlis_file, physical_file, lf_workers=1, args=()):
+    """
+    [func(dlis_file, logical_file, lf_index, *args) for every logical file] of an opened physical
+    file. With lf_workers > 1 the logical files run in separate processes, except inside daemon
+    workers (e.g. qc_batch), which cannot start children and already run one file per process.
+    func must be a module-level function.
+    """
+    n_lf = len(physical_file)
+    if lf_workers > 1 and n_lf > 1 and not mp.current_process().daemon:
+        fork = "fork" in mp.get_all_start_methods()
+        ctx = mp.get_context("fork" if fork else None)
+        if fork:
+            _INHERITED[dlis_file] = physical_file
+        try:
+            with ProcessPoolExecutor(max_workers=min(lf_workers, n_lf), mp_context=ctx) as pool:
+                futures = [pool.submit(_logical_file_task, func, dlis_file, i, args) for i in range(n_lf)]
+                return [future.result() for future in futures]
+        finally:
+            _INHERITED.pop(dlis_file, None)
+    return [func(dlis_file, logical_file, lf_index, *args) for lf_index, logical_file in enumerate(physical_file)]
+
+
+def check_frames(dlis_file, physical_file, lf_workers=1, chunk_rows=CHUNK_ROWS, spacing_tolerance=1e-2):
+    """Deep check of all frames of an opened physical file, logical files in parallel with lf_workers > 1."""
+    results = map_logical_files(check_logical_file_frames, dlis_file, physical_file, lf_workers,
+                                (chunk_rows, spacing_tolerance))
+    return [f for findings in results for f in findings]
@@ -3,13 +3,34 @@
 # 
 # DLIS header-only extractor (Tkinter + dlisio),generate separate Excel files per DLIS file.
 #
+# Headless mode extracts many files in parallel worker processes and writes Excel (streamed,
+# write-only workbook), Parquet (one file per sheet and DLIS file) or one SQLite database:
+#   python dlis_header_to_excel.py /archive/dlis --format sqlite --outdir headers --workers 8 --no-raw
+# Without arguments the Tkinter dialogs pick the files and Excel files are written as before.
+#
 # --------------------------------------------------------------------------------------
 import os
+import re
+import time
+import sqlite3
+import argparse
 import pandas as pd
 import numpy as np
 from tkinter import Tk, filedialog, messagebox
 from dlisio import dlis
 
+from dlis_prescan import prescan_dlis, format_prescan
+from qc_batch import iter_named_files, run_parallel, TaskFailure
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
+
+SHEETS = ["Origins", "Parameters", "Tools", "Channels", "Frames", "ChannelInfo"]
+FORMATS = ["excel", "parquet", "sqlite"]
+
 # --------------------------------------------------
 # Helpers
 # --------------------------------------------------
@@ -21,14 +42,37 @@ def normalize_scalar(val):
         return val
     return str(val)
 
+
+# Probing a dozen names per object with hasattr/getattr dominated extraction on files with tens
+# of thousands of parameters: every miss raises AttributeError, and hasattr evaluates properties
+# such as dlisio's Parameter.values, which getattr then evaluates again. The names a concrete
+# type can answer are learned once from the class (without running properties) and reused.
+_TYPE_FIELDS = {}
+
+
+def candidate_fields(obj, names):
+    """The names of `names` that obj may have, in the given order (all of them for dynamic types)."""
+    cls = type(obj)
+    fields = _TYPE_FIELDS.get((cls, names))
+    if fields is None:
+        if hasattr(cls, "__getattr__"):
+            fields = names  # attributes computed on demand: probe everything
+        else:
+            fields = tuple(n for n in names if hasattr(cls, n))
+        _TYPE_FIELDS[(cls, names)] = fields
+    inst = getattr(obj, "__dict__", None)
+    if inst and fields is not names and any(n in inst for n in names):
+        return tuple(n for n in names if n in fields or n in inst)
+    return fields
+
+
 def first_attr(obj, names, default=None):
-    for n in names:
-        if hasattr(obj, n):
-            try:
-                v = getattr(obj, n)
-                return v() if callable(v) else v
-            except:
-                continue
+    for n in candidate_fields(obj, tuple(names)):
+        try:
+            v = getattr(obj, n)
+            return v() if callable(v) else v
+        except:
+            continue
     return default
 
 
@@ -36,46 +80,23 @@ def first_attr(obj, names, default=None):
 # Vendor-specific unwrapping
 # --------------------------------------------------
 
-def unwrap_vendor_specific(param):
-    # Schlumberger
-    slb_fields = [
-        "value", "v", "val", "scalar", "scalars",
-        "data", "elements", "contents",
-        "text", "enum", "values"
-    ]
-    for f in slb_fields:
-        if hasattr(param, f):
-            try:
-                v = getattr(param, f)
-                if callable(v): v = v()
-                if v not in [None, ""]:
-                    return v
-            except:
-                pass
+SLB_FIELDS = ("value", "v", "val", "scalar", "scalars", "data", "elements", "contents", "text", "enum", "values")
+HALLIBURTON_FIELDS = ("getvalue", "representation_code", "array")
+BAKER_FIELDS = ("data", "values", "elements")  # Baker / INTEQ
+# Probing order: Schlumberger, Halliburton, Baker (whose names are already covered by SLB_FIELDS)
+VENDOR_FIELDS = tuple(dict.fromkeys(SLB_FIELDS + HALLIBURTON_FIELDS + BAKER_FIELDS))
+PEEL_FIELDS = ("getvalue", "value")
 
-    # Halliburton
-    hal_fields = ["getvalue", "representation_code", "array"]
-    for f in hal_fields:
-        if hasattr(param, f):
-            try:
-                v = getattr(param, f)
-                v = v() if callable(v) else v
-                if v not in [None, ""]:
-                    return v
-            except:
-                pass
 
-    # Baker / INTEQ
-    baker_fields = ["data", "values", "elements"]
-    for f in baker_fields:
-        if hasattr(param, f):
-            try:
-                v = getattr(param, f)
-                v = v() if callable(v) else v
-                if v not in [None, ""]:
-                    return v
-            except:
-                pass
+def unwrap_vendor_specific(param):
+    for f in candidate_fields(param, VENDOR_FIELDS):
+        try:
+            v = getattr(param, f)
+            if callable(v): v = v()
+            if v not in [None, ""]:
+                return v
+        except:
+            pass
 
     return None
 
@@ -98,11 +119,9 @@ def unwrap_param_value(param):
         seen.add(id(val))
 
         next_val = None
-        if hasattr(val, "getvalue"):
-            try: next_val = val.getvalue()
-            except: pass
-        elif hasattr(val, "value"):
-            try: next_val = val.value
+        fields = candidate_fields(val, PEEL_FIELDS)
+        if fields:
+            try: next_val = val.getvalue() if fields[0] == "getvalue" else val.value
             except: pass
 
         if next_val is None or next_val is val:
@@ -110,7 +129,7 @@ def unwrap_param_value(param):
         val = next_val
 
     # data_array → numpy array
-    if hasattr(val, "array"):
+    if candidate_fields(val, ("array",)):
         try: val = val.array
         except: pass
 
@@ -126,13 +145,31 @@ def unwrap_param_value(param):
 # Extraction per file
 # --------------------------------------------------
 
-def extract_dlis_header(dlis_file):
+def extract_dlis_header(dlis_file, raw=True, verbose=True):
+    """
+    The six header tables of a DLIS file as DataFrames, or None when it cannot be read.
+    raw=False leaves out the Raw columns (str() of every parameter, channel and frame).
+    """
+    # Cheap structural pre-scan first: a truncated file would otherwise take minutes to reject
+    findings, scan = prescan_dlis(dlis_file)
+    if verbose:
+        print(format_prescan(dlis_file, scan))
+    fatal = [f for f in findings if f.severity == "fatal"]
+    if fatal:
+        print(f"❌ Skipping {dlis_file}: {fatal[0].message}")
+        return None
+
     try:
         pf = dlis.load(dlis_file)
     except Exception as e:
         print(f"❌ Cannot load {dlis_file}: {e}")
         return None
 
+    with pf:
+        return _extract_tables(pf, raw)
+
+
+def _extract_tables(pf, raw):
     origins, params, tools, channels, frames, chinfo = [], [], [], [], [], []
 
     for lf_index, lf in enumerate(pf):
@@ -151,12 +188,14 @@ def extract_dlis_header(dlis_file):
         for p in lf.parameters:
             name = first_attr(p, ["objname", "name", "tag", "mnemonic", "id"])
             value = unwrap_param_value(p)
-            params.append({
+            row = {
                 "LogicalFile": lf_id,
                 "Name": normalize_scalar(name),
-                "Value": normalize_scalar(value),
-                "Raw": str(p)
-            })
+                "Value": normalize_scalar(value)
+            }
+            if raw:
+                row["Raw"] = str(p)
+            params.append(row)
 
         # -------- Tools --------
         for t in lf.tools:
@@ -174,11 +213,13 @@ def extract_dlis_header(dlis_file):
         # -------- Channels & Channel Info --------
         for ch in lf.channels:
             chname = first_attr(ch, ["name", "mnemonic", "objname"])
-            channels.append({
+            row = {
                 "LogicalFile": lf_id,
-                "ChannelName": normalize_scalar(chname),
-                "Raw": str(ch)
-            })
+                "ChannelName": normalize_scalar(chname)
+            }
+            if raw:
+                row["Raw"] = str(ch)
+            channels.append(row)
 
             # Mnemonic–Unit–Description table
             mnemonic = first_attr(ch, ["mnemonic", "name"])
@@ -199,11 +240,13 @@ def extract_dlis_header(dlis_file):
         # -------- Frames --------
         for fr in lf.frames:
             fname = first_attr(fr, ["name", "objname", "tag", "identifier"])
-            frames.append({
+            row = {
                 "LogicalFile": lf_id,
-                "FrameName": normalize_scalar(fname),
-                "Raw": str(fr)
-            })
+                "FrameName": normalize_scalar(fname)
+            }
+            if raw:
+                row["Raw"] = str(fr)
+            frames.append(row)
 
     return (
         pd.DataFrame(origins),
@@ -215,11 +258,180 @@ def extract_dlis_header(dlis_file):
     )
 
 
+def header_sheets(result):
+    """[(sheet name, DataFrame)] in workbook order; ChannelInfo is deduplicated."""
+    sheets = list(zip(SHEETS, result))
+    name, df_ci = sheets[-1]
+    if not df_ci.empty:
+        sheets[-1] = (name, df_ci.drop_duplicates(subset=["Mnemonic", "Unit", "Description"]))
+    return sheets
+
+
+# --------------------------------------------------
+# Output backends
+# --------------------------------------------------
+
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _cell(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, str):
+        return _ILLEGAL_XML.sub("", v)
+    return v
+
+
+def write_excel(path, sheets):
+    """Write the sheets row by row into a write-only openpyxl workbook (memory does not grow with rows)."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for name, df in sheets:
+        ws = wb.create_sheet(title=name)
+        ws.append([str(c) for c in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_cell(v) for v in row])
+    wb.save(path)
+
+
+def _arrow_safe(df):
+    """Object columns mixing str/int/float (normalize_scalar output) are written as text."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].map(lambda v: None if v is None or (isinstance(v, float) and v != v) else str(v))
+    return df
+
+
+def write_parquet(outdir, basename, sheets):
+    """One Parquet file per sheet: <outdir>/<Sheet>/<basename>.parquet (a dataset per sheet)."""
+    if not HAS_PYARROW:
+        raise ImportError("Install pyarrow to write Parquet files.")
+    for name, df in sheets:
+        os.makedirs(os.path.join(outdir, name), exist_ok=True)
+        _arrow_safe(df).to_parquet(os.path.join(outdir, name, f"{basename}.parquet"), index=False)
+
+
+class SQLiteSink:
+    """One database for all files; tables gain columns as new ORIGIN/TOOL attributes appear."""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def write(self, dlis_file, sheets):
+        path = os.path.abspath(dlis_file)
+        for name, df in sheets:
+            table = name.lower()
+            # A re-run replaces the rows of this file
+            exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+            if exists:
+                self.conn.execute(f'DELETE FROM "{table}" WHERE File = ?', (path,))
+            if df.empty:
+                continue
+            df = df.copy()
+            df.insert(0, "File", path)
+            if exists:
+                columns = {row[1] for row in self.conn.execute(f'PRAGMA table_info("{table}")')}
+                for col in df.columns:
+                    if col not in columns:
+                        self.conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+            df.to_sql(table, self.conn, if_exists="append", index=False)
+            if not exists:
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_file" ON "{table}" (File)')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def export_dlis_header(dlis_file, outdir, fmt="excel", raw=True, basename=None):
+    """
+    Worker task: extract one file and write it (Excel/Parquet) in the worker. For SQLite the
+    sheets are returned so the parent process is the only writer. Returns None if unreadable.
+    """
+    result = extract_dlis_header(dlis_file, raw=raw, verbose=False)
+    if result is None:
+        return None
+    sheets = header_sheets(result)
+    if fmt == "sqlite":
+        return sheets
+    basename = basename or os.path.splitext(os.path.basename(dlis_file))[0]
+    if fmt == "parquet":
+        write_parquet(outdir, basename, sheets)
+    else:
+        write_excel(os.path.join(outdir, f"{basename}_header.xlsx"), sheets)
+    return {name: len(df) for name, df in sheets}
+
+
+def _export_task(task, **kwargs):
+    path, basename = task
+    return export_dlis_header(path, basename=basename, **kwargs)
+
+
+def export_headers(sources, outdir, fmt="excel", raw=True, workers=None, timeout=None, verbose=True):
+    """Extract every DLIS file under `sources` in parallel worker processes. Returns totals."""
+    t0 = time.perf_counter()
+    os.makedirs(outdir, exist_ok=True)
+    totals = {"files": 0, "skipped": 0, "failed": 0, "seconds": 0.0}
+    sink = SQLiteSink(os.path.join(outdir, "dlis_headers.sqlite")) if fmt == "sqlite" else None
+    kwargs = {"outdir": outdir, "fmt": fmt, "raw": raw}
+    try:
+        tasks = iter_named_files(sources, [".dlis"])
+        for (path, _), result, seconds in run_parallel(_export_task, tasks, workers, timeout, kwargs):
+            if isinstance(result, TaskFailure):
+                totals["failed"] += 1
+                print(f"❌ {path}: {result}")
+                continue
+            if result is None:
+                totals["skipped"] += 1
+                continue
+            if sink is not None:
+                sink.write(path, result)
+                result = {name: len(df) for name, df in result}
+            totals["files"] += 1
+            if verbose:
+                print(f"✔ {path}: {result['Parameters']} parameters, {result['Channels']} channels, "
+                      f"{result['Frames']} frames ({seconds:.1f}s)")
+    finally:
+        if sink is not None:
+            sink.close()
+    totals["seconds"] = time.perf_counter() - t0
+    return totals
+
+
 # --------------------------------------------------
 # Tkinter UI
 # --------------------------------------------------
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract DLIS headers to Excel, Parquet or SQLite.")
+    parser.add_argument("sources", nargs="*",
+                        help="Directories (searched recursively), DLIS files or list files; none opens the file dialog")
+    parser.add_argument("--outdir", default="output_dlis_header", help="Output directory (default: output_dlis_header)")
+    parser.add_argument("--format", choices=FORMATS, default="excel",
+                        help="excel: <name>_header.xlsx per file; parquet: <Sheet>/<name>.parquet; "
+                             "sqlite: dlis_headers.sqlite with one table per sheet")
+    parser.add_argument("--no-raw", action="store_true", help="Leave out the Raw str() columns (much faster)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-file timeout in seconds")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary and failures")
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
+    raw = not args.no_raw
+    if args.sources:
+        totals = export_headers(args.sources, args.outdir, args.format, raw, args.workers, args.timeout,
+                                verbose=not args.quiet)
+        print(f"\n{totals['files']} files exported ({totals['skipped']} skipped, {totals['failed']} failed) "
+              f"to {args.outdir} in {totals['seconds']:.1f}s")
+        return
+
     Tk().withdraw()
 
     files = filedialog.askopenfilenames(
@@ -235,26 +447,14 @@ def main():
 
     for f in files:
         print(f"\n→ Processing {f}")
-        result = extract_dlis_header(f)
+        result = extract_dlis_header(f, raw=raw)
         if result is None:
             continue
 
-        df_o, df_p, df_t, df_c, df_f, df_ci = result
-
-        # Deduplicate ChannelInfo only
-        df_ci = df_ci.drop_duplicates(subset=["Mnemonic", "Unit", "Description"])
-
-        # Write individual Excel file
+        # Write individual Excel file (Channels unchanged, ChannelInfo deduped)
         basename = os.path.splitext(os.path.basename(f))[0]
         excel_path = os.path.join(outdir, f"{basename}_header.xlsx")
-
-        with pd.ExcelWriter(excel_path, engine="openpyxl") as x:
-            df_o.to_excel(x, "Origins", index=False)
-            df_p.to_excel(x, "Parameters", index=False)
-            df_t.to_excel(x, "Tools", index=False)
-            df_c.to_excel(x, "Channels", index=False)     # unchanged
-            df_f.to_excel(x, "Frames", index=False)
-            df_ci.to_excel(x, "ChannelInfo", index=False) # deduped
+        write_excel(excel_path, header_sheets(result))
 
         print(f"✔ Saved: {excel_path}")
 
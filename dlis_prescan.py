@@ -0,0 +1,257 @@
+# ---------------------------------------------------------------------------------------
+# dlis_prescan.py
+#
+# Structural pre-scan of a DLIS (RP66 v1) file, read straight from a memory map before the
+# file is handed to dlisio. Walks the Storage Unit Label, every Visible Record envelope
+# (2-byte length, 0xFF, version 1) and every Logical Record Segment header (2-byte length,
+# attributes, type), and reports:
+#   - logical record / logical file counts and the EFLR/IFLR split
+#   - truncation points (a record running past EOF, a last logical record left open)
+#   - broken envelopes, segments overrunning their visible record, predecessor/successor
+#     chain errors, padding and trailing-length errors
+# No object is decoded, so a truncated multi-GB file is rejected without loading it.
+# Tape Image Format (TIF) files are recognised but not walked (dlisio still reads them).
+#
+# Usage: python dlis_prescan.py file.dlis [...]
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import mmap
+import time
+import struct
+
+from qc_findings import finding
+
+SUL_LENGTH = 80
+VR_MIN_LENGTH = 20
+LRS_MIN_LENGTH = 16
+
+# Logical Record Segment attribute bits
+LRS_EXPLICIT = 0x80       # EFLR (else IFLR)
+LRS_PREDECESSOR = 0x40
+LRS_SUCCESSOR = 0x20
+LRS_ENCRYPTED = 0x10
+LRS_CHECKSUM = 0x04
+LRS_TRAILING_LENGTH = 0x02
+LRS_PADDING = 0x01
+
+FHLR = 0  # EFLR type of the File Header that opens every logical file
+
+TAIL_PADDING = 64 * 1024  # zero/blank bytes after the last visible record tolerated as padding
+
+_HEADER = struct.Struct(">HBB")
+_UINT16 = struct.Struct(">H")
+
+
+def _is_vr_header(m, pos):
+    return pos + 4 <= len(m) and m[pos + 2] == 0xFF and m[pos + 3] == 0x01
+
+
+def _read_sul(m):
+    """Return (sul dict or None, offset of the first visible record or None)."""
+    head = bytes(m[:SUL_LENGTH])
+    if len(head) == SUL_LENGTH and head[4:9].startswith(b"V1") and head[9:15] == b"RECORD":
+        text = head.decode("latin-1")
+        sul = {"sequence": text[0:4].strip(), "version": text[4:9].strip(),
+               "max_record_length": text[15:20].strip(), "id": text[20:80].strip()}
+        return sul, SUL_LENGTH
+    for pos in range(0, min(len(m) - 3, 2 * SUL_LENGTH)):
+        if _is_vr_header(m, pos):
+            return None, pos
+    return None, None
+
+
+def _is_tif(m):
+    if len(m) < 12 + SUL_LENGTH:
+        return False
+    kind, prev, nxt = struct.unpack_from("<III", m, 0)
+    return kind == 0 and prev == 0 and 12 < nxt <= len(m) and bytes(m[16:18]) == b"V1"
+
+
+def prescan_dlis(path):
+    """
+    Walk the RP66 envelopes of `path` and return (findings, summary). A "fatal" finding means
+    the file is not worth loading with dlisio; summary holds the counts, the truncation point
+    (None if intact), timing and throughput (MB/s).
+    """
+    t0 = time.perf_counter()
+    findings = []
+    size = os.path.getsize(path)
+    summary = {"bytes": size, "sul": None, "tif": False, "visible_records": 0, "segments": 0,
+               "logical_records": 0, "eflr": 0, "iflr": 0, "logical_files": 0, "encrypted": 0,
+               "truncated_at": None, "seconds": 0.0, "mb_per_s": 0.0}
+
+    def add(rule_id, message, severity="error", **kw):
+        findings.append(finding(path, rule_id, message, severity=severity, section="RP66", **kw))
+
+    def done():
+        summary["seconds"] = time.perf_counter() - t0
+        summary["mb_per_s"] = size / 1e6 / max(summary["seconds"], 1e-9)
+        n_lr = summary["eflr"] + summary["iflr"]
+        summary["eflr_ratio"] = summary["eflr"] / n_lr if n_lr else 0.0
+        return findings, summary
+
+    if size == 0:
+        add("DLIS-EMPTY", "File is empty or not a valid DLIS file.", severity="fatal")
+        return done()
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if _is_tif(m):
+            summary["tif"] = True
+            add("DLIS-TIF", "Tape Image Format file: envelopes not pre-scanned.", severity="info")
+            return done()
+
+        sul, pos = _read_sul(m)
+        summary["sul"] = sul
+        if pos is None:
+            add("DLIS-SUL", "No Storage Unit Label or visible record found at the start of the file.",
+                severity="fatal", expected="SUL / visible record", actual="none")
+            return done()
+        if sul is None:
+            add("DLIS-SUL", f"Missing or invalid Storage Unit Label; first visible record at byte {pos}.",
+                severity="warning", expected="SUL", actual="missing")
+
+        unpack_header, unpack_uint16 = _HEADER.unpack_from, _UINT16.unpack_from
+        n_vr = n_seg = n_lr = n_eflr = n_lf = n_encrypted = 0
+        short_seg = odd_seg = bad_padding = bad_trailer = bad_chain = 0
+        first_short = first_odd = first_padding = first_trailer = first_chain = None
+        open_record = False       # last segment had the successor bit
+        record_start = None       # offset of the segment that opened the current logical record
+
+        while pos < size:
+            if pos + 4 > size:
+                summary["truncated_at"] = pos
+                add("DLIS-TRUNCATED", f"File truncated at byte {pos}: incomplete visible record header.",
+                    severity="fatal", expected="4-byte header", actual=f"{size - pos} bytes")
+                break
+            vr_len, ff, version = unpack_header(m, pos)
+            if ff != 0xFF or version != 1 or vr_len < VR_MIN_LENGTH:
+                if size - pos <= TAIL_PADDING and not bytes(m[pos:]).strip(b"\x00 "):
+                    add("DLIS-PADDING", f"{size - pos} bytes of padding after the last visible record.",
+                        severity="warning", actual=f"{size - pos} bytes")
+                    break
+                add("DLIS-VR", f"Invalid visible record header at byte {pos} "
+                    f"(length={vr_len}, marker=0x{ff:02X}, version={version}).",
+                    severity="fatal", expected="length>=20, 0xFF, 1", actual=f"{vr_len}, 0x{ff:02X}, {version}")
+                break
+            vr_end = pos + vr_len
+            if vr_end > size:
+                summary["truncated_at"] = pos
+                add("DLIS-TRUNCATED", f"File truncated at byte {pos}: visible record declares {vr_len} bytes, "
+                    f"{size - pos} available.", severity="fatal", expected=vr_len, actual=size - pos)
+                break
+            n_vr += 1
+
+            seg = pos + 4
+            while seg < vr_end:
+                if seg + 4 > vr_end:
+                    add("DLIS-LRS", f"Logical record segment header crosses the visible record end at byte {seg}.",
+                        severity="fatal")
+                    vr_end = -1
+                    break
+                lrs_len, attr, lr_type = unpack_header(m, seg)
+                seg_end = seg + lrs_len
+                if lrs_len < 4 or seg_end > vr_end:
+                    add("DLIS-LRS", f"Logical record segment at byte {seg} declares {lrs_len} bytes, "
+                        f"{vr_end - seg} left in its visible record.",
+                        severity="fatal", expected=f"<= {vr_end - seg}", actual=lrs_len)
+                    vr_end = -1
+                    break
+                if lrs_len < LRS_MIN_LENGTH:
+                    short_seg += 1
+                    first_short = seg if first_short is None else first_short
+                if lrs_len & 1:
+                    odd_seg += 1
+                    first_odd = seg if first_odd is None else first_odd
+
+                # Trailer: [padding][checksum][trailing length], read from the end
+                body_end = seg_end
+                if attr & LRS_TRAILING_LENGTH:
+                    body_end -= 2
+                    if unpack_uint16(m, body_end)[0] != lrs_len:
+                        bad_trailer += 1
+                        first_trailer = seg if first_trailer is None else first_trailer
+                if attr & LRS_CHECKSUM:
+                    body_end -= 2
+                if attr & LRS_PADDING:
+                    pad = m[body_end - 1] if body_end > seg + 4 else 0
+                    if pad == 0 or pad > body_end - seg - 4:
+                        bad_padding += 1
+                        first_padding = seg if first_padding is None else first_padding
+                if attr & LRS_ENCRYPTED:
+                    n_encrypted += 1
+
+                # Predecessor/successor chain
+                if attr & LRS_PREDECESSOR:
+                    if not open_record:
+                        bad_chain += 1
+                        first_chain = seg if first_chain is None else first_chain
+                else:
+                    if open_record:
+                        bad_chain += 1
+                        first_chain = seg if first_chain is None else first_chain
+                    n_lr += 1
+                    record_start = seg
+                    if attr & LRS_EXPLICIT:
+                        n_eflr += 1
+                        if lr_type == FHLR:
+                            n_lf += 1
+                open_record = bool(attr & LRS_SUCCESSOR)
+                n_seg += 1
+                seg = seg_end
+            if vr_end == -1:
+                break
+            pos = vr_end
+        else:
+            if open_record:
+                summary["truncated_at"] = record_start
+                add("DLIS-TRUNCATED", f"File ends inside the logical record that starts at byte {record_start}.",
+                    severity="fatal", expected="complete logical record", actual="missing successor segments")
+
+    summary.update(visible_records=n_vr, segments=n_seg, logical_records=n_lr, eflr=n_eflr,
+                   iflr=n_lr - n_eflr, logical_files=n_lf, encrypted=n_encrypted)
+    if short_seg:
+        add("DLIS-LRS-LENGTH", f"{short_seg} logical record segments shorter than {LRS_MIN_LENGTH} bytes "
+            f"(first at byte {first_short}).", expected=f">= {LRS_MIN_LENGTH}", actual=f"{short_seg} segments")
+    if odd_seg:
+        add("DLIS-LRS-LENGTH", f"{odd_seg} logical record segments of odd length (first at byte {first_odd}).",
+            expected="even", actual=f"{odd_seg} segments")
+    if bad_padding:
+        # dlisio cannot trim such a segment and aborts the load
+        add("DLIS-PADDING", f"{bad_padding} logical record segments with an invalid pad count "
+            f"(first at byte {first_padding}).", severity="fatal", actual=f"{bad_padding} segments")
+    if bad_trailer:
+        add("DLIS-TRAILER", f"{bad_trailer} logical record segments whose trailing length differs from the "
+            f"header (first at byte {first_trailer}).", actual=f"{bad_trailer} segments")
+    if bad_chain:
+        add("DLIS-LR-CHAIN", f"{bad_chain} logical record segments break the predecessor/successor chain "
+            f"(first at byte {first_chain}).", actual=f"{bad_chain} segments")
+    if n_lr and not n_lf:
+        add("DLIS-FHLR", "No File Header logical record found.", expected="FILE-HEADER", actual="missing")
+    add("DLIS-PRESCAN", f"{n_lf} logical files, {n_lr} logical records ({n_eflr} EFLR / {n_lr - n_eflr} IFLR), "
+        f"{n_vr} visible records", severity="info",
+        actual=f"logical_files={n_lf};eflr={n_eflr};iflr={n_lr - n_eflr};visible_records={n_vr};"
+               f"truncated_at={summary['truncated_at']}")
+    return done()
+
+
+def format_prescan(path, summary):
+    """One-line summary for logs."""
+    if summary["tif"]:
+        return f"{os.path.basename(path)}: TIF file, not pre-scanned"
+    return (f"{os.path.basename(path)}: {summary['logical_files']} logical files, "
+            f"{summary['logical_records']} logical records ({summary['eflr']} EFLR / {summary['iflr']} IFLR), "
+            f"{summary['visible_records']} visible records, "
+            f"{'truncated at byte ' + str(summary['truncated_at']) if summary['truncated_at'] is not None else 'not truncated'}; "
+            f"{summary['bytes'] / 1e6:.1f} MB in {summary['seconds']:.3f}s ({summary['mb_per_s']:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    import sys
+    for dlis_path in sys.argv[1:]:
+        scan_findings, info = prescan_dlis(dlis_path)
+        print(format_prescan(dlis_path, info))
+        for f in scan_findings:
+            if f.severity != "info":
+                print(f"  [{f.severity}] {f.rule_id}: {f.message}")
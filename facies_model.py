@@ -0,0 +1,128 @@
+# ---------------------------------------------------------------------------------------
+# facies_model.py
+#
+# Persisted electrofacies model for MultiWell_RockTyping_using_logs.py: the scaler statistics,
+# the cluster centroids and the cluster -> facies mapping of one field fit, saved as a versioned
+# joblib file. New wells are assigned by a vectorized nearest-centroid lookup in scaled space
+# (what KMeans.predict does), so adding a well never refits and never changes earlier wells.
+#
+# Cluster ids are stable: clusters are numbered by increasing centroid GR, so Electrofacies 0 is
+# always the cleanest cluster, whatever order KMeans happened to find them in. The number of
+# clusters can be chosen with select_n_clusters(): inertia and silhouette of KMeans fits on a
+# random subsample, which keeps the search fast on large fields.
+# Usage (through MultiWell_RockTyping_using_logs.py):
+#   python MultiWell_RockTyping_using_logs.py /field/csv --streaming --select-k 2 8 --save-model field_facies.joblib
+#   python MultiWell_RockTyping_using_logs.py /new/wells --model field_facies.joblib --output new_facies.csv
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+MODEL_VERSION = 1
+BATCH_ROWS = 200000
+SILHOUETTE_ROWS = 10000  # silhouette is O(n^2): computed on at most this many rows
+
+
+def gr_order(centroids, features):
+    """Cluster ids sorted by increasing centroid GR: order[new_id] = old_id."""
+    return np.argsort(np.asarray(centroids)[:, list(features).index("GR")], kind="stable")
+
+
+class FaciesModel:
+    """Scaler statistics, centroids (in log units, GR-ordered) and facies names of one field fit."""
+
+    def __init__(self, features, mean, scale, centroids, facies_map, n_train=0, sources=None):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.facies_map = dict(facies_map)
+        self.n_train = n_train
+        self.sources = list(sources or [])
+        self.version = MODEL_VERSION
+        self.created = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    @classmethod
+    def from_fit(cls, scaler, cluster_centers, name_facies, n_train=0, sources=None, features=None):
+        """
+        Model from a fitted StandardScaler and KMeans centers (scaled space). Clusters are renumbered
+        by centroid GR; name_facies(Series of centroid GR by id) -> {id: facies name}.
+        Returns (model, order) with order[new_id] = old KMeans id.
+        """
+        features = list(features if features is not None else scaler.feature_names_in_)
+        centroids = scaler.inverse_transform(np.asarray(cluster_centers, dtype=np.float64))
+        order = gr_order(centroids, features)
+        centroids = centroids[order]
+        facies_map = name_facies(pd.Series(centroids[:, features.index("GR")]))
+        return cls(features, scaler.mean_, scaler.scale_, centroids, facies_map, n_train, sources), order
+
+    @property
+    def n_clusters(self):
+        return len(self.centroids)
+
+    def transform(self, x):
+        return (np.asarray(x, dtype=np.float64) - self.mean) / self.scale
+
+    def predict(self, x, batch_rows=BATCH_ROWS):
+        """Nearest-centroid cluster id of every row of x (n, len(features)), in log units."""
+        x = np.asarray(x, dtype=np.float64).reshape(-1, len(self.features))
+        centers = self.transform(self.centroids)
+        center_sq = (centers ** 2).sum(axis=1)
+        labels = np.empty(len(x), dtype=np.int64)
+        for start in range(0, len(x), batch_rows):
+            z = self.transform(x[start:start + batch_rows])
+            # |z - c|^2 = |z|^2 - 2 z.c + |c|^2; |z|^2 is the same for every centroid
+            labels[start:start + batch_rows] = np.argmin(center_sq - 2.0 * z @ centers.T, axis=1)
+        return labels
+
+    def labels(self, clusters):
+        """Facies names of cluster ids."""
+        names = np.array([self.facies_map.get(i) for i in range(self.n_clusters)], dtype=object)
+        return names[np.asarray(clusters)]
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        joblib.dump(self, tmp)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path):
+        model = joblib.load(path)
+        if not isinstance(model, FaciesModel) or model.version != MODEL_VERSION:
+            raise ValueError(f"{path} is not a version {MODEL_VERSION} facies model")
+        return model
+
+    def describe(self):
+        lines = [f"Facies model v{self.version} ({self.created}), {self.n_clusters} clusters, "
+                 f"{self.n_train} samples from {len(self.sources)} wells"]
+        for i, row in enumerate(self.centroids):
+            values = ", ".join(f"{f} {v:.3f}" for f, v in zip(self.features, row))
+            lines.append(f"  {i} {self.facies_map.get(i)}: {values}")
+        return "\n".join(lines)
+
+
+def select_n_clusters(x_scaled, k_values, silhouette_rows=SILHOUETTE_ROWS, random_state=42):
+    """
+    Inertia and silhouette of a KMeans fit for every k on x_scaled (a subsample of the field,
+    already scaled). Returns (table, best k by silhouette).
+    """
+    x_scaled = np.asarray(x_scaled, dtype=np.float64)
+    rows = []
+    for k in k_values:
+        if not 2 <= k < len(x_scaled):
+            continue
+        km = KMeans(n_clusters=k, random_state=random_state, n_init=10).fit(x_scaled)
+        silhouette = silhouette_score(x_scaled, km.labels_, sample_size=min(silhouette_rows, len(x_scaled)),
+                                      random_state=random_state)
+        rows.append({"k": k, "inertia": km.inertia_, "silhouette": silhouette})
+    if not rows:
+        raise ValueError("No cluster count to evaluate: k must be at least 2 and below the sample size.")
+    table = pd.DataFrame(rows).set_index("k")
+    return table, int(table["silhouette"].idxmax())
@@ -0,0 +1,357 @@
+# ---------------------------------------------------------------------------------------
+# las_curve_cache.py
+#
+# Binary sidecar cache for parsed LAS curves, shared by the spike detector, the porosity
+# predictor and the LAS checkers. The first read of a file parses it with lasio and stores
+#   curves.npy  - all curves as one C-order float64 array (n_curves, n_rows), one row per curve
+#   meta.json   - header sections (as header_from_lasio sees them), curve list, source fingerprint
+# in a directory keyed by the file fingerprint (absolute path, size, mtime, lasio options and
+# version). Later reads memory-map curves.npy, so loading a curve costs milliseconds and no copy.
+# The cache is trimmed to a size limit, least recently used entries first.
+#
+# Configuration: LAS_CURVE_CACHE=<directory> (or "off" to disable), LAS_CURVE_CACHE_MB=<limit>.
+# The LAS checkers read every file once per run and use the cache only when LAS_CURVE_CACHE is
+# set (opt-in, see cache_requested); the spike detector and the porosity predictor use it by default.
+# Usage: python las_curve_cache.py warm /archive/las [--workers 8]
+#        python las_curve_cache.py bench file.las
+#        python las_curve_cache.py stats | clear
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from las_scan import HeaderItem, LasHeader
+
+try:
+    import lasio
+    HAS_LASIO = True
+except Exception:
+    HAS_LASIO = False
+
+CACHE_VERSION = 1
+# lasio options of every cached read: they are part of the cache key, so `warm`, the checkers and
+# the plain read_las(path) of the spike detector and porosity predictor must all use the same ones
+READ_OPTIONS = {"ignore_header_errors": True}
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "las_curve_cache")
+DEFAULT_MAX_MB = 4096
+
+_DEFAULT = {}  # per-process default cache, built on first use
+
+
+# --------------------------------------------------
+# Cached file
+# --------------------------------------------------
+
+class CurveList(list):
+    """List of curve HeaderItems; `"GR" in curves` tests mnemonics as lasio's SectionItems does."""
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return any(item.mnemonic == key for item in self)
+        return list.__contains__(self, key)
+
+    def keys(self):
+        return [item.mnemonic for item in self]
+
+
+class CachedLas:
+    """lasio-like view of a cached LAS file: las["GR"], las.index, las.curves, las.df(), las.header."""
+
+    def __init__(self, path, meta, data):
+        self.path = path
+        self.meta = meta
+        self.data = data  # (n_curves, n_rows); a read-only memmap when loaded from the cache
+        self.curves = CurveList(HeaderItem(*c) for c in meta["curves"])
+
+    def keys(self):
+        return self.curves.keys()
+
+    def _position(self, key):
+        if isinstance(key, int):
+            return key
+        for i, item in enumerate(self.curves):
+            if item.mnemonic == key:
+                return i
+        raise KeyError(f"{key} not found in curves ({', '.join(self.keys())})")
+
+    def __getitem__(self, key):
+        return self.data[self._position(key)]
+
+    @property
+    def index(self):
+        return self.data[0] if len(self.curves) else np.array([])
+
+    def df(self):
+        """DataFrame indexed by the first curve, like lasio.LASFile.df() (a copy, so it is writable)."""
+        names = self.keys()
+        if not names:
+            return pd.DataFrame()
+        return pd.DataFrame({name: np.array(self.data[i]) for i, name in enumerate(names[1:], 1)},
+                            index=pd.Index(np.array(self.data[0]), name=names[0]))
+
+    @property
+    def header(self):
+        """LasHeader equivalent to las_scan.header_from_lasio() on the original lasio object."""
+        header = LasHeader(self.path)
+        header.file_size = self.meta["size"]
+        header.sections = {name: [HeaderItem(*item) for item in items] for name, items in self.meta["sections"].items()}
+        index = self.index
+        if len(index):
+            header.first_row = [index[0]]
+            header.last_row = [index[-1]]
+        return header
+
+
+def parse_las(path, **lasio_kwargs):
+    """Parse `path` with lasio into a CachedLas held in memory (curves of any dtype)."""
+    if not HAS_LASIO:
+        raise ImportError("Install lasio to read LAS files.")
+    las = lasio.read(path, **lasio_kwargs)
+    sections = {}
+    for name, section in las.sections.items():
+        if hasattr(section, "keys"):  # ~Other is free text
+            sections[name.upper()] = [[item.mnemonic, item.unit, str(item.value), item.descr] for item in section]
+    meta = {
+        "path": os.path.abspath(path),
+        "size": os.path.getsize(path),
+        "sections": sections,
+        "curves": [[c.mnemonic, c.unit, str(c.value), c.descr] for c in las.curves],
+    }
+    columns = [np.asarray(c.data) for c in las.curves]
+    if columns and all(c.dtype.kind in "fiub" for c in columns):
+        data = np.ascontiguousarray(np.vstack(columns), dtype=np.float64)
+    else:
+        data = columns  # text curves: usable, but not cached
+    return CachedLas(path, meta, data)
+
+
+# --------------------------------------------------
+# Cache directory
+# --------------------------------------------------
+
+def fingerprint(path, lasio_kwargs=None):
+    """Cache key: absolute path, size, mtime and the parse options; cheap (the file is not read)."""
+    st = os.stat(path)
+    source = json.dumps([CACHE_VERSION, getattr(lasio, "__version__", None) if HAS_LASIO else None,
+                         os.path.abspath(path), st.st_size, st.st_mtime_ns, sorted((lasio_kwargs or {}).items())],
+                        default=str)
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class LasCurveCache:
+    def __init__(self, cache_dir=DEFAULT_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = None  # running estimate; the tree is scanned once, then only when it exceeds max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, path, **lasio_kwargs):
+        """CachedLas memory-mapped from the cache, or None on a miss."""
+        entry = self._entry(fingerprint(path, lasio_kwargs))
+        try:
+            with open(os.path.join(entry, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            data = np.load(os.path.join(entry, "curves.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(os.path.join(entry, "meta.json"))  # recency for eviction
+        except OSError:
+            pass
+        return CachedLas(path, meta, data)
+
+    def put(self, path, las, lasio_kwargs=None):
+        """Store a parsed CachedLas; returns False when its curves cannot be cached (text curves)."""
+        if not isinstance(las.data, np.ndarray):
+            return False
+        entry = self._entry(fingerprint(path, lasio_kwargs))
+        if os.path.isdir(entry):
+            return True
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # Written to a temporary directory and renamed, so readers never see half an entry
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(entry))
+        try:
+            np.save(os.path.join(tmp, "curves.npy"), las.data)
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(las.meta, f)
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another process stored it first
+            return True
+        if self.total_bytes is None:
+            self.total_bytes = sum(size for _, size, _ in self.entries())
+        else:
+            self.total_bytes += sum(os.path.getsize(os.path.join(entry, name)) for name in ("curves.npy", "meta.json"))
+        # Other processes writing to the same cache are not counted: the limit may be passed
+        # until one of them rescans (or `warm` evicts at the end)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        return True
+
+    def read(self, path, **lasio_kwargs):
+        """CachedLas for `path`: memory-mapped on a hit, parsed with lasio and stored on a miss."""
+        las = self.get(path, **lasio_kwargs)
+        if las is not None:
+            self.hits += 1
+            return las
+        self.misses += 1
+        las = parse_las(path, **lasio_kwargs)
+        self.put(path, las, lasio_kwargs)
+        return las
+
+    def entries(self):
+        """[(mtime, bytes, entry_dir)] for every cache entry."""
+        found = []
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith(".tmp-") or not entry.is_dir():
+                    continue
+                try:
+                    files = list(os.scandir(entry.path))
+                    size = sum(f.stat().st_size for f in files)
+                    mtime = os.stat(os.path.join(entry.path, "meta.json")).st_mtime
+                except OSError:
+                    continue
+                found.append((mtime, size, entry.path))
+        return found
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache fits `max_bytes`; returns bytes freed."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, entry in sorted(entries):
+            if total - freed <= max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            freed += size
+        self.total_bytes = total - freed
+        return freed
+
+    def stats(self):
+        entries = self.entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        return self.evict(0)
+
+
+def default_cache():
+    """The cache configured by LAS_CURVE_CACHE / LAS_CURVE_CACHE_MB, or None when disabled."""
+    if "cache" not in _DEFAULT:
+        location = os.environ.get("LAS_CURVE_CACHE", DEFAULT_DIR)
+        if location.strip().lower() in ("", "0", "off", "no", "false"):
+            _DEFAULT["cache"] = None
+        else:
+            max_mb = float(os.environ.get("LAS_CURVE_CACHE_MB", DEFAULT_MAX_MB))
+            try:
+                _DEFAULT["cache"] = LasCurveCache(location, int(max_mb * 1024 * 1024))
+            except OSError:
+                _DEFAULT["cache"] = None  # read-only home directory: parse without caching
+    return _DEFAULT["cache"]
+
+
+def cache_requested():
+    """True when LAS_CURVE_CACHE names a cache directory (opt-in for the checkers)."""
+    location = os.environ.get("LAS_CURVE_CACHE")
+    return location is not None and location.strip().lower() not in ("", "0", "off", "no", "false")
+
+
+def read_las(path, use_cache=True, **lasio_kwargs):
+    """
+    Drop-in for lasio.read() where only curves and header values are needed; use_cache=False
+    always parses. lasio_kwargs are added to READ_OPTIONS.
+    """
+    lasio_kwargs = {**READ_OPTIONS, **lasio_kwargs}
+    cache = default_cache() if use_cache else None
+    if cache is None:
+        return parse_las(path, **lasio_kwargs)
+    return cache.read(path, **lasio_kwargs)
+
+
+# --------------------------------------------------
+# Command line
+# --------------------------------------------------
+
+_WORKER_CACHE = {}  # one LasCurveCache per warm worker process (keeps its running size)
+
+
+def _warm_task(path, cache_dir, max_bytes):
+    key = (cache_dir, max_bytes)
+    if key not in _WORKER_CACHE:
+        _WORKER_CACHE[key] = LasCurveCache(cache_dir, max_bytes)
+    cache = _WORKER_CACHE[key]
+    hits = cache.hits
+    cache.read(path, **READ_OPTIONS)
+    return cache.hits > hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped cache of parsed LAS curves.")
+    parser.add_argument("--cache-dir", default=os.environ.get("LAS_CURVE_CACHE", DEFAULT_DIR))
+    parser.add_argument("--max-mb", type=float, default=float(os.environ.get("LAS_CURVE_CACHE_MB", DEFAULT_MAX_MB)))
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm = sub.add_parser("warm", help="Parse and cache every LAS file under the sources")
+    warm.add_argument("sources", nargs="+")
+    warm.add_argument("--workers", type=int, default=None)
+    bench = sub.add_parser("bench", help="Compare lasio parsing with a cached load")
+    bench.add_argument("files", nargs="+")
+    sub.add_parser("stats", help="Entries and size of the cache")
+    sub.add_parser("clear", help="Remove every entry")
+    args = parser.parse_args()
+    cache = LasCurveCache(args.cache_dir, int(args.max_mb * 1024 * 1024))
+
+    if args.command == "warm":
+        from qc_batch import iter_input_files, run_parallel, TaskFailure
+        t0 = time.perf_counter()
+        n = cached = 0
+        for path, result, seconds in run_parallel(_warm_task, iter_input_files(args.sources, [".las"]), args.workers,
+                                                  None, {"cache_dir": cache.cache_dir, "max_bytes": cache.max_bytes}):
+            if isinstance(result, TaskFailure):
+                print(f"{path}: {result}")
+                continue
+            n += 1
+            cached += result
+        freed = cache.evict()
+        print(f"{n} files ({cached} already cached) in {time.perf_counter() - t0:.1f}s"
+              + (f", {freed / 1e6:.1f} MB evicted" if freed else ""))
+    elif args.command == "bench":
+        for path in args.files:
+            t0 = time.perf_counter()
+            las = parse_las(path, **READ_OPTIONS)
+            t_parse = time.perf_counter() - t0
+            cache.put(path, las, READ_OPTIONS)
+            t0 = time.perf_counter()
+            hit = cache.get(path, **READ_OPTIONS)
+            curves = [hit[m] for m in hit.keys()]
+            t_load = time.perf_counter() - t0
+            same = all(np.array_equal(np.asarray(las.data[i]), c, equal_nan=True) for i, c in enumerate(curves))
+            print(f"{os.path.basename(path)}: lasio {t_parse * 1000:.0f} ms, cached {t_load * 1000:.2f} ms "
+                  f"({len(curves)} curves x {len(hit.index)} rows, identical={same})")
+    elif args.command == "clear":
+        print(f"Freed {cache.clear() / 1e6:.1f} MB")
+    stats = cache.stats()
+    print(f"Cache {cache.cache_dir}: {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB "
+          f"(limit {stats['max_bytes'] / 1e6:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
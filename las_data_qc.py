@@ -0,0 +1,223 @@
+# ---------------------------------------------------------------------------------------
+# las_data_qc.py
+#
+# Vectorized QC of the LAS data sections. The file is streamed by las_stream in fixed-size
+# byte chunks and each chunk is tokenized into a NumPy matrix, so memory stays flat whatever
+# the file size. WRAP=YES files and LAS 3.0 files with several ~*_Data sections are handled
+# in the same pass; every finding names the data section it belongs to.
+# Checks:
+#   - every row has as many values as there are curves in ~C        (DATA-COLCOUNT)
+#   - wrapped records start with the index alone on a line          (DATA-WRAP)
+#   - values are numeric                                            (DATA-NONNUMERIC)
+#   - the index (first) curve is strictly monotonic                 (DATA-NONMONO)
+#   - the index increment matches STEP                              (DATA-STEP)
+#   - no curve is 100% NULL                                         (DATA-ALLNULL)
+# plus per-curve null fraction, min and max (DATA-CURVE, severity "info"). The index checks
+# apply to log data (~A / ~Log_Data) only; core, tops, etc. are not sampled on a grid.
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import time
+import numpy as np
+
+from las_stream import CHUNK_BYTES, LasStream, RowAssembler, tokenize_block
+from qc_findings import finding
+
+# Data sections whose first column is a regularly sampled index
+LOG_DATA_SECTIONS = ("ASCII", "LOG_DATA")
+
+
+def _to_float(text, default=None):
+    try:
+        return float(str(text).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+class _CurveStats:
+    """Running per-curve statistics over all chunks."""
+
+    def __init__(self, ncols):
+        self.count = 0
+        self.nulls = np.zeros(ncols, dtype=np.int64)
+        self.minimum = np.full(ncols, np.inf)
+        self.maximum = np.full(ncols, -np.inf)
+
+    def update(self, rows, null_value):
+        self.count += rows.shape[0]
+        is_null = np.isnan(rows)
+        if null_value is not None:
+            is_null |= rows == null_value
+        self.nulls += is_null.sum(axis=0)
+        masked = np.where(is_null, np.nan, rows)
+        with np.errstate(all="ignore"):
+            if masked.shape[0]:
+                valid = ~is_null.all(axis=0)
+                self.minimum[valid] = np.minimum(self.minimum[valid], np.nanmin(masked[:, valid], axis=0))
+                self.maximum[valid] = np.maximum(self.maximum[valid], np.nanmax(masked[:, valid], axis=0))
+
+
+class _SectionQC:
+    """Checks for one data section, fed block by block."""
+
+    def __init__(self, name, columns, wrapped, step):
+        self.name = name
+        self.mnemonics = [c.mnemonic for c in columns]
+        self.assembler = RowAssembler(len(columns), wrapped)
+        self.stats = _CurveStats(len(columns))
+        self.check_index = name in LOG_DATA_SECTIONS
+        self.step = step if self.check_index else None
+        self.rows = 0
+        self.nonnumeric = 0
+        self.prev_index = None
+        self.direction = 0          # +1 increasing, -1 decreasing, from STEP or the first increment
+        if self.step:
+            self.direction = 1 if self.step > 0 else -1
+        self.nonmono = self.step_bad = 0
+        self.first_nonmono = self.first_step_bad = None
+
+    def feed(self, block, null_value, step_tolerance):
+        values, counts, n_bad_tokens = tokenize_block(block)
+        self.nonnumeric += n_bad_tokens
+        if not len(counts):
+            return
+        rows = self.assembler.feed(values, counts)
+        self.rows += rows.shape[0]
+        if not rows.shape[0]:
+            return
+        self.stats.update(rows, null_value)
+        if self.check_index:
+            self._check_index(rows[:, 0], step_tolerance)
+
+    def _check_index(self, index, step_tolerance):
+        """Monotonicity and STEP, carrying the last index value across chunk boundaries."""
+        last = index[-1]
+        if self.prev_index is not None:
+            index = np.concatenate(([self.prev_index], index))
+        self.prev_index = last
+        diffs = np.diff(index)
+        if not len(diffs):
+            return
+        if self.direction == 0:
+            nonzero = diffs[diffs != 0]
+            if len(nonzero):
+                self.direction = 1 if nonzero[0] > 0 else -1
+        if self.direction:
+            bad = diffs * self.direction <= 0
+            n = int(bad.sum())
+            if n:
+                self.nonmono += n
+                if self.first_nonmono is None:
+                    self.first_nonmono = float(index[np.flatnonzero(bad)[0] + 1])
+        if self.step:
+            off = np.abs(diffs - self.step) > step_tolerance
+            n = int(off.sum())
+            if n:
+                self.step_bad += n
+                if self.first_step_bad is None:
+                    self.first_step_bad = float(index[np.flatnonzero(off)[0] + 1])
+
+    def findings(self, add):
+        self.assembler.finish()
+        a, ncols, index_mnem = self.assembler, len(self.mnemonics), self.mnemonics[0]
+        if a.bad_rows and a.wrapped:
+            add("DATA-WRAP",
+                f"{a.bad_rows} wrapped records do not start with the index on its own line or are incomplete "
+                f"(first at data line {a.first_bad_line})",
+                expected=f"{ncols} values per record", actual=f"{a.bad_rows} bad records")
+        elif a.bad_rows:
+            add("DATA-COLCOUNT",
+                f"{a.bad_rows} data rows do not have {ncols} values (first at data line {a.first_bad_line})",
+                expected=ncols, actual=f"{a.bad_rows} bad rows")
+        if self.nonnumeric:
+            add("DATA-NONNUMERIC", f"{self.nonnumeric} non-numeric values in {_label(self.name)}",
+                expected="numeric", actual=f"{self.nonnumeric} tokens")
+        if self.nonmono:
+            add("DATA-NONMONO",
+                f"Index {index_mnem} is not monotonic: {self.nonmono} reversals/duplicates "
+                f"(first at {self.first_nonmono})",
+                mnemonic=index_mnem, expected="monotonic", actual=f"{self.nonmono} violations")
+        if self.step_bad:
+            add("DATA-STEP",
+                f"Index {index_mnem} increment differs from STEP={self.step} at {self.step_bad} samples "
+                f"(first at {self.first_step_bad})",
+                mnemonic=index_mnem, expected=self.step, actual=f"{self.step_bad} irregular steps")
+
+        stats = self.stats
+        for i, mnem in enumerate(self.mnemonics):
+            null_frac = stats.nulls[i] / stats.count if stats.count else 1.0
+            if stats.count and stats.nulls[i] == stats.count:
+                add("DATA-ALLNULL", f"Curve {mnem} is 100% NULL", mnemonic=mnem, expected="< 100% NULL",
+                    actual="100%")
+            lo = stats.minimum[i] if np.isfinite(stats.minimum[i]) else None
+            hi = stats.maximum[i] if np.isfinite(stats.maximum[i]) else None
+            add("DATA-CURVE", f"{mnem}: null={null_frac:.1%}, min={lo}, max={hi}", severity="info",
+                mnemonic=mnem, actual=f"null_fraction={null_frac:.6f};min={lo};max={hi}")
+
+
+def _label(section):
+    """How a data section is named in messages: ~A for LAS 2.0, ~Log_Data style for LAS 3.0."""
+    return "~A" if section == "ASCII" else "~" + section.title()
+
+
+def qc_las_data(path, chunk_bytes=CHUNK_BYTES, step_tolerance=1e-3, null_value=None):
+    """
+    Run the data-section checks on a LAS file and return (findings, summary).
+
+    `step_tolerance` is the allowed absolute deviation of an index increment from STEP.
+    `summary` holds row counts (all data sections), timing and throughput (MB/s).
+    """
+    t0 = time.perf_counter()
+    findings = []
+    summary = {"rows": 0, "bad_rows": 0, "bytes": 0, "seconds": 0.0, "mb_per_s": 0.0, "sections": 0}
+
+    def adder(section):
+        def add(rule_id, message, severity="error", **kw):
+            findings.append(finding(path, rule_id, message, severity=severity, section=section, **kw))
+        return add
+
+    stream = LasStream(path, chunk_bytes)
+    header = stream.header
+    current, ordinal = None, None
+    sections = []
+    for chunk in stream:
+        if chunk.ordinal != ordinal:
+            ordinal = chunk.ordinal
+            current = None
+            if not chunk.columns:
+                if chunk.section == "ASCII":
+                    break  # reported below
+                adder(chunk.section)("DATA-SECTION", f"No column definition for {_label(chunk.section)}")
+                continue
+            # ~V/~W precede the data, so they are complete by now
+            if null_value is None:
+                null_value = _to_float(header.value("WELL", "NULL"))
+            current = _SectionQC(chunk.section, chunk.columns, chunk.wrapped,
+                                 _to_float(header.value("WELL", "STEP")))
+            sections.append(current)
+        if current is not None:
+            current.feed(chunk.block, null_value, step_tolerance)
+    summary["bytes"] = stream.bytes_read or header.file_size
+
+    if not sections:
+        adder("ASCII")("DATA-SECTION", "No ~A data section or no curves defined in ~C", severity="fatal")
+    for qc in sections:
+        qc.findings(adder(qc.name))
+        summary["rows"] += qc.rows
+        summary["bad_rows"] += qc.assembler.bad_rows
+    summary["sections"] = len(sections)
+
+    summary["seconds"] = time.perf_counter() - t0
+    summary["mb_per_s"] = summary["bytes"] / 1e6 / max(summary["seconds"], 1e-9)
+    return findings, summary
+
+
+if __name__ == "__main__":
+    import sys
+    for las_path in sys.argv[1:]:
+        qc_findings_list, info = qc_las_data(las_path)
+        print(f"{os.path.basename(las_path)}: {info['rows']} rows, {info['bytes'] / 1e6:.1f} MB "
+              f"in {info['seconds']:.2f}s ({info['mb_per_s']:.1f} MB/s)")
+        for f in qc_findings_list:
+            print(f"  [{f.severity}] {f.rule_id}: {f.message}")
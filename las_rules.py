@@ -0,0 +1,248 @@
+# ---------------------------------------------------------------------------------------
+# las_rules.py
+#
+# Declarative LAS header conformity rules. Each rule is registered once with its id, section,
+# severity and default parameters; a RuleEngine evaluates every enabled rule against one
+# HeaderContext, which indexes the parsed header tokens in a single pass, so no rule walks
+# the ~W section again. Rules can be enabled, disabled or re-parameterised from a JSON config
+# and the engine records how long each rule takes.
+#
+# Config example (rules.json):
+#   {"LAS-STRTSTOP": {"tolerance": 0.01},
+#    "LAS-INDEX": {"index_mnemonics": ["DEPT", "DEPTH", "MD"]},
+#    "LAS-WELLID": {"enabled": false}}
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import json
+import time
+import hashlib
+from collections import namedtuple, OrderedDict
+
+from qc_findings import finding
+
+Rule = namedtuple("Rule", ["rule_id", "section", "severity", "func", "defaults", "description"])
+
+# rule_id -> Rule, in evaluation (and status message) order
+RULES = OrderedDict()
+
+
+def rule(rule_id, section, severity="error", description="", **defaults):
+    """Register func(ctx, params, emit) as a conformity rule."""
+    def register(func):
+        RULES[rule_id] = Rule(rule_id, section, severity, func, defaults, description or func.__doc__ or "")
+        return func
+    return register
+
+
+class HeaderContext:
+    """One pass over a LasHeader: section set plus a first-occurrence mnemonic index per section."""
+
+    def __init__(self, header):
+        self.header = header
+        self.file = header.path
+        self.sections = set(header.sections)
+        if header.has_section("CURVES"):
+            self.sections.add("CURVES")  # LAS 3.0 ~Log_Definition stands in for ~C
+        self.index = {}
+        for name, items in header.sections.items():
+            lookup = {}
+            for item in items:
+                lookup.setdefault(item.mnemonic.strip().upper(), item)
+            self.index[name] = lookup
+        self.curves = header.curves
+
+    def get(self, section, mnemonic):
+        return self.index.get(section, {}).get(mnemonic)
+
+    def has(self, section, mnemonic):
+        return mnemonic in self.index.get(section, {})
+
+
+# --------------------------------------------------
+# Rules
+# --------------------------------------------------
+
+@rule("LAS-SECTION", "ALL", required=["VERSION", "WELL", "CURVES"],
+      description="Mandatory sections are present")
+def check_sections(ctx, params, emit):
+    for req in params["required"]:
+        if req not in ctx.sections:
+            emit(f"Missing section: {req}", section=req, expected="present", actual="missing")
+
+
+@rule("LAS-VERS", "VERSION", versions=[2.0], description="VERS is a supported LAS version")
+def check_version(ctx, params, emit):
+    item = ctx.get("VERSION", "VERS")
+    expected = "|".join(str(v) for v in params["versions"])
+    try:
+        version = float(str(item.value).strip())
+    except Exception:
+        emit("Missing or invalid VERSION information", mnemonic="VERS", expected=expected,
+             actual=None if item is None else item.value)
+        return
+    if version not in [float(v) for v in params["versions"]]:
+        emit(f"Invalid version: {version} (Expected {expected})", mnemonic="VERS",
+             expected=expected, actual=version)
+
+
+@rule("LAS-WRAP", "VERSION", allowed=["YES", "NO"], description="WRAP is YES or NO")
+def check_wrap(ctx, params, emit):
+    item = ctx.get("VERSION", "WRAP")
+    expected = "|".join(params["allowed"])
+    if item is None:
+        emit("Missing WRAP mode in VERSION section", mnemonic="WRAP", expected=expected)
+        return
+    wrap_mode = str(item.value).strip().upper()
+    if wrap_mode not in params["allowed"]:
+        emit(f"Invalid WRAP mode: {wrap_mode}", mnemonic="WRAP", expected=expected, actual=wrap_mode)
+
+
+@rule("LAS-INDEX", "CURVES", index_mnemonics=["DEPT", "DEPTH", "TIME", "INDEX"],
+      description="First curve is an accepted index mnemonic")
+def check_index_curve(ctx, params, emit):
+    expected = "|".join(params["index_mnemonics"])
+    if not ctx.curves:
+        emit("Missing or invalid CURVE information", expected=expected)
+        return
+    first_curve = ctx.curves[0].mnemonic.strip().upper()
+    if first_curve not in params["index_mnemonics"]:
+        emit(f"Invalid index curve: {first_curve}", mnemonic=first_curve, expected=expected, actual=first_curve)
+
+
+@rule("LAS-NULL", "WELL", description="NULL is declared in ~W")
+def check_null(ctx, params, emit):
+    if not ctx.has("WELL", "NULL"):
+        emit("Missing NULL value in WELL section", mnemonic="NULL", expected="present")
+
+
+@rule("LAS-WELLID", "WELL", id_mnemonics=["UWI", "WELL"], description="A well identifier is present")
+def check_well_id(ctx, params, emit):
+    if not any(ctx.has("WELL", m) for m in params["id_mnemonics"]):
+        names = " or ".join(params["id_mnemonics"])
+        emit(f"Missing Well ID in WELL section ({names})", mnemonic="|".join(params["id_mnemonics"]),
+             expected="present")
+
+
+def _stop_key(start_key):
+    return start_key.replace("START", "STOP").replace("STRT", "STOP")
+
+
+@rule("LAS-STRTSTOP", "WELL", tolerance=1e-3,
+      start_keys=["STRT", "START", "STRT.M", "START.M", "STRT.F", "START.F"],
+      stop_keys=["STOP", "STOP.M", "STOP.F"],
+      description="STRT/STOP match the first/last index value of the data")
+def check_start_stop(ctx, params, emit):
+    tolerance = params["tolerance"]
+    try:
+        # Pair each start key with its STOP counterpart (same suffix), no start x stop scan
+        stop_keys = set(params["stop_keys"])
+        found_pairs = []
+        for sk in params["start_keys"]:
+            ek = _stop_key(sk)
+            if ek in stop_keys and ctx.has("WELL", sk) and ctx.has("WELL", ek):
+                found_pairs.append((ctx.get("WELL", sk), ctx.get("WELL", ek)))
+
+        if not found_pairs:
+            emit("Missing START/STOP pair in WELL section", mnemonic="STRT|STOP", expected="present")
+            return
+
+        data_start = float(ctx.header.first_row[0])
+        data_stop = float(ctx.header.last_row[0])
+
+        for start_item, stop_item in found_pairs:
+            sk, ek = start_item.mnemonic, stop_item.mnemonic
+            header_start = float(str(start_item.value).strip())
+            header_stop = float(str(stop_item.value).strip())
+
+            if abs(header_start - data_start) > tolerance:
+                emit(f"Mismatch START ({sk}): Header={header_start}, Data={data_start} "
+                     f"(Diff={abs(header_start - data_start):.6f} > Tolerance={tolerance})",
+                     rule_id="LAS-STRT-MISMATCH", mnemonic=sk, expected=header_start, actual=data_start)
+            if abs(header_stop - data_stop) > tolerance:
+                emit(f"Mismatch STOP ({ek}): Header={header_stop}, Data={data_stop} "
+                     f"(Diff={abs(header_stop - data_stop):.6f} > Tolerance={tolerance})",
+                     rule_id="LAS-STOP-MISMATCH", mnemonic=ek, expected=header_stop, actual=data_stop)
+    except Exception:
+        emit("Error validating START/STOP consistency in WELL section or data", mnemonic="STRT|STOP")
+
+
+# --------------------------------------------------
+# Engine
+# --------------------------------------------------
+
+def load_rules_config(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class RuleEngine:
+    def __init__(self, config=None):
+        config = config or {}
+        unknown = set(config) - set(RULES)
+        if unknown:
+            raise ValueError(f"Unknown rule id(s) in config: {', '.join(sorted(unknown))}")
+
+        self.rules = []
+        self.params = {}
+        for rule_id, r in RULES.items():
+            overrides = dict(config.get(rule_id, {}))
+            if not overrides.pop("enabled", True):
+                continue
+            bad = set(overrides) - set(r.defaults) - {"severity"}
+            if bad:
+                raise ValueError(f"{rule_id}: unknown parameter(s) {', '.join(sorted(bad))}")
+            params = dict(r.defaults)
+            params.update(overrides)
+            self.rules.append(r)
+            self.params[rule_id] = params
+
+        self.timings = {r.rule_id: 0.0 for r in self.rules}
+        self.files = 0
+
+    def signature(self):
+        """Stable digest of the enabled rules and their parameters (used as a cache rule-set key)."""
+        text = json.dumps(self.params, sort_keys=True, default=str)
+        return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+    def run(self, header):
+        """Evaluate all enabled rules against a LasHeader and return the list of Findings."""
+        ctx = HeaderContext(header)
+        findings = []
+        for r in self.rules:
+            params = self.params[r.rule_id]
+            severity = params.get("severity", r.severity)
+            default_section = r.section if r.section != "ALL" else None
+
+            def emit(message, rule_id=r.rule_id, section=default_section, **kw):
+                findings.append(finding(ctx.file, rule_id, message, severity=severity, section=section, **kw))
+
+            t0 = time.perf_counter()
+            r.func(ctx, params, emit)
+            self.timings[r.rule_id] += time.perf_counter() - t0
+        self.files += 1
+        return findings
+
+    def take_timings(self):
+        """Return and reset the per-rule seconds accumulated since the last call."""
+        timings = self.timings
+        self.timings = {r.rule_id: 0.0 for r in self.rules}
+        return timings
+
+
+def timing_report(timings, n_files):
+    """Text table of per-rule cost, most expensive first."""
+    grand = sum(timings.values()) or 1e-12
+    lines = [f"{'Rule':<20}{'Total s':>12}{'us/file':>12}{'Share':>9}"]
+    for rule_id, seconds in sorted(timings.items(), key=lambda kv: kv[1], reverse=True):
+        per_file = seconds / max(n_files, 1) * 1e6
+        lines.append(f"{rule_id:<20}{seconds:>12.4f}{per_file:>12.1f}{seconds / grand:>8.1%}")
+    return "\n".join(lines)
+
+
+def list_rules():
+    lines = []
+    for r in RULES.values():
+        params = ", ".join(f"{k}={v}" for k, v in r.defaults.items())
+        lines.append(f"{r.rule_id:<14} [{r.severity}] {r.section:<8} {r.description}" + (f"  ({params})" if params else ""))
+    return "\n".join(lines)
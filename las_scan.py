@@ -0,0 +1,251 @@
+# ---------------------------------------------------------------------------------------
+# las_scan.py
+#
+# Lightweight LAS header tokenizer. Reads only the ~V/~W/~C/~P/~O sections, the first
+# data row after ~A and (by seeking back from the end of the file) the last data row,
+# so a header check costs the same on a 5 KB or a 500 MB LAS file. For WRAP=YES the last
+# record is re-assembled from the tail; for LAS 3.0 (~Log_Data possibly followed by other
+# sections) the log data is read forward in small blocks instead.
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+from collections import namedtuple
+
+# One "MNEM.UNIT  VALUE : DESCRIPTION" line of a header section
+HeaderItem = namedtuple("HeaderItem", ["mnemonic", "unit", "value", "descr"])
+
+# First letter after "~" -> section name (same names lasio uses, upper-cased).
+# LAS 3.0 sections with an underscore (~Log_Definition, ~Core_Data, ...) keep their full name.
+SECTION_NAMES = {
+    "V": "VERSION",
+    "W": "WELL",
+    "C": "CURVES",
+    "P": "PARAMETER",
+    "O": "OTHER",
+    "A": "ASCII",
+}
+
+TAIL_BLOCK = 64 * 1024
+STREAM_BLOCK = 1024 * 1024
+
+
+class LasHeader:
+    """Parsed LAS header sections plus the first and last data rows."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sections = {}          # section name -> [HeaderItem, ...]
+        self.data_section = None    # name of the first data section (ASCII or LAS 3.0 *_DATA)
+        self.data_offset = None     # byte offset of the first line after ~A
+        self.first_row = None       # tokens of the first data row
+        self.last_row = None        # tokens of the last data row (last record when wrapped)
+        self.file_size = 0
+
+    def has_section(self, name):
+        if name == "CURVES":
+            return "CURVES" in self.sections or "LOG_DEFINITION" in self.sections
+        return name in self.sections
+
+    @property
+    def wrapped(self):
+        return str(self.value("VERSION", "WRAP", "")).strip().upper() == "YES"
+
+    def items(self, section):
+        return self.sections.get(section, [])
+
+    def get(self, section, mnemonic, default=None):
+        """First item in `section` whose mnemonic matches (case-insensitive)."""
+        mnemonic = mnemonic.upper()
+        for item in self.sections.get(section, []):
+            if item.mnemonic.upper() == mnemonic:
+                return item
+        return default
+
+    def value(self, section, mnemonic, default=None):
+        item = self.get(section, mnemonic)
+        return item.value if item is not None else default
+
+    @property
+    def curves(self):
+        """~C items, or ~Log_Definition for LAS 3.0 files without a ~C section."""
+        return self.sections.get("CURVES") or self.sections.get("LOG_DEFINITION", [])
+
+
+# --------------------------------------------------
+# Tokenizing
+# --------------------------------------------------
+
+def parse_header_line(line):
+    """Split a header line into a HeaderItem, or return None for blanks/comments."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    name, dot, rest = line.partition(".")
+    if not dot:
+        name, _, descr = line.partition(":")
+        return HeaderItem(name.strip(), "", "", descr.strip())
+
+    # Unit runs from the dot to the first space (or colon); empty if a space follows the dot
+    unit = ""
+    if rest and not rest[0].isspace() and rest[0] != ":":
+        end = len(rest)
+        for sep in (" ", "\t", ":"):
+            pos = rest.find(sep)
+            if pos != -1:
+                end = min(end, pos)
+        unit, rest = rest[:end], rest[end:]
+
+    value, _, descr = rest.partition(":")
+    return HeaderItem(name.strip(), unit.strip(), value.strip(), descr.strip())
+
+
+def section_name(line):
+    """Map a '~X...' line to its section name (unknown sections keep their title)."""
+    title = line.strip()[1:].split("|")[0].strip()
+    if not title:
+        return ""
+    if "_" in title:
+        return title.split()[0].upper()
+    return SECTION_NAMES.get(title[0].upper(), title.upper())
+
+
+def section_association(line):
+    """LAS 3.0 '~Log_Data | Log_Definition' -> 'LOG_DEFINITION' (None when absent)."""
+    _, bar, assoc = line.partition("|")
+    assoc = assoc.strip()
+    return assoc.split()[0].upper() if bar and assoc else None
+
+
+def is_data_section(name):
+    return name == "ASCII" or name.endswith("_DATA")
+
+
+def definition_for(data_name, sections, association=None):
+    """Name of the section that defines the columns of data section `data_name`."""
+    candidates = []
+    if association:
+        candidates.append(association)
+    if data_name.endswith("_DATA"):
+        candidates.append(data_name[:-len("_DATA")] + "_DEFINITION")
+    candidates += ["CURVES", "LOG_DEFINITION"] if data_name in ("ASCII", "LOG_DATA") else []
+    for name in candidates:
+        if name in sections:
+            return name
+    return None
+
+
+def split_data_line(line):
+    return line.replace(",", " ").split()
+
+
+def _read_last_row(f, data_offset, file_size, n_tokens=None):
+    """
+    Seek back from EOF until the last non-blank, non-comment data line is found.
+    With n_tokens (wrapped files), keep going until the last n_tokens values are collected,
+    i.e. the whole last record, whose first value is the index.
+    """
+    end = file_size
+    tail = b""
+    while end > data_offset:
+        start = max(data_offset, end - TAIL_BLOCK)
+        f.seek(start)
+        tail = f.read(end - start) + tail
+        lines = tail.splitlines()
+        # The first line of the block may be cut in half unless we reached the data start
+        candidates = lines if start == data_offset else lines[1:]
+        tokens = []
+        for raw in reversed(candidates):
+            text = raw.decode("latin-1").strip()
+            if not text or text.startswith("#"):
+                continue
+            tokens = split_data_line(text) + tokens
+            if n_tokens is None or len(tokens) >= n_tokens:
+                return tokens if n_tokens is None else tokens[-n_tokens:]
+        end = start
+    return None
+
+
+def _stream_last_row(f, data_offset):
+    """
+    LAS 3.0: other sections may follow the log data, so EOF is not the end of it. Read forward
+    in STREAM_BLOCK pieces up to the next '~' line, keeping only a TAIL_BLOCK window in memory.
+    """
+    f.seek(data_offset)
+    tail = b"\n"
+    while True:
+        block = f.read(STREAM_BLOCK)
+        if not block:
+            break
+        tail += block
+        stop = tail.find(b"\n~")
+        if stop != -1:
+            tail = tail[:stop]
+            break
+        tail = tail[-TAIL_BLOCK:]
+    for raw in reversed(tail.splitlines()):
+        text = raw.decode("latin-1").strip()
+        if text and not text.startswith("#"):
+            return split_data_line(text)
+    return None
+
+
+def scan_las_header(path):
+    """Tokenize the header of a LAS file without parsing the ~A data section."""
+    header = LasHeader(path)
+    header.file_size = os.path.getsize(path)
+
+    with open(path, "rb") as f:
+        current = None
+        for raw in iter(f.readline, b""):
+            line = raw.decode("latin-1")
+            stripped = line.strip()
+            if stripped.startswith("~"):
+                current = section_name(stripped)
+                if is_data_section(current):
+                    header.data_section = current
+                    header.data_offset = f.tell()
+                    break
+                header.sections.setdefault(current, [])
+                continue
+            if current is None:
+                continue
+            item = parse_header_line(line)
+            if item is not None:
+                header.sections[current].append(item)
+
+        if header.data_offset is None:
+            return header
+
+        for raw in iter(f.readline, b""):
+            text = raw.decode("latin-1").strip()
+            if text and not text.startswith("#"):
+                header.first_row = split_data_line(text)
+                break
+
+        if header.first_row is None:
+            return header
+        if header.data_section != "ASCII":
+            header.last_row = _stream_last_row(f, header.data_offset)
+        else:
+            n_tokens = len(header.curves) if header.wrapped and header.curves else None
+            header.last_row = _read_last_row(f, header.data_offset, header.file_size, n_tokens)
+
+    return header
+
+
+def header_from_lasio(las, path):
+    """Wrap a lasio.LASFile in a LasHeader so checks can run on either parser's output."""
+    header = LasHeader(path)
+    header.file_size = os.path.getsize(path)
+    for name, section in las.sections.items():
+        if not hasattr(section, "keys"):
+            continue  # ~Other is free text
+        header.sections[name.upper()] = [
+            HeaderItem(item.mnemonic, item.unit, str(item.value), item.descr) for item in section
+        ]
+    if len(las.index):
+        header.first_row = [las.index[0]]
+        header.last_row = [las.index[-1]]
+    return header
@@ -0,0 +1,246 @@
+# ---------------------------------------------------------------------------------------
+# las_stream.py
+#
+# Single-pass, bounded-memory reader for LAS 2.0 (including WRAP=YES) and LAS 3.0 files.
+# Header sections are tokenized as they are met; every data section (~A, or LAS 3.0
+# ~Log_Data, ~Core_Data, ...) is read in byte blocks of at most CHUNK_BYTES that end on a
+# line boundary and stop before the next '~' line. Blocks are tokenized with NumPy and
+# re-assembled into (rows, columns) float matrices; for wrapped files the values of one
+# record run over several lines, so tokens are regrouped by the number of curves and an
+# incomplete record is carried over to the next block.
+#
+# Usage: python las_stream.py file.las [...]      (prints rows per data section and MB/s)
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from las_scan import (LasHeader, parse_header_line, section_name, section_association,
+                      is_data_section, definition_for)
+
+CHUNK_BYTES = 4 * 1024 * 1024
+
+_SPACE, _TAB, _CR, _LF = 32, 9, 13, 10
+
+# One block of a data section. `ordinal` counts data sections from 0, `columns` are the
+# HeaderItems of the definition section (~C for ~A) and `block` is the raw bytes.
+DataChunk = namedtuple("DataChunk", ["ordinal", "section", "columns", "wrapped", "block"])
+
+
+def tokenize_block(block):
+    """
+    Vectorized tokenizer for one block of data lines.
+    Returns (values, counts, n_nonnumeric): a flat float array of all tokens, the number of
+    tokens on each non-blank, non-comment line, and the number of tokens that were not numbers
+    (stored as NaN). Commas (LAS 3.0 DLM=COMMA) and tabs separate values like spaces.
+    """
+    block = block.replace(b",", b" ")
+    if b"#" in block:
+        block = b"\n".join(l for l in block.split(b"\n") if not l.lstrip().startswith(b"#"))
+    if not block.endswith(b"\n"):
+        block += b"\n"
+
+    arr = np.frombuffer(block, dtype=np.uint8)
+    is_sep = (arr == _SPACE) | (arr == _TAB) | (arr == _CR) | (arr == _LF)
+    prev_sep = np.empty_like(is_sep)
+    prev_sep[0] = True
+    prev_sep[1:] = is_sep[:-1]
+    token_starts = np.flatnonzero(~is_sep & prev_sep)
+
+    newlines = np.flatnonzero(arr == _LF)
+    line_of_token = np.searchsorted(newlines, token_starts)
+    counts = np.bincount(line_of_token, minlength=len(newlines))
+    counts = counts[counts > 0]  # drop blank lines
+
+    tokens = block.split()
+    n_nonnumeric = 0
+    try:
+        values = np.array(tokens, dtype=np.float64)
+    except ValueError:
+        values = np.empty(len(tokens), dtype=np.float64)
+        for i, tok in enumerate(tokens):
+            try:
+                values[i] = float(tok)
+            except ValueError:
+                values[i] = np.nan
+                n_nonnumeric += 1
+    return values, counts, n_nonnumeric
+
+
+def iter_section_blocks(f, chunk_bytes=CHUNK_BYTES):
+    """
+    Blocks of the data section `f` (a binary file) is positioned in: at most ~chunk_bytes each,
+    ending on a line boundary, byte for byte (blank lines included). Stops before the next '~'
+    line and leaves `f` there (or at EOF).
+    """
+    while True:
+        pos = f.tell()
+        block = f.read(chunk_bytes)
+        if not block:
+            return
+        if block.startswith(b"~"):
+            stop = 0
+        else:
+            stop = block.find(b"\n~")
+            stop = stop + 1 if stop != -1 else -1
+        if stop != -1:
+            f.seek(pos + stop)
+            if stop:
+                yield block[:stop]
+            return
+        if len(block) == chunk_bytes:
+            cut = block.rfind(b"\n")
+            if cut == -1:
+                block += f.readline()  # a single line longer than the chunk
+            else:
+                f.seek(pos + cut + 1)
+                block = block[:cut + 1]
+        yield block
+
+
+class LasStream:
+    """
+    Iterate over the DataChunks of a LAS file in one forward pass. `header` fills up with the
+    header sections as they are read, so it is complete once iteration ends; `bytes_read`
+    counts every byte consumed, for throughput reporting.
+    """
+
+    def __init__(self, path, chunk_bytes=CHUNK_BYTES):
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.header = LasHeader(path)
+        self.header.file_size = os.path.getsize(path)
+        self.bytes_read = 0
+
+    def __iter__(self):
+        header = self.header
+        ordinal = 0
+        with open(self.path, "rb") as f:
+            current = None
+            for raw in iter(f.readline, b""):
+                line = raw.decode("latin-1")
+                stripped = line.strip()
+                if stripped.startswith("~"):
+                    current = section_name(stripped)
+                    if not is_data_section(current):
+                        header.sections.setdefault(current, [])
+                        continue
+                    if header.data_section is None:
+                        header.data_section = current
+                        header.data_offset = f.tell()
+                    definition = definition_for(current, header.sections, section_association(stripped))
+                    columns = header.sections.get(definition, []) if definition else []
+                    wrapped = header.wrapped and current == "ASCII"
+                    for block in iter_section_blocks(f, self.chunk_bytes):
+                        yield DataChunk(ordinal, current, columns, wrapped, block)
+                    ordinal += 1
+                    current = None
+                    continue
+                if current is None:
+                    continue
+                item = parse_header_line(line)
+                if item is not None:
+                    header.sections[current].append(item)
+            self.bytes_read = f.tell()
+
+
+class RowAssembler:
+    """
+    Turn tokenized blocks of one data section into (n, ncols) float rows.
+
+    Unwrapped: one row per line; lines without exactly ncols values are dropped and counted.
+    Wrapped: tokens are regrouped in records of ncols values; LAS 2.0 puts the index alone on
+    the first line of each record, so a record that does not start with a one-value line is
+    counted as misaligned, and a trailing incomplete record as bad.
+    """
+
+    def __init__(self, ncols, wrapped=False):
+        self.ncols = ncols
+        self.wrapped = wrapped
+        self.lines = 0              # data lines seen so far (non-blank, non-comment)
+        self.bad_rows = 0
+        self.first_bad_line = None
+        self._tokens = 0            # tokens seen so far (wrapped)
+        self._carry = np.empty(0)   # values of an incomplete record (wrapped)
+
+    def _bad(self, n, line_index):
+        self.bad_rows += n
+        if self.first_bad_line is None:
+            self.first_bad_line = self.lines + line_index + 1
+
+    def feed(self, values, counts):
+        if self.wrapped:
+            rows = self._feed_wrapped(values, counts)
+        else:
+            good_line = counts == self.ncols
+            n_bad = int((~good_line).sum())
+            if n_bad:
+                self._bad(n_bad, int(np.flatnonzero(~good_line)[0]))
+                rows = values[np.repeat(good_line, counts)].reshape(-1, self.ncols)
+            else:
+                rows = values.reshape(-1, self.ncols)
+        self.lines += len(counts)
+        return rows
+
+    def _feed_wrapped(self, values, counts):
+        ncols = self.ncols
+        if not len(values):
+            return np.empty((0, ncols))
+        start, end = self._tokens, self._tokens + len(values)
+        line_starts = start + np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        # Records whose first value lies in this block must begin a line holding the index only
+        record_starts = np.arange(-(-start // ncols) * ncols, end, ncols)
+        pos = np.minimum(np.searchsorted(line_starts, record_starts), len(line_starts) - 1)
+        misaligned = (line_starts[pos] != record_starts) | (counts[pos] != 1)
+        n_bad = int(misaligned.sum())
+        if n_bad:
+            first = record_starts[np.flatnonzero(misaligned)[0]]
+            self._bad(n_bad, int(np.searchsorted(line_starts, first, side="right")) - 1)
+
+        flat = np.concatenate((self._carry, values)) if len(self._carry) else values
+        n_full = len(flat) // ncols * ncols
+        self._carry = flat[n_full:].copy()
+        self._tokens = end
+        return flat[:n_full].reshape(-1, ncols)
+
+    def finish(self):
+        """Account for an incomplete last record (wrapped files); call once at section end."""
+        if len(self._carry):
+            self._bad(1, -1)
+            self._carry = np.empty(0)
+
+
+def iter_las_rows(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Yield (section, mnemonics, rows) for every block of every data section, with `rows` a
+    float matrix (non-numeric values as NaN). Sections without a column definition are skipped.
+    """
+    assembler, ordinal = None, None
+    for chunk in LasStream(path, chunk_bytes):
+        if not chunk.columns:
+            continue
+        if chunk.ordinal != ordinal:
+            assembler, ordinal = RowAssembler(len(chunk.columns), chunk.wrapped), chunk.ordinal
+        values, counts, _ = tokenize_block(chunk.block)
+        rows = assembler.feed(values, counts)
+        if rows.shape[0]:
+            yield chunk.section, [c.mnemonic for c in chunk.columns], rows
+
+
+if __name__ == "__main__":
+    import sys
+    for las_path in sys.argv[1:]:
+        t0 = time.perf_counter()
+        n_rows = {}
+        for name, _, block_rows in iter_las_rows(las_path):
+            n_rows[name] = n_rows.get(name, 0) + block_rows.shape[0]
+        seconds = time.perf_counter() - t0
+        size = os.path.getsize(las_path)
+        sections = ", ".join(f"{name}={n}" for name, n in n_rows.items()) or "no data"
+        print(f"{os.path.basename(las_path)}: {sections}; {size / 1e6:.1f} MB in {seconds:.2f}s "
+              f"({size / 1e6 / max(seconds, 1e-9):.1f} MB/s)")
@@ -36,8 +36,7 @@ from sklearn.metrics import mean_squared_error, r2_score
 
 # Optional LAS support
 try:
-    import lasio
-    HAS_LASIO = True
+    from las_curve_cache import read_las, HAS_LASIO
 except Exception:
     HAS_LASIO = False
 
@@ -65,7 +64,7 @@ def load_data(filepath):
     if ext == ".las":
         if not HAS_LASIO:
             raise ImportError("Install lasio to read LAS files.")
-        las = lasio.read(filepath)
+        las = read_las(filepath)
         df = las.df().reset_index()
         df.rename(columns={'DEPT': 'Depth'}, inplace=True)
         return df
@@ -0,0 +1,316 @@
+# ---------------------------------------------------------------------------------------
+# qc_batch.py
+#
+# Headless, process-parallel batch runner shared by LASCheck-v2-free.py and DLISCheck-free.py.
+# Each worker process validates one file at a time; a file that hangs past the timeout or
+# crashes its worker only loses that one task, the worker is replaced and the run goes on.
+# Results are streamed to the output CSV as they finish; an optional ValidationCache
+# (validation_cache.py) skips files that have not changed since they were last validated.
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import csv
+import time
+import multiprocessing as mp
+from functools import partial
+from multiprocessing.connection import wait
+
+from qc_findings import CheckResult, finding, format_status
+from validation_cache import validate_with_hash
+
+CSV_COLUMNS = ["File", "Path", "Status", "Seconds", "Cached"]
+
+
+# --------------------------------------------------
+# Input discovery
+# --------------------------------------------------
+
+def iter_input_files(sources, extensions):
+    """
+    Yield files from a mix of directories (walked recursively), data files and list files.
+    A list file is any file not ending in one of `extensions`; it holds one path per line.
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    for src in sources:
+        if os.path.isdir(src):
+            for dirpath, dirnames, filenames in os.walk(src):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(dirpath, name)
+        elif src.lower().endswith(extensions):
+            yield src
+        elif os.path.isfile(src):
+            with open(src, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        yield line
+        else:
+            print(f"Skipping {src}: not a file or directory")
+
+
+def iter_named_files(sources, extensions):
+    """
+    (path, output name) pairs for iter_input_files; the name is the basename without extension,
+    and a basename repeated from another directory gets a _2, _3 ... suffix.
+    """
+    seen = {}
+    for path in iter_input_files(sources, extensions):
+        basename = os.path.splitext(os.path.basename(path))[0]
+        key = basename.lower()
+        seen[key] = seen.get(key, 0) + 1
+        yield path, basename if seen[key] == 1 else f"{basename}_{seen[key]}"
+
+
+# --------------------------------------------------
+# Worker pool
+# --------------------------------------------------
+
+class TaskFailure(str):
+    """Status text for a task that produced no result (exception, timeout, crashed worker)."""
+
+
+def _worker_loop(func, kwargs, conn):
+    while True:
+        try:
+            path = conn.recv()
+        except EOFError:
+            break
+        if path is None:
+            break
+        try:
+            result = func(path, **kwargs)
+        except Exception as e:
+            result = TaskFailure(f"Error processing file: {e}")
+        conn.send(result)
+    conn.close()
+
+
+class _Slot:
+    def __init__(self, ctx, func, kwargs):
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_loop, args=(func, kwargs, child_conn), daemon=True)
+        self.proc.start()
+        child_conn.close()  # so a dead worker shows up as EOF on our end
+        self.path = None
+        self.started = None
+
+    def submit(self, path):
+        self.path = path
+        self.started = time.monotonic()
+        self.conn.send(path)
+
+    def release(self):
+        path, started = self.path, self.started
+        self.path = self.started = None
+        return path, time.monotonic() - started
+
+    def kill(self):
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.proc.join(5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.proc.join(5)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.conn.close()
+
+
+def run_parallel(func, files, workers=None, timeout=None, func_kwargs=None):
+    """
+    Apply func(path, **func_kwargs) to every file over a pool of worker processes.
+    `files` may hold any picklable task items; each is passed to func as-is.
+
+    Yields (path, result, seconds) in completion order. A task that exceeds `timeout`
+    seconds is reported as "Timeout after ...", a task whose worker dies as
+    "Worker crashed ..."; in both cases only that worker is replaced.
+    """
+    workers = workers or os.cpu_count() or 1
+    func_kwargs = func_kwargs or {}
+    ctx = mp.get_context()
+    pending = iter(files)
+    exhausted = False
+
+    slots = [_Slot(ctx, func, func_kwargs) for _ in range(workers)]
+    try:
+        while True:
+            # Hand out work to idle workers
+            for slot in slots:
+                if slot.path is None and not exhausted:
+                    try:
+                        slot.submit(next(pending))
+                    except StopIteration:
+                        exhausted = True
+
+            busy = [s for s in slots if s.path is not None]
+            if not busy:
+                break
+
+            wait_for = None
+            if timeout:
+                now = time.monotonic()
+                wait_for = max(0.0, min(s.started + timeout - now for s in busy))
+            ready = wait([s.conn for s in busy], timeout=wait_for)
+
+            for i, slot in enumerate(slots):
+                if slot.path is None:
+                    continue
+                if slot.conn in ready:
+                    try:
+                        result = slot.conn.recv()
+                    except (EOFError, OSError):
+                        path, seconds = slot.release()
+                        slot.kill()
+                        code = slot.proc.exitcode
+                        slots[i] = _Slot(ctx, func, func_kwargs)
+                        yield path, TaskFailure(f"Worker crashed (exit code {code})"), seconds
+                        continue
+                    path, seconds = slot.release()
+                    yield path, result, seconds
+                elif timeout and time.monotonic() - slot.started > timeout:
+                    path, seconds = slot.release()
+                    slot.kill()
+                    slots[i] = _Slot(ctx, func, func_kwargs)
+                    yield path, TaskFailure(f"Timeout after {timeout:g}s"), seconds
+    finally:
+        for slot in slots:
+            if slot.path is None:
+                slot.stop()
+            else:
+                slot.kill()
+
+
+# --------------------------------------------------
+# Streaming CSV output
+# --------------------------------------------------
+
+def _as_result(path, result):
+    """Turn a runner-level failure (timeout, crash, unreadable file) into a fatal Finding."""
+    if isinstance(result, TaskFailure):
+        return [finding(path, "QC-RUNNER", str(result), severity="fatal")]
+    return result
+
+
+def _row(path, status, seconds, cached):
+    return {
+        "File": os.path.basename(path),
+        "Path": path,
+        "Status": status,
+        "Seconds": f"{seconds:.3f}",
+        "Cached": "yes" if cached else "no",
+    }
+
+
+def run_batch(func, files, output_file, workers=None, timeout=None, func_kwargs=None, verbose=True,
+              cache=None, resume=False, sink=None, formatter=format_status, timings=None):
+    """
+    Validate `files` in parallel and stream one CSV row per file to `output_file`.
+
+    `func` may return a status string or a list of Findings; Findings are turned into the
+    CSV Status with `formatter` and written to `sink` (see qc_findings.open_findings_sink).
+    A CheckResult's per-rule timings are summed into the `timings` dict, and its data-section
+    bytes/seconds are reported as MB/s per file and in total.
+
+    With a ValidationCache, files whose fingerprint is unchanged are written from the cache
+    without being re-validated, and resume=True continues the last unfinished run (appending
+    to its CSV and skipping files it already wrote).
+    """
+    n_files = n_cached = 0
+    data_bytes, data_seconds = 0, 0.0
+    t0 = time.perf_counter()
+
+    run_id, done = None, set()
+    if cache is not None:
+        run_id, output_file, done = cache.begin_run(output_file, resume)
+        if done:
+            print(f"Resuming run {run_id}: {len(done)} files already done, appending to {output_file}")
+
+    append = bool(done) and os.path.exists(output_file)
+    with open(output_file, "a" if append else "w", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+        if not append:
+            writer.writeheader()
+
+        def emit(path, result, seconds, cached):
+            nonlocal data_bytes, data_seconds
+            rate = ""
+            if isinstance(result, CheckResult):
+                if timings is not None:
+                    for rule_id, rule_seconds in result.timings.items():
+                        timings[rule_id] = timings.get(rule_id, 0.0) + rule_seconds
+                if result.data:
+                    data_bytes += result.data["bytes"]
+                    data_seconds += result.data["seconds"]
+                    rate = f" ({result.data['bytes'] / 1e6 / max(result.data['seconds'], 1e-9):.0f} MB/s)"
+                result = result.findings
+            if isinstance(result, list):
+                status = formatter(result)
+                if sink is not None:
+                    sink.write(result)
+            else:
+                status = result
+            writer.writerow(_row(path, status, seconds, cached))
+            out.flush()
+            if verbose:
+                print(f"{os.path.basename(path)}: {status}{' (cached)' if cached else ''}{rate}")
+
+        if cache is None:
+            for path, result, seconds in run_parallel(func, files, workers, timeout, func_kwargs):
+                emit(path, _as_result(path, result), seconds, False)
+                n_files += 1
+        else:
+            # Pass 1: stat every file, answer unchanged ones from the cache
+            todo = []
+            for path in files:
+                if os.path.abspath(path) in done:
+                    continue
+                try:
+                    hit, cached_hash, cached_result = cache.lookup(path)
+                except OSError as e:
+                    emit(path, _as_result(path, TaskFailure(f"Error reading file: {e}")), 0.0, False)
+                    n_files += 1
+                    continue
+                if hit:
+                    emit(path, cached_result, 0.0, True)
+                    cache.mark_done(run_id, path)
+                    n_files += 1
+                    n_cached += 1
+                else:
+                    todo.append((path, cached_hash, cached_result))
+
+            # Pass 2: hash + validate new or modified files in the pool
+            task_func = partial(validate_with_hash, validator=func, validator_kwargs=func_kwargs)
+            for task, result, seconds in run_parallel(task_func, todo, workers, timeout):
+                path = task[0]
+                if isinstance(result, tuple):
+                    result, digest, reused = result
+                    findings = result.findings if isinstance(result, CheckResult) else result
+                    if isinstance(findings, list):
+                        cache.store(path, digest, formatter(findings), findings, run_id=run_id)
+                    else:
+                        cache.store(path, digest, result, run_id=run_id)
+                    n_cached += int(reused)
+                else:
+                    # Timeout / crash: recorded for this run but never cached
+                    result, reused = _as_result(path, result), False
+                    cache.mark_done(run_id, path)
+                emit(path, result, seconds, reused)
+                n_files += 1
+            cache.finish_run(run_id)
+
+    elapsed = time.perf_counter() - t0
+    print(f"Validated {n_files} files in {elapsed:.1f}s ({n_files / max(elapsed, 1e-9):.1f} files/s)"
+          + (f", {n_cached} answered from cache" if cache is not None else ""))
+    if data_seconds:
+        print(f"Data sections: {data_bytes / 1e6:.1f} MB read in {data_seconds:.1f}s "
+              f"({data_bytes / 1e6 / data_seconds:.1f} MB/s per worker)")
+    print(f"Results saved to {output_file}")
+    return n_files
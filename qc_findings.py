@@ -0,0 +1,155 @@
+# ---------------------------------------------------------------------------------------
+# qc_findings.py
+#
+# Structured validation findings for the LAS/DLIS checkers. Each problem found in a file is
+# one typed Finding record (file, rule id, severity, section, mnemonic, expected, actual),
+# written to a columnar sink (SQLite or Parquet) next to the CSV status summary, so field-wide
+# questions such as "every file with a START mismatch" are a query instead of a regex.
+#
+# Usage: python qc_findings.py findings.sqlite|findings.parquet   (prints counts per rule)
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import sqlite3
+from collections import namedtuple
+
+# Optional Parquet support
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
+
+FINDING_FIELDS = ["file", "rule_id", "severity", "section", "mnemonic", "expected", "actual", "message"]
+
+Finding = namedtuple("Finding", FINDING_FIELDS)
+
+# What a batch task returns when it also reports per-rule timings (rule_id -> seconds) and, for
+# data-section checks, the bytes and seconds spent reading the data (las_data_qc summary)
+CheckResult = namedtuple("CheckResult", ["findings", "timings", "data"], defaults=(None,))
+
+SEVERITIES = ["fatal", "error", "warning", "info"]
+
+
+def finding(file, rule_id, message, severity="error", section=None, mnemonic=None,
+            expected=None, actual=None):
+    """Build a Finding; expected/actual are stored as text so every sink has one schema."""
+    return Finding(
+        str(file), rule_id, severity, section, mnemonic,
+        None if expected is None else str(expected),
+        None if actual is None else str(actual),
+        message,
+    )
+
+
+def format_status(findings, ok="Valid"):
+    """The legacy one-line Status: `ok` when nothing but "info" was found, else comma-joined messages."""
+    problems = [f.message for f in findings if f.severity != "info"]
+    return ok if not problems else ", ".join(problems)
+
+
+def findings_to_json(findings):
+    return json.dumps([list(f) for f in findings])
+
+
+def findings_from_json(text):
+    return [Finding(*row) for row in json.loads(text)] if text else []
+
+
+# --------------------------------------------------
+# Sinks
+# --------------------------------------------------
+
+class SQLiteFindingsSink:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS findings ("
+            + ", ".join(f"{name} TEXT" for name in FINDING_FIELDS) + ")"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_findings_rule ON findings (rule_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_findings_file ON findings (file)")
+        self.conn.commit()
+
+    def write(self, findings):
+        if findings:
+            self.conn.executemany(
+                f"INSERT INTO findings VALUES ({', '.join('?' * len(FINDING_FIELDS))})", findings
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class ParquetFindingsSink:
+    """Buffers findings and writes them as Parquet row groups of `batch_size` rows."""
+
+    def __init__(self, path, batch_size=50000):
+        if not HAS_PYARROW:
+            raise ImportError("Install pyarrow to write Parquet findings.")
+        self.path = path
+        self.batch_size = batch_size
+        self.schema = pa.schema([(name, pa.string()) for name in FINDING_FIELDS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.buffer = []
+
+    def write(self, findings):
+        self.buffer.extend(findings)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            columns = list(zip(*self.buffer))
+            table = pa.Table.from_arrays([pa.array(c, pa.string()) for c in columns], schema=self.schema)
+            self.writer.write_table(table)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_findings_sink(path):
+    """Pick the sink from the extension: .parquet -> Parquet, anything else -> SQLite."""
+    if path.lower().endswith(".parquet"):
+        return ParquetFindingsSink(path)
+    return SQLiteFindingsSink(path)
+
+
+# --------------------------------------------------
+# Aggregates
+# --------------------------------------------------
+
+def rule_counts(path):
+    """Number of findings and affected files per (rule_id, severity)."""
+    if path.lower().endswith(".parquet"):
+        import pandas as pd
+        df = pd.read_parquet(path, columns=["file", "rule_id", "severity"])
+        return (df.groupby(["rule_id", "severity"])
+                  .agg(findings=("file", "size"), files=("file", "nunique"))
+                  .reset_index()
+                  .sort_values("findings", ascending=False))
+    conn = sqlite3.connect(path)
+    try:
+        import pandas as pd
+        return pd.read_sql_query(
+            "SELECT rule_id, severity, COUNT(*) AS findings, COUNT(DISTINCT file) AS files "
+            "FROM findings GROUP BY rule_id, severity ORDER BY findings DESC", conn
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not os.path.exists(sys.argv[1]):
+        print("Usage: python qc_findings.py findings.sqlite|findings.parquet")
+        sys.exit(1)
+    print(rule_counts(sys.argv[1]).to_string(index=False))
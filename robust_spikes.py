@@ -0,0 +1,165 @@
+# ---------------------------------------------------------------------------------------
+# robust_spikes.py
+#
+# Hampel-style spike detector: a sample is a spike when it is more than N_SIGMAS robust standard
+# deviations away from the median of the window around it,
+#     z = |x - rolling median| / (1.4826 * rolling MAD),   spike if z > N_SIGMAS
+# where the rolling MAD is the rolling median of |x - rolling median|. Both are pandas rolling
+# medians (skip-list, O(n log w)), so the cost grows linearly with the number of samples and all
+# curves of a log are processed in one call. Unlike a global detector it looks at depth context:
+# a high but valid streak longer than half the window moves the median with it and is not flagged.
+# Windows are given in samples or in depth units (converted with the median depth step).
+#
+# StreamingHampel is the incremental form for data still arriving from the rig: batches of
+# depth/values are appended and flags come out window - 1 samples later (the look-ahead of the
+# centered median and MAD), identical to hampel() over the whole log for the same floor. Only the
+# last 2 * (window - 1) samples plus a bounded history for the MAD floor are kept.
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+MAD_SCALE = 1.4826   # MAD -> standard deviation for normally distributed noise
+WINDOW = 21          # samples
+N_SIGMAS = 4.0
+MAD_FLOOR = 0.1      # local MAD is at least this fraction of the curve's MAD (flat/quantized logs)
+FLOOR_HISTORY = 4096 # samples the streaming detector estimates the curve's MAD from
+
+# Samples whose flags are final: depth (n,), values/flags/scores (n, k)
+StreamFlags = namedtuple("StreamFlags", ["depth", "values", "flags", "scores"])
+
+
+def window_samples(depth=None, window=WINDOW, window_depth=None):
+    """Odd window length in samples; `window_depth` (depth units) overrides `window`."""
+    if window_depth and depth is not None and len(depth) > 1:
+        step = np.nanmedian(np.abs(np.diff(np.asarray(depth, dtype=np.float64))))
+        if np.isfinite(step) and step > 0:
+            window = int(round(window_depth / step))
+    window = max(int(window), 3)
+    return window if window % 2 else window + 1
+
+
+def rolling_median(values, window):
+    """Centered rolling median of every column of `values` (n,) or (n, k); NaNs are skipped."""
+    frame = pd.DataFrame(np.asarray(values, dtype=np.float64))
+    return frame.rolling(window, center=True, min_periods=1).median().to_numpy()
+
+
+def mad_floor_of(x, mad_floor=MAD_FLOOR):
+    """Per-column floor for the local MAD: mad_floor x the MAD of the whole column (never 0)."""
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-null curves
+        floor = mad_floor * np.nanmedian(np.abs(x - np.nanmedian(x, axis=0)), axis=0)
+    return np.where(np.isfinite(floor) & (floor > 0), floor, np.finfo(np.float64).tiny)
+
+
+def _hampel_scores(x, window, floor):
+    median = rolling_median(x, window)
+    deviation = np.abs(x - median)
+    mad = rolling_median(deviation, window)
+    with np.errstate(invalid="ignore"):
+        return deviation / (MAD_SCALE * np.maximum(mad, floor))
+
+
+def hampel(values, window=WINDOW, n_sigmas=N_SIGMAS, mad_floor=MAD_FLOOR, floor=None):
+    """
+    Flags and robust z-scores for one curve (n,) or several curves (n, k) sampled on the same
+    depths. Returns arrays of the input shape; NaN samples are never flagged and score NaN.
+    `floor` (absolute, per curve) replaces the floor derived from the curve-wide MAD.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    one = x.ndim == 1
+    x = x.reshape(len(x), -1)
+    # A curve-wide floor keeps flat or quantized stretches (local MAD 0) from flagging every step
+    scores = _hampel_scores(x, window, mad_floor_of(x, mad_floor) if floor is None else floor)
+    with np.errstate(invalid="ignore"):
+        flags = scores > n_sigmas
+    if one:
+        return flags[:, 0], scores[:, 0]
+    return flags, scores
+
+
+def detect_spikes_hampel(depth, values, window=WINDOW, window_depth=None, n_sigmas=N_SIGMAS, mad_floor=MAD_FLOOR):
+    """hampel() with the window taken from `window_depth` (depth units) when given."""
+    return hampel(values, window_samples(depth, window, window_depth), n_sigmas, mad_floor)
+
+
+class StreamingHampel:
+    """
+    Incremental hampel(): push() batches of depth and values (n,) or (n, k) as they arrive and get
+    back the samples whose flags are final; flush() at the end of the stream returns the rest.
+    A sample is final `lag` = window - 1 samples after it arrived; give max_lag to size the
+    window from the latency budget instead. The MAD floor comes from `floor`, or from the last
+    FLOOR_HISTORY samples (re-estimated every 256 samples once that history is full), as no
+    curve-wide MAD exists yet.
+    """
+
+    def __init__(self, n_curves=1, window=WINDOW, n_sigmas=N_SIGMAS, mad_floor=MAD_FLOOR, floor=None,
+                 max_lag=None, history=FLOOR_HISTORY):
+        if max_lag is not None:
+            if max_lag < 2:
+                raise ValueError(f"max_lag={max_lag}: the smallest window (3 samples) needs a lag of 2 samples")
+            window = max_lag + 1 if max_lag % 2 == 0 else max_lag
+        self.window = max(int(window) | 1, 3)
+        self.half = self.window // 2
+        self.n_curves = n_curves
+        self.n_sigmas = n_sigmas
+        self.mad_floor = mad_floor
+        self.fixed_floor = floor
+        self.floor = floor
+        self.history = history
+        self.recent = np.empty((0, n_curves))
+        self.since_floor = 0
+        self.depth = np.empty(0)
+        self.x = np.empty((0, n_curves))
+        self.base = 0        # stream index of self.x[0]
+        self.emitted = 0     # stream index of the next sample to emit
+        self.received = 0
+
+    @property
+    def lag(self):
+        """Samples between the arrival of a sample and its final flag."""
+        return 2 * self.half
+
+    def _update_floor(self, new):
+        if self.fixed_floor is not None:
+            return
+        self.recent = np.concatenate([self.recent, new])[-self.history:]
+        self.since_floor += len(new)
+        if self.since_floor >= 256 or len(self.recent) < self.history:  # every push while warming up
+            self.floor = mad_floor_of(self.recent, self.mad_floor)
+            self.since_floor = 0
+
+    def _emit(self, stop):
+        """Flags of stream samples [emitted, stop) from the buffered context."""
+        if stop <= self.emitted:
+            return StreamFlags(np.empty(0), np.empty((0, self.n_curves)), np.zeros((0, self.n_curves), dtype=bool),
+                               np.empty((0, self.n_curves)))
+        scores = _hampel_scores(self.x, self.window, self.floor)
+        lo, hi = self.emitted - self.base, stop - self.base
+        scores = scores[lo:hi]
+        with np.errstate(invalid="ignore"):
+            flags = scores > self.n_sigmas
+        out = StreamFlags(self.depth[lo:hi], self.x[lo:hi], flags, scores)
+        self.emitted = stop
+        # Keep the 2 * half samples before the next sample to emit: its MAD window needs their medians
+        keep = max(self.emitted - 2 * self.half, 0) - self.base
+        self.depth, self.x, self.base = self.depth[keep:], self.x[keep:], self.base + keep
+        return out
+
+    def push(self, depth, values):
+        """Append a batch; returns StreamFlags of the samples that became final (possibly none)."""
+        values = np.asarray(values, dtype=np.float64).reshape(len(depth), self.n_curves)
+        self.depth = np.concatenate([self.depth, np.asarray(depth, dtype=np.float64)])
+        self.x = np.concatenate([self.x, values])
+        self.received += len(values)
+        self._update_floor(values)
+        return self._emit(max(self.received - self.lag, self.emitted))
+
+    def flush(self):
+        """End of stream: flags of the remaining samples, with windows truncated at the end like hampel()."""
+        return self._emit(self.received)
@@ -0,0 +1,190 @@
+# ---------------------------------------------------------------------------------------
+# spike_model.py
+#
+# Fit once, score many: Isolation Forest spike detectors trained on a reference set of wells and
+# saved to one model file, then used unchanged on every new well. A detector covers one curve
+# family (GR, RHOB, ... found under their usual vendor mnemonics) or several families jointly.
+# Its threshold is fixed at training time: the score quantile `contamination` of the pooled
+# reference samples. A clean well therefore gets few or no flags and a corrupted well gets
+# many, and flags are comparable between wells (a per-well fit always flags `contamination`).
+#
+# Each reference well contributes at most max_rows_per_well random samples, read in parallel
+# worker processes, so a long well does not dominate the model and memory stays bounded.
+# Usage (through LogsSpikeDetection_IsoForest.py):
+#   python LogsSpikeDetection_IsoForest.py /field/reference --train field_spikes.joblib --curves GR RHOB NPHI
+#   python LogsSpikeDetection_IsoForest.py /field/las --engine model --model field_spikes.joblib --workers 16
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import time
+import zlib
+
+import numpy as np
+import joblib
+import sklearn
+from sklearn.ensemble import IsolationForest
+
+from las_curve_cache import read_las
+from qc_batch import iter_input_files, run_parallel, TaskFailure
+
+MODEL_VERSION = 1
+CONTAMINATION = 0.01
+MAX_ROWS_PER_WELL = 20000
+BATCH_ROWS = 200000
+
+# Mnemonics a curve family is found under, in order of preference
+CURVE_FAMILIES = {
+    "GR": ["GR", "GRC", "SGR", "CGR", "HGR", "GRD", "GR_EDTC", "HSGR"],
+    "RHOB": ["RHOB", "RHOZ", "DEN", "ZDEN", "HDEN", "DENS"],
+    "NPHI": ["NPHI", "TNPH", "NPOR", "CNC", "HNPO", "NPHS"],
+    "DT": ["DT", "DTC", "DTCO", "AC", "DT24", "DTLN"],
+    "RT": ["RT", "RD", "RESD", "ILD", "LLD", "AT90", "RLA5", "HDRS"],
+    "PEF": ["PEF", "PEFZ", "PE", "HPEF"],
+    "CALI": ["CALI", "CAL", "HCAL", "C1"],
+}
+
+
+def family_mnemonic(las, family):
+    """Mnemonic of `family` in a LAS file (its aliases, or the family name itself), or None."""
+    names = {name.upper(): name for name in las.keys()[1:]}
+    for alias in CURVE_FAMILIES.get(family.upper(), [family.upper()]):
+        if alias.upper() in names:
+            return names[alias.upper()]
+    return names.get(family.upper())
+
+
+class CurveDetector:
+    """One Isolation Forest over one curve family, or several families jointly, with a fixed threshold."""
+
+    def __init__(self, families, forest, threshold, contamination, n_train, n_wells):
+        self.families = tuple(families)
+        self.forest = forest
+        self.threshold = threshold
+        self.contamination = contamination
+        self.n_train = n_train
+        self.n_wells = n_wells
+
+    @property
+    def label(self):
+        return "_".join(self.families)
+
+    def resolve(self, las):
+        """Mnemonics of the detector's families in `las`, or None if one of them is missing."""
+        mnemonics = [family_mnemonic(las, f) for f in self.families]
+        return None if None in mnemonics else mnemonics
+
+    def score(self, values, batch_rows=BATCH_ROWS):
+        """
+        (flags, scores) for an (n, len(families)) array: score = score_samples - threshold, so
+        negative is anomalous; rows with a null value score NaN and are not flagged.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+        scores = np.full(len(values), np.nan)
+        valid = np.flatnonzero(np.isfinite(values).all(axis=1))
+        for start in range(0, len(valid), batch_rows):
+            rows = valid[start:start + batch_rows]
+            scores[rows] = self.forest.score_samples(values[rows]) - self.threshold
+        with np.errstate(invalid="ignore"):
+            return scores < 0, scores
+
+
+class SpikeModel:
+    """Field spike model: CurveDetectors by label, saved and loaded as one joblib file."""
+
+    def __init__(self, detectors, sources=None):
+        self.detectors = {d.label: d for d in detectors}
+        self.version = MODEL_VERSION
+        self.sklearn_version = sklearn.__version__
+        self.created = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.sources = list(sources or [])
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        joblib.dump(self, tmp)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path):
+        model = joblib.load(path)
+        if not isinstance(model, SpikeModel) or model.version != MODEL_VERSION:
+            raise ValueError(f"{path} is not a version {MODEL_VERSION} spike model")
+        if model.sklearn_version != sklearn.__version__:
+            print(f"Warning: {path} was trained with scikit-learn {model.sklearn_version}, "
+                  f"running {sklearn.__version__}")
+        return model
+
+    def describe(self):
+        lines = [f"Spike model v{self.version} ({self.created}, scikit-learn {self.sklearn_version}), "
+                 f"{len(self.sources)} reference wells"]
+        for d in self.detectors.values():
+            lines.append(f"  {d.label}: {d.n_train} samples from {d.n_wells} wells, "
+                         f"contamination {d.contamination}, threshold {d.threshold:.4f}")
+        return "\n".join(lines)
+
+
+_LOADED = {}  # per-process model cache: workers load the model file once
+
+
+def load_model(path):
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _LOADED:
+        _LOADED.clear()
+        _LOADED[key] = SpikeModel.load(path)
+    return _LOADED[key]
+
+
+# --------------------------------------------------
+# Training
+# --------------------------------------------------
+
+def _sample_task(path, groups, max_rows=MAX_ROWS_PER_WELL, seed=0):
+    """Worker: at most max_rows random complete samples of every family group found in the well."""
+    las = read_las(path)
+    rng = np.random.default_rng([seed, zlib.crc32(os.path.abspath(path).encode("utf-8"))])
+    samples = {}
+    for families in groups:
+        mnemonics = [family_mnemonic(las, f) for f in families]
+        if None in mnemonics:
+            continue
+        values = np.column_stack([np.asarray(las[m], dtype=np.float64) for m in mnemonics])
+        values = values[np.isfinite(values).all(axis=1)]
+        if len(values) > max_rows:
+            values = values[np.sort(rng.choice(len(values), max_rows, replace=False))]
+        if len(values):
+            samples[families] = values
+    return samples
+
+
+def train_model(sources, families, joint=False, contamination=CONTAMINATION, n_estimators=200,
+                max_rows_per_well=MAX_ROWS_PER_WELL, workers=None, random_state=42, verbose=True):
+    """Train a SpikeModel on the reference wells under `sources`: one detector per family, or one joint."""
+    families = [f.upper() for f in families]
+    groups = [tuple(families)] if joint else [(f,) for f in families]
+    pooled = {g: [] for g in groups}
+    wells = []
+    files = iter_input_files(sources, [".las"])
+    kwargs = {"groups": groups, "max_rows": max_rows_per_well, "seed": random_state}
+    for path, samples, _ in run_parallel(_sample_task, files, workers, None, kwargs):
+        if isinstance(samples, TaskFailure):
+            print(f"❌ {path}: {samples}")
+            continue
+        wells.append(path)
+        for g, values in samples.items():
+            pooled[g].append(values)
+
+    detectors = []
+    for g in groups:
+        if not pooled[g]:
+            print(f"No reference well has {' + '.join(g)}; skipped.")
+            continue
+        x = np.concatenate(pooled[g])
+        forest = IsolationForest(n_estimators=n_estimators, contamination="auto", random_state=random_state,
+                                 n_jobs=-1).fit(x)
+        threshold = float(np.quantile(forest.score_samples(x), contamination))
+        detectors.append(CurveDetector(g, forest, threshold, contamination, len(x), len(pooled[g])))
+        if verbose:
+            print(f"{'+'.join(g)}: trained on {len(x)} samples from {len(pooled[g])} wells")
+    if not detectors:
+        raise ValueError("No detector could be trained: none of the curves is in the reference wells.")
+    return SpikeModel(detectors, wells)
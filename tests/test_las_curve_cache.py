@@ -0,0 +1,52 @@
+import os
+import sys
+import shutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import las_curve_cache
+from las_curve_cache import LasCurveCache, read_las, _warm_task
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "LAS20_test_1.las")
+
+
+def test_warmed_file_is_a_hit_for_plain_read_las(tmp_path, monkeypatch):
+    las = tmp_path / "plain.las"
+    shutil.copy(SAMPLE, las)
+    cache_dir = str(tmp_path / "cache")
+    _warm_task(str(las), cache_dir, 1 << 30)
+
+    cache = LasCurveCache(cache_dir)
+    monkeypatch.setattr(las_curve_cache, "_DEFAULT", {"cache": cache})
+    read_las(str(las))
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cache.stats()["entries"] == 1
+
+
+def test_put_scans_the_cache_once(tmp_path, monkeypatch):
+    cache = LasCurveCache(str(tmp_path / "cache"))
+    scans = []
+    entries = cache.entries
+    monkeypatch.setattr(cache, "entries", lambda: scans.append(1) or entries())
+    for i in range(5):
+        las = tmp_path / f"well_{i}.las"
+        shutil.copy(SAMPLE, las)
+        cache.read(str(las))
+    assert cache.misses == 5
+    assert len(scans) == 1
+    assert cache.total_bytes == sum(size for _, size, _ in entries())
+
+
+def test_eviction_keeps_the_limit(tmp_path):
+    cache = LasCurveCache(str(tmp_path / "cache"))
+    for i in range(3):
+        las = tmp_path / f"well_{i}.las"
+        shutil.copy(SAMPLE, las)
+        cache.read(str(las))
+    entry_bytes = cache.total_bytes // 3
+    cache.max_bytes = 2 * entry_bytes + entry_bytes // 2
+    las = tmp_path / "well_3.las"
+    shutil.copy(SAMPLE, las)
+    cache.read(str(las))
+    assert cache.stats()["entries"] == 2
+    assert cache.total_bytes <= cache.max_bytes
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from well_index import WellIndex, update_index
+
+LAS_DUPLICATE_GR = """~VERSION INFORMATION
+ VERS.                 2.0 : CWLS LOG ASCII STANDARD - VERSION 2.0
+ WRAP.                  NO : ONE LINE PER DEPTH STEP
+~WELL INFORMATION
+ STRT.M             1000.0 : START DEPTH
+ STOP.M             1001.0 : STOP DEPTH
+ STEP.M                0.5 : STEP
+ NULL.             -999.25 : NULL VALUE
+ WELL.              WELL-A : WELL
+~CURVE INFORMATION
+ DEPT.M                    : DEPTH
+ GR  .GAPI                 : GAMMA RAY (MAIN PASS)
+ GR  .GAPI                 : GAMMA RAY (REPEAT PASS)
+ DT  .US/F                 : SONIC
+~A
+1000.0  50.0  51.0  80.0
+1000.5  60.0  61.0  81.0
+1001.0  70.0  71.0  82.0
+"""
+
+
+def test_query_returns_one_row_per_log_with_repeated_mnemonics(tmp_path):
+    las = tmp_path / "well_a.las"
+    las.write_text(LAS_DUPLICATE_GR)
+    db = str(tmp_path / "wells.sqlite")
+    update_index(db, [str(tmp_path)], workers=1, verbose=False)
+
+    index = WellIndex(db)
+    try:
+        assert [m for m, _, _ in index.curves_of(index.query()[0]["log_id"])].count("GR") == 2
+        assert len(index.query(curves=["GR"])) == 1
+        assert len(index.query(curves=["GR", "DT"])) == 1
+        assert len(index.query(curves=["DT", "GR"])) == 1
+        assert index.query(curves=["GR", "RHOB"]) == []
+    finally:
+        index.close()
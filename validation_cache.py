@@ -0,0 +1,164 @@
+# ---------------------------------------------------------------------------------------
+# validation_cache.py
+#
+# Persistent SQLite cache of validation results for nightly archive runs.
+# Entries are keyed by absolute path + validator rule-set version and carry the file size,
+# mtime and a BLAKE2b content hash. Unchanged files (same size and mtime) are skipped without
+# being read; touched-but-identical files are recognised by their hash. Runs are recorded so
+# an interrupted run can be resumed where it stopped.
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import sqlite3
+import hashlib
+from datetime import datetime
+
+from qc_findings import findings_to_json, findings_from_json
+
+HASH_BLOCK = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path         TEXT NOT NULL,
+    ruleset      TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    hash         TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    validated_at TEXT NOT NULL,
+    findings     TEXT,
+    PRIMARY KEY (path, ruleset)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ruleset     TEXT NOT NULL,
+    output_file TEXT NOT NULL,
+    started     TEXT NOT NULL,
+    finished    TEXT
+);
+CREATE TABLE IF NOT EXISTS run_files (
+    run_id INTEGER NOT NULL,
+    path   TEXT NOT NULL,
+    PRIMARY KEY (run_id, path)
+);
+"""
+
+
+def content_hash(path):
+    """BLAKE2b digest of the whole file, read in 1 MB blocks."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def validate_with_hash(task, validator, validator_kwargs=None):
+    """
+    Worker-side half of a cached run: hash the file, and only run `validator` when the hash
+    differs from the cached one. `task` is (path, cached_hash, cached_result).
+    Returns (result, hash, reused).
+    """
+    path, cached_hash, cached_result = task
+    digest = content_hash(path)
+    if cached_hash is not None and digest == cached_hash:
+        return cached_result, digest, True
+    return validator(path, **(validator_kwargs or {})), digest, False
+
+
+class ValidationCache:
+    def __init__(self, db_path, ruleset):
+        self.db_path = db_path
+        self.ruleset = ruleset
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(results)")}
+        if "findings" not in columns:
+            self.conn.execute("ALTER TABLE results ADD COLUMN findings TEXT")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # -------- Per-file entries --------
+
+    def lookup(self, path):
+        """
+        Returns (hit, cached_hash, cached_result). `hit` is True when size and mtime still
+        match the cached entry; otherwise the file must be re-hashed (and re-validated if the
+        hash differs). cached_hash is None for files never validated under this rule set.
+        cached_result is the stored list of Findings, or the status text for validators that
+        only return a string.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, hash, status, findings FROM results WHERE path = ? AND ruleset = ?",
+            (path, self.ruleset)
+        ).fetchone()
+        if row is None:
+            return False, None, None
+        size, mtime_ns, digest, status, findings = row
+        result = findings_from_json(findings) if findings is not None else status
+        return size == st.st_size and mtime_ns == st.st_mtime_ns, digest, result
+
+    def store(self, path, digest, status, findings=None, run_id=None):
+        """Record a validation result (and, with run_id, mark the file done in that run)."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results "
+            "(path, ruleset, size, mtime_ns, hash, status, validated_at, findings) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, self.ruleset, st.st_size, st.st_mtime_ns, digest, status,
+             datetime.now().isoformat(timespec="seconds"),
+             None if findings is None else findings_to_json(findings))
+        )
+        if run_id is not None:
+            self.conn.execute("INSERT OR IGNORE INTO run_files VALUES (?, ?)", (run_id, path))
+        self.conn.commit()
+
+    def invalidate_other_rulesets(self):
+        """Drop entries written by any other rule-set version; returns the number removed."""
+        cur = self.conn.execute("DELETE FROM results WHERE ruleset != ?", (self.ruleset,))
+        self.conn.commit()
+        return cur.rowcount
+
+    # -------- Runs (resume support) --------
+
+    def begin_run(self, output_file, resume=False):
+        """
+        Start a new run, or with resume=True reopen the latest unfinished run for this rule set.
+        Returns (run_id, output_file, already_done_paths).
+        """
+        if resume:
+            row = self.conn.execute(
+                "SELECT run_id, output_file FROM runs WHERE ruleset = ? AND finished IS NULL "
+                "ORDER BY run_id DESC LIMIT 1",
+                (self.ruleset,)
+            ).fetchone()
+            if row is not None:
+                run_id, output_file = row
+                done = {p for (p,) in self.conn.execute(
+                    "SELECT path FROM run_files WHERE run_id = ?", (run_id,))}
+                return run_id, output_file, done
+
+        cur = self.conn.execute(
+            "INSERT INTO runs (ruleset, output_file, started) VALUES (?, ?, ?)",
+            (self.ruleset, os.path.abspath(output_file), datetime.now().isoformat(timespec="seconds"))
+        )
+        self.conn.commit()
+        return cur.lastrowid, output_file, set()
+
+    def mark_done(self, run_id, path):
+        self.conn.execute("INSERT OR IGNORE INTO run_files VALUES (?, ?)",
+                          (run_id, os.path.abspath(path)))
+        self.conn.commit()
+
+    def finish_run(self, run_id):
+        self.conn.execute("UPDATE runs SET finished = ? WHERE run_id = ?",
+                          (datetime.now().isoformat(timespec="seconds"), run_id))
+        self.conn.commit()
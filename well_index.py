@@ -0,0 +1,430 @@
+# ---------------------------------------------------------------------------------------
+# well_index.py
+#
+# Field-wide well metadata index: a SQLite catalog of the header of every LAS and DLIS file
+# in an archive, so questions such as "which wells have DT and RHOB below 2500 m" are answered
+# from indexed tables instead of re-opening thousands of files.
+#
+# One row per log (a LAS file, or one logical file of a DLIS file) holds well name/UWI, field,
+# company, origin (service company / producer), STRT/STOP/STEP with their unit, the depth range
+# converted to metres and NULL; the curve list (mnemonic, unit, description) and tool list are
+# kept in separate tables indexed by mnemonic. LAS headers come from las_scan (the data section
+# is never read), DLIS files are pre-scanned (dlis_prescan) and loaded with dlisio for their
+# metadata only. Updates are incremental: files whose size and mtime did not change are skipped.
+#
+# Usage: python well_index.py build wells.sqlite /archive/las /archive/dlis [--workers 8] [--prune]
+#        python well_index.py query wells.sqlite --curves DT RHOB --min-depth 2500
+#
+# MIT License
+# ---------------------------------------------------------------------------------------
+import os
+import re
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+from las_scan import scan_las_header
+from qc_batch import iter_input_files, run_parallel, TaskFailure
+
+EXTENSIONS = [".las", ".dlis"]
+
+# Depth unit -> metres. DLIS units may carry a multiplier ("0.1 in", "0.5 ms" ...)
+DEPTH_UNITS = {
+    "M": 1.0, "METER": 1.0, "METERS": 1.0, "METRE": 1.0, "METRES": 1.0,
+    "F": 0.3048, "FT": 0.3048, "FEET": 0.3048, "FOOT": 0.3048,
+    "IN": 0.0254, "CM": 0.01, "MM": 0.001, "KM": 1000.0,
+}
+_UNIT = re.compile(r"^\s*([0-9.]+)?\s*([A-Za-z]+)\s*$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path       TEXT PRIMARY KEY,
+    format     TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    mtime_ns   INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL,
+    error      TEXT
+);
+CREATE TABLE IF NOT EXISTS logs (
+    log_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    path         TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    logical_file INTEGER NOT NULL,
+    well         TEXT,
+    uwi          TEXT,
+    field        TEXT,
+    company      TEXT,
+    origin       TEXT,
+    strt         REAL,
+    stop         REAL,
+    step         REAL,
+    depth_unit   TEXT,
+    top_m        REAL,
+    base_m       REAL,
+    null_value   TEXT
+);
+CREATE TABLE IF NOT EXISTS curves (
+    log_id   INTEGER NOT NULL REFERENCES logs(log_id) ON DELETE CASCADE,
+    mnemonic TEXT NOT NULL,
+    unit     TEXT,
+    descr    TEXT
+);
+CREATE TABLE IF NOT EXISTS tools (
+    log_id INTEGER NOT NULL REFERENCES logs(log_id) ON DELETE CASCADE,
+    name   TEXT NOT NULL,
+    descr  TEXT
+);
+CREATE INDEX IF NOT EXISTS curves_mnemonic ON curves (mnemonic, log_id);
+CREATE INDEX IF NOT EXISTS curves_log ON curves (log_id);
+CREATE INDEX IF NOT EXISTS tools_name ON tools (name, log_id);
+CREATE INDEX IF NOT EXISTS tools_log ON tools (log_id);
+CREATE INDEX IF NOT EXISTS logs_path ON logs (path);
+CREATE INDEX IF NOT EXISTS logs_well ON logs (well COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS logs_uwi ON logs (uwi);
+CREATE INDEX IF NOT EXISTS logs_depth ON logs (base_m, top_m);
+"""
+
+
+# --------------------------------------------------
+# Header extraction (runs in worker processes)
+# --------------------------------------------------
+
+def _float(value):
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def depth_factor(unit):
+    """Metres per depth unit, or None when the unit is not a length."""
+    match = _UNIT.match(str(unit or ""))
+    if not match:
+        return None
+    factor = DEPTH_UNITS.get(match.group(2).upper())
+    if factor is None:
+        return None
+    return factor * (_float(match.group(1)) or 1.0) if match.group(1) else factor
+
+
+def _log_entry(logical_file, strt=None, stop=None, unit=None, **fields):
+    entry = {"logical_file": logical_file, "well": None, "uwi": None, "field": None, "company": None,
+             "origin": None, "strt": strt, "stop": stop, "step": None, "depth_unit": _text(unit),
+             "top_m": None, "base_m": None, "null_value": None, "curves": [], "tools": []}
+    entry.update(fields)
+    factor = depth_factor(unit)
+    if factor is not None and strt is not None and stop is not None:
+        entry["top_m"] = min(strt, stop) * factor
+        entry["base_m"] = max(strt, stop) * factor
+    return entry
+
+
+def index_las(path):
+    """One log entry from the LAS header (~V/~W/~C/~P/~O, first and last data row)."""
+    header = scan_las_header(path)
+    strt_item = header.get("WELL", "STRT")
+    unit = strt_item.unit if strt_item is not None else None
+    strt = _float(header.value("WELL", "STRT"))
+    stop = _float(header.value("WELL", "STOP"))
+    # Fall back to the data rows when STRT/STOP are missing or not numbers
+    if strt is None and header.first_row:
+        strt = _float(header.first_row[0])
+    if stop is None and header.last_row:
+        stop = _float(header.last_row[0])
+    if not unit and header.curves:
+        unit = header.curves[0].unit
+
+    tools = []
+    for name, items in header.sections.items():
+        if name.startswith("TOOL"):
+            tools += [(item.mnemonic, _text(item.value) or _text(item.descr)) for item in items if item.mnemonic]
+
+    return [_log_entry(
+        1, strt, stop, unit,
+        well=_text(header.value("WELL", "WELL")),
+        uwi=_text(header.value("WELL", "UWI")) or _text(header.value("WELL", "API")),
+        field=_text(header.value("WELL", "FLD")),
+        company=_text(header.value("WELL", "COMP")),
+        origin=_text(header.value("WELL", "SRVC")),
+        step=_float(header.value("WELL", "STEP")),
+        null_value=_text(header.value("WELL", "NULL")),
+        curves=[(item.mnemonic, _text(item.unit), _text(item.descr)) for item in header.curves],
+        tools=tools,
+    )]
+
+
+def index_dlis(path):
+    """One log entry per logical file: ORIGIN, depth-indexed FRAMEs, CHANNELs and TOOLs."""
+    from dlisio import dlis
+    from dlis_prescan import prescan_dlis
+    from dlis_header_to_excel import first_attr, normalize_scalar
+
+    findings, _ = prescan_dlis(path)
+    fatal = [f for f in findings if f.severity == "fatal"]
+    if fatal:
+        raise ValueError(fatal[0].message)
+
+    entries = []
+    with dlis.load(path) as pf:
+        for lf_index, lf in enumerate(pf):
+            origin = lf.origins[0] if lf.origins else None
+            strt = stop = step = unit = None
+            for fr in lf.frames:
+                if fr.index_type not in (None, "BOREHOLE-DEPTH") or not fr.channels:
+                    continue
+                lo, hi = _float(fr.index_min), _float(fr.index_max)
+                if lo is None or hi is None:
+                    continue
+                if unit is None:
+                    unit, step = fr.channels[0].units, _float(fr.spacing)
+                elif fr.channels[0].units != unit:
+                    continue
+                strt = lo if strt is None else min(strt, lo)
+                stop = hi if stop is None else max(stop, hi)
+
+            entries.append(_log_entry(
+                lf_index + 1, strt, stop, unit,
+                well=_text(first_attr(origin, ["well_name"])),
+                uwi=_text(first_attr(origin, ["well_id"])),
+                field=_text(first_attr(origin, ["field_name"])),
+                company=_text(first_attr(origin, ["company"])),
+                origin=_text(first_attr(origin, ["producer_name"])),
+                step=step,
+                curves=[(ch.name, _text(normalize_scalar(ch.units)), _text(normalize_scalar(ch.long_name)))
+                        for ch in lf.channels],
+                tools=[(t.name, _text(normalize_scalar(t.description))) for t in lf.tools],
+            ))
+    return entries
+
+
+def index_file(path):
+    if path.lower().endswith(".dlis"):
+        return index_dlis(path)
+    return index_las(path)
+
+
+# --------------------------------------------------
+# SQLite catalog
+# --------------------------------------------------
+
+class WellIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # -------- Per-file entries --------
+
+    def is_current(self, path):
+        """True when `path` was indexed with its current size and mtime."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+        return row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns
+
+    def store(self, path, entries, error=None, commit=True):
+        """Replace everything indexed for `path` with `entries` (log dicts from index_file)."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM files WHERE path = ?", (path,))
+        cur.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, os.path.splitext(path)[1].lstrip(".").upper(), st.st_size, st.st_mtime_ns,
+                     datetime.now().isoformat(timespec="seconds"), error))
+        for e in entries or []:
+            cur.execute(
+                "INSERT INTO logs (path, logical_file, well, uwi, field, company, origin, strt, stop, step, "
+                "depth_unit, top_m, base_m, null_value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, e["logical_file"], e["well"], e["uwi"], e["field"], e["company"], e["origin"],
+                 e["strt"], e["stop"], e["step"], e["depth_unit"], e["top_m"], e["base_m"], e["null_value"]))
+            log_id = cur.lastrowid
+            cur.executemany("INSERT INTO curves VALUES (?, ?, ?, ?)",
+                            [(log_id, m.strip().upper(), u, d) for m, u, d in e["curves"] if m and m.strip()])
+            cur.executemany("INSERT INTO tools VALUES (?, ?, ?)",
+                            [(log_id, n.strip().upper(), d) for n, d in e["tools"] if n and n.strip()])
+        if commit:
+            self.conn.commit()
+
+    def remove(self, path):
+        self.conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+        self.conn.commit()
+
+    def paths(self, under=None):
+        """Indexed paths (optionally only those below directory `under`)."""
+        rows = self.conn.execute("SELECT path FROM files")
+        if under is None:
+            return [p for (p,) in rows]
+        prefix = os.path.abspath(under).rstrip(os.sep) + os.sep
+        return [p for (p,) in rows if p.startswith(prefix)]
+
+    # -------- Queries --------
+
+    def query(self, curves=None, min_depth=None, max_depth=None, well=None, tools=None):
+        """
+        Logs that carry every mnemonic in `curves` (and every tool in `tools`), whose depth range
+        (metres) reaches below `min_depth` / above `max_depth`, and whose well name or UWI matches
+        `well` (case-insensitive; a SQL LIKE pattern when it holds % or _). Returns a list of dicts.
+        """
+        columns = ("SELECT l.log_id, l.well, l.uwi, l.path, l.logical_file, l.strt, l.stop, l.step, l.depth_unit, "
+                   "l.top_m, l.base_m, l.null_value ")
+        curves = [m.strip().upper() for m in curves or []]
+        args = []
+        if curves:
+            # Drive the lookup from the mnemonic index rather than scanning every log; IN, not a join,
+            # so a log listing the mnemonic more than once (one channel in several DLIS frames) is one row
+            sql = [columns + "FROM logs l WHERE l.log_id IN (SELECT log_id FROM curves WHERE mnemonic = ?)"]
+            args.append(curves.pop(0))
+        else:
+            sql = [columns + "FROM logs l WHERE 1=1"]
+        for mnemonic in curves:
+            sql.append("AND EXISTS (SELECT 1 FROM curves c WHERE c.mnemonic = ? AND c.log_id = l.log_id)")
+            args.append(mnemonic)
+        for name in tools or []:
+            sql.append("AND EXISTS (SELECT 1 FROM tools t WHERE t.name = ? AND t.log_id = l.log_id)")
+            args.append(name.strip().upper())
+        if min_depth is not None:
+            sql.append("AND l.base_m > ?")
+            args.append(min_depth)
+        if max_depth is not None:
+            sql.append("AND l.top_m < ?")
+            args.append(max_depth)
+        if well and ("%" in well or "_" in well):
+            sql.append("AND (l.well LIKE ? OR l.uwi LIKE ?)")
+            args += [well, well]
+        elif well:
+            sql.append("AND l.log_id IN (SELECT log_id FROM logs WHERE well = ? COLLATE NOCASE "
+                       "UNION SELECT log_id FROM logs WHERE uwi = ?)")
+            args += [well, well]
+        sql.append("ORDER BY l.well, l.path, l.logical_file")
+        cur = self.conn.execute(" ".join(sql), args)
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+
+    def curves_of(self, log_id):
+        return self.conn.execute("SELECT mnemonic, unit, descr FROM curves WHERE log_id = ?", (log_id,)).fetchall()
+
+
+# --------------------------------------------------
+# Incremental build
+# --------------------------------------------------
+
+def update_index(db_path, sources, workers=None, timeout=None, prune=False, verbose=True):
+    """
+    Index every LAS/DLIS file under `sources` whose size or mtime changed since the last run.
+    Files that fail are recorded with their error (and retried once they change). With `prune`,
+    indexed files below a source directory that no longer exist are dropped. Returns totals.
+    """
+    t0 = time.perf_counter()
+    totals = {"seen": 0, "indexed": 0, "unchanged": 0, "failed": 0, "removed": 0, "seconds": 0.0}
+    index = WellIndex(db_path)
+    seen = set()
+
+    def changed():
+        for path in iter_input_files(sources, EXTENSIONS):
+            if not os.path.isfile(path):
+                continue
+            path = os.path.abspath(path)
+            seen.add(path)
+            totals["seen"] += 1
+            if index.is_current(path):
+                totals["unchanged"] += 1
+                continue
+            yield path
+
+    try:
+        pending = 0
+        for path, result, seconds in run_parallel(index_file, changed(), workers, timeout):
+            if isinstance(result, TaskFailure):
+                totals["failed"] += 1
+                index.store(path, [], error=str(result), commit=False)
+                print(f"{path}: {result}")
+            else:
+                totals["indexed"] += 1
+                index.store(path, result, commit=False)
+                if verbose:
+                    print(f"{path}: {len(result)} log(s), {sum(len(e['curves']) for e in result)} curves "
+                          f"({seconds:.2f}s)")
+            pending += 1
+            if pending >= 200:
+                index.conn.commit()
+                pending = 0
+        index.conn.commit()
+
+        if prune:
+            for src in sources:
+                if not os.path.isdir(src):
+                    continue
+                for path in index.paths(under=src):
+                    if path not in seen and not os.path.exists(path):
+                        index.remove(path)
+                        totals["removed"] += 1
+    finally:
+        index.close()
+    totals["seconds"] = time.perf_counter() - t0
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Field-wide well metadata index (SQLite) from LAS and DLIS headers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Create or incrementally update the index")
+    build.add_argument("index", help="SQLite index file")
+    build.add_argument("sources", nargs="+", help="Directories (searched recursively), LAS/DLIS files or list files")
+    build.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    build.add_argument("--timeout", type=float, default=None, help="Per-file timeout in seconds")
+    build.add_argument("--prune", action="store_true", help="Drop indexed files that no longer exist")
+    build.add_argument("--quiet", action="store_true", help="Only print the summary and failures")
+
+    query = sub.add_parser("query", help="Find logs by curve mnemonic, tool, depth range and well")
+    query.add_argument("index", help="SQLite index file")
+    query.add_argument("--curves", nargs="+", default=[], help="Mnemonics that must all be present, e.g. DT RHOB")
+    query.add_argument("--tools", nargs="+", default=[], help="Tool names that must all be present")
+    query.add_argument("--min-depth", type=float, default=None, help="Log reaches below this depth (m)")
+    query.add_argument("--max-depth", type=float, default=None, help="Log reaches above this depth (m)")
+    query.add_argument("--well", default=None, help="Well name or UWI (SQL LIKE pattern, e.g. 'A-1%%')")
+    query.add_argument("--show-curves", action="store_true", help="List the curves of every match")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.command == "build":
+        totals = update_index(args.index, args.sources, args.workers, args.timeout, args.prune, not args.quiet)
+        print(f"{totals['seen']} files: {totals['indexed']} indexed, {totals['unchanged']} unchanged, "
+              f"{totals['failed']} failed, {totals['removed']} removed in {totals['seconds']:.1f}s")
+        return
+
+    index = WellIndex(args.index)
+    try:
+        t0 = time.perf_counter()
+        rows = index.query(args.curves, args.min_depth, args.max_depth, args.well, args.tools)
+        elapsed = (time.perf_counter() - t0) * 1000
+        for r in rows:
+            depth = (f"{r['top_m']:.1f}-{r['base_m']:.1f} m" if r["top_m"] is not None
+                     else f"{r['strt']}-{r['stop']} {r['depth_unit'] or ''}")
+            lf = f" (logical file {r['logical_file']})" if r["path"].lower().endswith(".dlis") else ""
+            print(f"{r['well'] or '?'}\t{r['uwi'] or ''}\t{depth}\t{r['path']}{lf}")
+            if args.show_curves:
+                print("\t" + ", ".join(f"{m} [{u or ''}]" for m, u, _ in index.curves_of(r["log_id"])))
+        print(f"{len(rows)} logs in {elapsed:.1f} ms")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()